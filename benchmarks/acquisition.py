@@ -0,0 +1,277 @@
+"""
+End-to-end acquisition workloads on QRunEngine: scan rate, dead time per point, subscriber lag and peak memory.
+
+The count, grid scan and queue burst workloads use ophyd.sim devices; the FastCCD and Andor workloads run the
+controllers' own plans against the simulated IOCs of xicam.Acquire.sim.iocs. Documents are written to a local,
+in-memory document store through the BatchedDocumentWriter, as in the application. Each workload runs in a process of
+its own, so that its peak memory is its own.
+
+asv keeps its results as JSON already; outside asv,
+
+    python -m benchmarks.acquisition --output results.json [workload ...]
+
+writes the same metrics as JSON, along with the commit they were measured at, for comparing across commits.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from xicam.Acquire.summarystreams import read_summary
+
+from .common import make_run_engine, wait_for
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _ControllerStandIn:
+    """Just enough of a controller to run its plan and TV mode methods on ``device``, without building its widgets."""
+
+    def __init__(self, controller_class, device, poll_devices):
+        from types import SimpleNamespace
+
+        self.controller_class = controller_class
+        self.device = device
+        self.async_poll_devices = self.coupled_devices = poll_devices
+        self.idle_mode_selector = SimpleNamespace(currentText=lambda: 'TV Mode')
+        self.num_images_line_edit = self.num_exposures_line_edit = SimpleNamespace(setReadOnly=lambda read_only: None)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.controller_class, name)
+        return attribute.__get__(self) if callable(attribute) else attribute
+
+
+def _connected(name):
+    from xicam.Acquire.sim.iocs import make_device
+
+    device = make_device(name)
+    device.wait_for_connection(timeout=30)
+    hdf5 = getattr(device, 'hdf5', None)
+    if hdf5 is not None and not sum(hdf5.array_size.get()):
+        hdf5.warmup()  # Once per IOC, and several seconds long; not part of the workload
+    return device
+
+
+@contextmanager
+def _count(run_engine, data_root):
+    from bluesky.plans import count
+    from ophyd.sim import det
+
+    yield [count([det], num=10000)]
+
+
+@contextmanager
+def _grid_scan(run_engine, data_root):
+    from bluesky.plans import grid_scan
+    from ophyd.sim import hw
+
+    devices = hw()
+    yield [grid_scan([devices.det4], devices.motor1, -1, 1, 100, devices.motor2, -1, 1, 100)]
+
+
+@contextmanager
+def _fastccd_dark_primary(run_engine, data_root):
+    from xicam.Acquire.controllers.fastccd_controller import FastCCDController
+    from xicam.Acquire.sim.iocs import IOCFarm
+
+    with IOCFarm(['fastccd', 'lakeshore'], data_root=data_root):
+        fastccd, lakeshore = _connected('fastccd'), _connected('lakeshore')
+        fastccd.cam.acquire_time.put(.1)
+        controller = _ControllerStandIn(FastCCDController, fastccd, [lakeshore])
+        yield [controller._plan() for _ in range(3)]
+
+
+@contextmanager
+def _andor_tv_handoff(run_engine, data_root):
+    from qtpy.QtCore import Qt
+    from xicam.Acquire.controllers.andor_controller import AndorController
+    from xicam.Acquire.sim.iocs import IOCFarm
+
+    with IOCFarm(['andor', 'lakeshore'], data_root=data_root):
+        andor, lakeshore = _connected('andor'), _connected('lakeshore')
+        andor.cam.acquire_time.put(.05)
+        controller = _ControllerStandIn(AndorController, andor, [andor, lakeshore])
+        # As in AndorController: TV mode is stopped for each plan and restarted after it, on the GUI thread
+        run_engine.sigStart.connect(controller.on_plan_start, Qt.BlockingQueuedConnection)
+        run_engine.sigFinish.connect(controller.on_plan_finish, Qt.BlockingQueuedConnection)
+        controller.start_tv()
+        try:
+            yield [controller._plan() for _ in range(3)]
+        finally:
+            controller.stop_tv()
+
+
+@contextmanager
+def _queue_burst(run_engine, data_root):
+    from bluesky.plans import count
+    from ophyd.sim import det
+
+    yield [count([det]) for _ in range(1000)]
+
+
+# Workloads by name: context managers that get their devices ready and give the plans to queue
+WORKLOADS = OrderedDict([('count_10k', _count),
+                         ('grid_scan_100x100', _grid_scan),
+                         ('fastccd_dark_primary', _fastccd_dark_primary),
+                         ('andor_tv_handoff', _andor_tv_handoff),
+                         ('queue_burst_1000', _queue_burst)])
+
+
+class _DocumentRecorder:
+    """
+    A bus subscriber keeping the run boundaries, the number of events, how late each event reached it and the Msg
+    timing summaries of the runs.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.stops = []
+        self.events = 0
+        self.lags = []
+        self.plan_starts = []  # time.time() of each sigStart
+        self.msg_timing = []
+        self._summary_descriptors = dict()  # descriptor uid -> descriptor, of msg_timing streams
+
+    def __call__(self, name, doc):
+        if name == 'event':
+            descriptor = self._summary_descriptors.get(doc['descriptor'])
+            if descriptor is not None:
+                self.msg_timing.append(read_summary(descriptor, doc))
+                return
+            self.events += 1
+            self.lags.append(time.time() - doc['time'])
+        elif name == 'descriptor':
+            if doc.get('name') == 'msg_timing':
+                self._summary_descriptors[doc['uid']] = doc
+        elif name == 'start':
+            self.starts.append(doc)
+        elif name == 'stop':
+            self.stops.append(doc)
+
+    def plan_started(self):
+        self.plan_starts.append(time.time())
+
+
+def measure(workload):
+    """Run ``workload`` in this process, and return its metrics."""
+    from qtpy.QtCore import Qt
+
+    run_engine = make_run_engine(document_store=True, trace_messages=True, prefetch=False)
+    recorder = _DocumentRecorder()
+    token = run_engine.subscribe(recorder)
+    run_engine.sigStart.connect(recorder.plan_started, Qt.DirectConnection)
+    finished = []
+    run_engine.sigFinish.connect(lambda: finished.append(time.time()), Qt.DirectConnection)
+
+    with tempfile.TemporaryDirectory() as data_root, WORKLOADS[workload](run_engine, data_root) as plans:
+        for plan in plans:
+            run_engine._enqueue(1, (plan,), {})
+        wait_for(lambda: len(finished) == len(plans), timeout=1800)
+        wait_for(lambda: len(recorder.stops) == len(plans) and not run_engine.subscriber_metrics()[token]['pending'])
+    run_engine.document_writer.close()
+
+    elapsed = recorder.stops[-1]['time'] - recorder.starts[0]['time']
+    summaries = recorder.msg_timing
+    points = sum(summary.get('points', 0) for summary in summaries)
+    exposure = sum(summary['per_point']['wall'] * summary['points'] * (summary['efficiency'] or 0)
+                   for summary in summaries if summary.get('points'))
+    # For the TV mode handoff: from each plan starting (and TV mode being stopped) to its run opening
+    handoffs = [start['time'] - plan_start for plan_start, start in zip(recorder.plan_starts, recorder.starts)]
+    return {'runs': len(recorder.stops),
+            'events': recorder.events,
+            'points': points,
+            'elapsed': elapsed,
+            'events_per_second': recorder.events / elapsed if elapsed else None,
+            'dead_time_per_point': (elapsed - exposure) / points if points else None,
+            'subscriber_lag_median': statistics.median(recorder.lags) if recorder.lags else None,
+            'subscriber_lag_max': max(recorder.lags) if recorder.lags else None,
+            'handoff_median': statistics.median(handoffs) if workload == 'andor_tv_handoff' else None,
+            'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'document_writer': run_engine.document_writer.stats}
+
+
+def measure_isolated(workload, timeout=1800):
+    """Run ``workload`` in a new process, and return its metrics."""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'results.json')
+        subprocess.run([sys.executable, '-m', 'benchmarks.acquisition', '--in-process', '--output', output, workload],
+                       cwd=_ROOT, timeout=timeout, check=True)
+        with open(output) as file:
+            return json.load(file)['workloads'][workload]
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class EndToEnd:
+    params = list(WORKLOADS)
+    param_names = ['workload']
+    timeout = 3600
+
+    def setup_cache(self):
+        results = dict()
+        for workload in WORKLOADS:
+            try:
+                results[workload] = measure_isolated(workload)
+            except subprocess.SubprocessError:
+                results[workload] = None  # e.g. no mongomock, or no Channel Access for the simulated IOCs
+        return results
+
+    def setup(self, results, workload):
+        if results[workload] is None:
+            raise NotImplementedError(f'The {workload} workload could not run here.')
+
+    def track_events_per_second(self, results, workload):
+        return results[workload]['events_per_second']
+
+    track_events_per_second.unit = 'events/s'
+
+    def track_dead_time_per_point(self, results, workload):
+        return results[workload]['dead_time_per_point'] * 1e3
+
+    track_dead_time_per_point.unit = 'ms'
+
+    def track_subscriber_lag_max(self, results, workload):
+        return results[workload]['subscriber_lag_max'] * 1e3
+
+    track_subscriber_lag_max.unit = 'ms'
+
+    def track_peak_rss(self, results, workload):
+        return results[workload]['peak_rss'] / 2 ** 20
+
+    track_peak_rss.unit = 'MiB'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.acquisition',
+                                     description=__doc__.strip().split('\n')[0])
+    parser.add_argument('workloads', nargs='*', choices=list(WORKLOADS), help='workloads to run (default: all)')
+    parser.add_argument('--output', help='JSON file to write the results to (default: standard output)')
+    parser.add_argument('--in-process', action='store_true', help='run the workloads in this process')
+    args = parser.parse_args(argv)
+
+    results = OrderedDict()
+    for workload in args.workloads or WORKLOADS:
+        results[workload] = measure(workload) if args.in_process else measure_isolated(workload)
+    report = {'commit': _commit(), 'time': time.time(), 'workloads': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Channel Access accounting against a local caproto test IOC: what it counts, and what it costs per request.
+"""
+import os
+import subprocess
+import sys
+import time
+
+from bluesky import RunEngine
+import bluesky.plan_stubs as bps
+
+from xicam.Acquire.catraffic import CATraffic
+
+PREFIX = f'xicam_bench_{os.getpid()}:'
+
+
+class CATrafficAccounting:
+    params = [False, True]
+    param_names = ['counted']
+    timeout = 120
+
+    def setup(self, counted):
+        import ophyd
+        from ophyd import EpicsSignal
+
+        os.environ.update(EPICS_CA_ADDR_LIST='127.0.0.1', EPICS_CA_AUTO_ADDR_LIST='NO')
+        self.ioc = subprocess.Popen([sys.executable, '-m', 'caproto.ioc_examples.simple', '--prefix', PREFIX,
+                                     '--interfaces', '127.0.0.1'],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        ophyd.set_cl('caproto')
+        self.traffic = CATraffic()
+        if counted:
+            self.traffic.install()
+        self.signal = EpicsSignal(f'{PREFIX}A', name='a')
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.signal.wait_for_connection(timeout=1)
+                break
+            except TimeoutError:
+                if time.monotonic() > deadline:
+                    raise
+
+        self.run_engine = RunEngine(context_managers=[])
+        self.snapshot = self.traffic.snapshot()
+
+    def teardown(self, counted):
+        self.ioc.terminate()
+        self.ioc.wait()
+
+    def _plan(self):
+        for i in range(100):
+            yield from bps.rd(self.signal)
+            yield from bps.mv(self.signal, i)
+
+    def time_100_reads_and_moves(self, counted):
+        self.run_engine(self._plan())
+
+    def track_requests_counted(self, counted):
+        self.run_engine(self._plan())
+        return sum(pv['gets'] + pv['puts'] for pv in self.traffic.since(self.snapshot))
+
+    track_requests_counted.unit = 'requests'
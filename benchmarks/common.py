@@ -0,0 +1,128 @@
+"""
+Shared helpers for the xicam.Acquire benchmark suite.
+
+The benchmarks are run with asv (``asv run --python=same``) against ophyd.sim devices; no beamline hardware or
+database is required.
+"""
+import os
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from qtpy.QtCore import Qt
+from qtpy.QtWidgets import QApplication
+
+
+_application = None
+
+
+def get_application():
+    global _application
+    # Keep a reference; an unreferenced QApplication is collected and queued signals are never delivered
+    _application = QApplication.instance() or QApplication([])
+    return _application
+
+
+def local_document_store():
+    """A suitcase-mongo Serializer writing to an in-memory mongo database (mongomock)."""
+    try:
+        import mongomock
+        from suitcase.mongo_normalized import Serializer
+    except ImportError:
+        raise NotImplementedError('mongomock and suitcase-mongo are required for a local document store.')
+
+    client = mongomock.MongoClient()
+    return Serializer(client['mds'], client['fs'])
+
+
+def make_run_engine(document_store=False, **kwargs):
+    """
+    Build a QRunEngine that does not persist its queue, and does not connect to the local mongo database: documents
+    are written to a local_document_store if ``document_store``, and nowhere otherwise.
+    """
+    from xicam.Acquire.runengine import QRunEngine
+    from xicam.Acquire.callbacks.mongo import BatchedDocumentWriter
+
+    kwargs.setdefault('queue_path', ':memory:')
+    serializer = local_document_store() if document_store else None
+
+    class BenchmarkRunEngine(QRunEngine):
+        def _subscribe_serializer(self, run_engine):
+            if serializer is not None:
+                super(BenchmarkRunEngine, self)._subscribe_serializer(run_engine)
+
+        def _create_document_writer(self):
+            self.document_writer = BatchedDocumentWriter(serializer, **self._document_writer_options)
+
+    get_application()
+    run_engine = BenchmarkRunEngine(**kwargs)
+    wait_for(lambda: all(run_engine.run_engines))
+    return run_engine
+
+
+def wait_for(condition, timeout=60, interval=.001):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError('Benchmark condition was not met in time.')
+        QApplication.processEvents()
+        time.sleep(interval)
+
+
+class SignalRecorder:
+    """Records perf_counter timestamps of a Qt signal, directly on the emitting thread."""
+
+    def __init__(self, signal):
+        self.times = []
+        self.event = threading.Event()
+        signal.connect(self._record, Qt.DirectConnection)
+
+    def _record(self, *_):
+        self.times.append(time.perf_counter())
+        self.event.set()
+
+    def wait(self, count, timeout=60):
+        deadline = time.perf_counter() + timeout
+        while len(self.times) < count:
+            self.event.clear()
+            if not self.event.wait(max(0, deadline - time.perf_counter())):
+                raise TimeoutError(f'Only {len(self.times)} of {count} signals were received.')
+        return self.times
+
+
+class FakeImagePlugin:
+    """
+    A stand-in for an area detector's ImagePlugin, whose ArrayData holds ``pixels`` elements and currently a frame of
+    ``shape``. Like a Channel Access request, reading array_data makes a new array, of ``count`` elements if given.
+    """
+
+    def __init__(self, shape, pixels=None, dtype=np.uint16):
+        from types import SimpleNamespace
+        from ophyd import Signal
+
+        class ArrayData(Signal):
+            def get(self, count=None, **kwargs):
+                return np.array(super(ArrayData, self).get(**kwargs)[:count])
+
+        plugin = self
+
+        class ShapedImage(Signal):
+            # As ophyd's NDDerivedSignal: the sizes and the whole ArrayData are requested, and the frame is reshaped
+            def get(self, **kwargs):
+                shape = (plugin.array_size.height.get(), plugin.array_size.width.get())
+                return np.asarray(plugin.array_data.get()[:shape[0] * shape[1]]).reshape(shape)
+
+        self.array_counter = Signal(name='image1_array_counter', value=0)
+        self.ndimensions = Signal(name='image1_ndimensions', value=2)
+        self.array_size = SimpleNamespace(width=Signal(name='image1_array_size_width', value=shape[1]),
+                                          height=Signal(name='image1_array_size_height', value=shape[0]),
+                                          depth=Signal(name='image1_array_size_depth', value=0))
+        self.array_data = ArrayData(name='image1_array_data', value=np.zeros(pixels or np.prod(shape), dtype=dtype))
+        self.shaped_image = ShapedImage(name='image1_shaped_image')
+
+    def publish(self, frame):
+        """A new frame arrives in the plugin."""
+        self.array_data._readback[:frame.size] = frame.ravel()
+        self.array_counter.put(self.array_counter.get() + 1)
@@ -0,0 +1,59 @@
+"""
+Latency from a pause/resume/abort request to the RunEngine changing state, while a long, busy plan runs.
+"""
+from bluesky.plans import count
+from ophyd.sim import det
+
+from .common import make_run_engine, SignalRecorder, wait_for
+
+
+class ControlLatency:
+    params = [0, 1000]
+    param_names = ['queued']
+    timeout = 300
+
+    def setup(self, queued):
+        self.run_engine = make_run_engine()
+        self.started = SignalRecorder(self.run_engine.sigStart)
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+        # A plan that keeps the RunEngine loop busy emitting events, with more plans waiting behind it
+        self.run_engine._enqueue(1, (count([det], num=1000000),), {})
+        for _ in range(queued):
+            self.run_engine._enqueue(2, (count([det]),), {})
+        self.started.wait(1)
+        self._wait_for_state('running')
+
+    def teardown(self, queued):
+        self.run_engine.queue.clear()
+        self.run_engine.abort()
+        self.finished.wait(1)
+
+    def _wait_for_state(self, state):
+        wait_for(lambda: self.run_engine.RE.state == state, timeout=30)
+
+    def track_pause_latency(self, queued):
+        for _ in range(10):
+            self.run_engine.pause()
+            self._wait_for_state('paused')
+            self.run_engine.resume()
+            self._wait_for_state('running')
+        return self.run_engine.control_latency()['pause']['median'] * 1e3
+
+    track_pause_latency.unit = 'ms'
+
+    def track_resume_latency(self, queued):
+        for _ in range(10):
+            self.run_engine.pause()
+            self._wait_for_state('paused')
+            self.run_engine.resume()
+            self._wait_for_state('running')
+        return self.run_engine.control_latency()['resume']['median'] * 1e3
+
+    track_resume_latency.unit = 'ms'
+
+    def track_abort_latency(self, queued):
+        self.run_engine.abort('benchmark')
+        self.finished.wait(1)
+        return self.run_engine.control_latency()['abort']['median'] * 1e3
+
+    track_abort_latency.unit = 'ms'
@@ -0,0 +1,66 @@
+"""
+Effect of a slow document consumer on acquisition: scan rate and subscriber lag with the DocumentBus.
+"""
+import time
+
+from bluesky.plans import count
+from ophyd.sim import det
+
+from .common import make_run_engine, SignalRecorder, wait_for
+
+
+class SlowSubscriber:
+    params = ['lossless', 'latest', 'keep_run_structure']
+    param_names = ['policy']
+    timeout = 300
+
+    def setup(self, policy):
+        self.run_engine = make_run_engine()
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+        self.token = self.run_engine.subscribe(self._slow_consumer, policy=policy, max_backlog=100)
+
+    def teardown(self, policy):
+        self.run_engine.unsubscribe(self.token, drain=False)
+
+    @staticmethod
+    def _slow_consumer(name, doc):
+        time.sleep(.002)
+
+    def track_events_per_second(self, policy):
+        """Scan rate of a 2,000 point count while a 2 ms/document subscriber is attached."""
+        t0 = time.perf_counter()
+        self.run_engine._enqueue(1, (count([det], num=2000),), {})
+        self.finished.wait(1)
+        return 2000 / (self.finished.times[0] - t0)
+
+    track_events_per_second.unit = 'events/s'
+
+    def track_subscriber_lag_at_stop(self, policy):
+        """Time the slow subscriber is still behind the RunEngine when the run finishes."""
+        self.run_engine._enqueue(1, (count([det], num=2000),), {})
+        self.finished.wait(1)
+        lag = self.run_engine.subscriber_metrics()[self.token]['lag']
+        wait_for(lambda: not self.run_engine.subscriber_metrics()[self.token]['pending'], timeout=60)
+        return lag
+
+    track_subscriber_lag_at_stop.unit = 's'
+
+
+class ThrottledGuiDelivery:
+    timeout = 300
+
+    def setup(self):
+        from xicam.Acquire.callbacks.throttle import QDocumentThrottle
+
+        self.run_engine = make_run_engine()
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+        self.deliveries = []
+        self.throttle = QDocumentThrottle(lambda name, doc: self.deliveries.append(name), max_rate=10)
+
+    def track_gui_deliveries_per_1000_events(self):
+        """Number of GUI-thread deliveries for a 3,000 point count (unthrottled: one per document)."""
+        self.run_engine._enqueue(1, (count([det], num=3000), self.throttle), {})
+        wait_for(lambda: self.deliveries and self.deliveries[-1] == 'stop', timeout=120)
+        return len(self.deliveries) / 3
+
+    track_gui_deliveries_per_1000_events.unit = 'deliveries'
@@ -0,0 +1,50 @@
+"""
+Per-document cost of logging RunEngine documents, with DEBUG logging disabled and enabled.
+"""
+import logging
+from functools import partial
+
+import numpy as np
+from event_model import compose_run
+from xicam.core import msg
+
+from xicam.Acquire.callbacks.doclog import DocumentLogger
+
+
+class DocumentLogging:
+    params = (['logMessage', 'DocumentLogger'], ['disabled', 'enabled'])
+    param_names = ['logger', 'debug']
+
+    def setup(self, logger, debug):
+        self._levels = {name: logging.getLogger(name).level for name in ('xicam', 'xicam.Acquire.documents')}
+        logging.getLogger('xicam').setLevel(logging.DEBUG if debug == 'enabled' else logging.INFO)
+        logging.getLogger('xicam.Acquire.documents').setLevel(logging.NOTSET)
+        self._handler = logging.NullHandler()
+        logging.getLogger('xicam').addHandler(self._handler)
+
+        if logger == 'logMessage':
+            self.callback = partial(msg.logMessage, level=msg.DEBUG)
+        else:
+            self.callback = DocumentLogger(level=msg.DEBUG)
+
+        run = compose_run()
+        self.start = run.start_doc
+        descriptor = run.compose_descriptor(
+            name='primary',
+            data_keys={'image': {'dtype': 'array', 'shape': [256, 256], 'source': 'sim'},
+                       'profile': {'dtype': 'array', 'shape': [2048], 'source': 'sim'}})
+        self.events = [descriptor.compose_event(data={'image': np.random.random((256, 256)),
+                                                      'profile': list(range(2048))},
+                                                timestamps={'image': 0, 'profile': 0}, seq_num=i + 1)
+                       for i in range(100)]
+        self.callback('start', self.start)
+        self.callback('descriptor', descriptor.descriptor_doc)
+
+    def teardown(self, logger, debug):
+        logging.getLogger('xicam').removeHandler(self._handler)
+        for name, level in self._levels.items():
+            logging.getLogger(name).setLevel(level)
+
+    def time_100_events(self, logger, debug):
+        for event in self.events:
+            self.callback('event', event)
@@ -0,0 +1,38 @@
+"""
+Cost of database writes on the RunEngine's callback path, with and without the BatchedDocumentWriter.
+"""
+from bluesky import RunEngine
+from bluesky.plans import count
+from ophyd.sim import det
+
+
+class DocumentWriter:
+    params = ['direct', 'batched']
+    param_names = ['writer']
+    timeout = 300
+
+    def setup(self, writer):
+        try:
+            import mongomock
+            from suitcase.mongo_normalized import Serializer
+        except ImportError:
+            raise NotImplementedError('mongomock and suitcase-mongo are required for this benchmark.')
+
+        from xicam.Acquire.callbacks.mongo import BatchedDocumentWriter
+
+        client = mongomock.MongoClient()
+        self.serializer = Serializer(client['mds'], client['fs'])
+        self.RE = RunEngine()
+        if writer == 'batched':
+            self.writer = BatchedDocumentWriter(self.serializer)
+            self.RE.subscribe(self.writer)
+        else:
+            self.writer = None
+            self.RE.subscribe(self.serializer)
+
+    def teardown(self, writer):
+        if self.writer:
+            self.writer.close()
+
+    def time_count_1000(self, writer):
+        self.RE(count([det], num=1000))
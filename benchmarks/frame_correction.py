@@ -0,0 +1,98 @@
+"""
+Per-frame latency and memory allocated by the live frame corrections, on 1k x 2k and 2k x 2k frames.
+
+'areadetector' subtracts a dark; 'fastccd' also decodes the FastCCD's gain bits, zeroes bad pixels and corrects the
+common mode. The 'allocating' variants compute the same corrections the way preprocess did before the in-place
+FrameCorrectionPipeline: with expressions that each allocate a frame.
+"""
+import tracemalloc
+
+import numpy as np
+
+from xicam.Acquire.correction import FrameCorrectionPipeline, BitMask, GainMap, PixelMask, DarkSubtraction, \
+    CommonMode
+
+SHAPES = {'1k x 2k': (1000, 2000), '2k x 2k': (2000, 2000)}
+GAINS = (1, 2, 4, 8)
+
+
+def _frame(shape, seed):
+    random = np.random.default_rng(seed)
+    frame = random.integers(0, 0x1FFF, shape, dtype=np.uint16)
+    frame[random.random(shape) < .01] |= 0x8000  # A few pixels read at another gain
+    return frame
+
+
+def _decode(frame):
+    frame = np.asarray(frame, dtype=np.uint16)
+    return (frame & 0x1FFF) * np.asarray(GAINS, dtype=np.float32)[(frame >> 14) & 0x3]
+
+
+def _allocating_areadetector(dark):
+    def correct(image):
+        flats = np.ones_like(image)
+        return image - dark
+
+    return correct
+
+
+def _allocating_fastccd(dark):
+    def correct(image):
+        flats = np.ones_like(image)
+        images = np.expand_dims(image, 0)
+        corrected = (flats & 0x1FFF) * _decode(images) - _decode(dark)
+        corrected[(images & (1 << 13)) != 0] = 0
+        image = corrected[0]
+        image -= np.tile(image[:10], (image.shape[0] // 10, 1))
+        return image
+
+    return correct
+
+
+def _areadetector(dark):
+    return FrameCorrectionPipeline([DarkSubtraction(lambda: dark)])
+
+
+def _fastccd(dark):
+    # As FastCCDController, whose DarkFrameCache decodes the raw dark frames when they are loaded
+    decoded = _decode(dark)
+    dark_subtraction = DarkSubtraction(lambda: decoded)
+    return FrameCorrectionPipeline([BitMask(0x1FFF), GainMap(GAINS, 14, 0x3), dark_subtraction,
+                                    PixelMask(flag_bits=1 << 13), CommonMode(rows=10)])
+
+
+CORRECTIONS = {'areadetector': _areadetector,
+               'areadetector (allocating)': _allocating_areadetector,
+               'fastccd': _fastccd,
+               'fastccd (allocating)': _allocating_fastccd}
+
+
+class FrameCorrection:
+    params = [list(SHAPES), list(CORRECTIONS)]
+    param_names = ['shape', 'correction']
+    timeout = 300
+
+    def setup(self, shape, correction):
+        self.frames = [_frame(SHAPES[shape], seed) for seed in range(4)]
+        dark = _frame(SHAPES[shape], 4).astype(np.float32)
+        self.correct = CORRECTIONS[correction](dark)
+        self.correct(self.frames[0])  # Buffers are allocated for the first frame of a shape
+
+    def time_frame(self, shape, correction):
+        self.correct(self.frames[1])
+
+    def track_allocated_per_frame(self, shape, correction):
+        # The most memory allocated at once while correcting a frame
+        tracemalloc.start()
+        try:
+            peaks = []
+            for frame in self.frames:
+                tracemalloc.reset_peak()
+                start = tracemalloc.get_traced_memory()[0]
+                self.correct(frame)
+                peaks.append(tracemalloc.get_traced_memory()[1] - start)
+            return max(peaks) / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    track_allocated_per_frame.unit = 'MiB'
@@ -0,0 +1,40 @@
+"""
+Aggregate throughput of plans on disjoint ophyd.sim devices, with one RunEngine lane and with several.
+"""
+import time
+
+from bluesky.plans import count
+from ophyd.sim import det1, det2, det3, det4
+
+from .common import make_run_engine, SignalRecorder
+
+
+class Lanes:
+    params = [1, 2, 4]
+    param_names = ['lanes']
+    timeout = 300
+
+    def setup(self, lanes):
+        self.run_engine = make_run_engine(lanes=lanes)
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+
+    def track_disjoint_plans_per_second(self, lanes):
+        """40 plans of 5 points at 20 ms per point, spread over four detectors."""
+        t0 = time.perf_counter()
+        for i in range(10):
+            for detector in (det1, det2, det3, det4):
+                self.run_engine._enqueue(1, (count([detector], num=5, delay=.02),), {}, devices=[detector])
+        self.finished.wait(40)
+        return 40 / (time.perf_counter() - t0)
+
+    track_disjoint_plans_per_second.unit = 'plans/s'
+
+    def track_shared_device_plans_per_second(self, lanes):
+        """20 plans that all use det1, which must still run one at a time."""
+        t0 = time.perf_counter()
+        for i in range(20):
+            self.run_engine._enqueue(1, (count([det1], num=5, delay=.02),), {}, devices=[det1])
+        self.finished.wait(20)
+        return 20 / (time.perf_counter() - t0)
+
+    track_shared_device_plans_per_second.unit = 'plans/s'
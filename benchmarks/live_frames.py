@@ -0,0 +1,68 @@
+"""
+Live display of a 100 Hz area detector, at 4 and 30 frames per second: frames displayed, frames read again though they
+had already been displayed, and CPU time.
+
+The detector acquires for 2 s, then idles for 1 s. The view is paced like DeviceView's update thread: 'polling' reads
+the plugin's frame each time, as before; 'latest' reads it through LatestFrame, only when the array counter moved.
+Reading a frame copies it, as its transfer over Channel Access would.
+"""
+import threading
+import time
+
+import numpy as np
+
+from xicam.Acquire.liveframes import LatestFrame
+
+from .common import FakeImagePlugin
+
+
+def _acquire(plugin, rate, duration):
+    frame = np.zeros((2048, 2048), dtype=np.uint16)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        frame[0, 0] = plugin.array_counter.get() + 1
+        plugin.publish(frame)
+        time.sleep(1 / rate)
+
+
+class LiveFrames:
+    params = [['polling', 'latest'], [4, 30]]
+    param_names = ['reading', 'max_fps']
+    timeout = 60
+    rate = 100
+    acquiring = 2
+    idle = 1
+
+    def _run(self, reading, max_fps):
+        plugin = FakeImagePlugin((2048, 2048))
+        read = plugin.shaped_image.get if reading == 'polling' else LatestFrame(plugin).read
+        detector = threading.Thread(target=_acquire, args=(plugin, self.rate, self.acquiring), daemon=True)
+
+        counters = []
+        start, cpu_start = time.perf_counter(), time.process_time()
+        detector.start()
+        while time.perf_counter() - start < self.acquiring + self.idle:
+            frame = read()
+            if frame is not None:
+                counters.append(int(frame[0, 0]))
+            time.sleep(1 / max_fps)
+        detector.join()
+        cpu = time.process_time() - cpu_start
+        # What the detector's own thread costs is the same for both
+        return counters, cpu / (time.perf_counter() - start) * 100
+
+    def track_frames_displayed(self, reading, max_fps):
+        return len(set(self._run(reading, max_fps)[0]))
+
+    track_frames_displayed.unit = 'frames'
+
+    def track_redundant_reads(self, reading, max_fps):
+        counters = self._run(reading, max_fps)[0]
+        return len(counters) - len(set(counters))
+
+    track_redundant_reads.unit = 'frames'
+
+    def track_cpu_percent(self, reading, max_fps):
+        return self._run(reading, max_fps)[1]
+
+    track_cpu_percent.unit = '%'
@@ -0,0 +1,73 @@
+"""
+Memory allocated, and time taken, to take a live frame from the image plugin to the image view, background corrected.
+
+'before' reads the frame as ImagePlugin.shaped_image does and corrects it as preprocess did before the
+FrameCorrectionPipeline (a flat of ones, then a float64 dark subtracted); 'after' reads it through LatestFrame and
+corrects it on the pooled buffers of a TiledFrameCorrector. Allocations are reported in frames, the size of a raw
+frame: the array Channel Access fills is one of them, in both.
+"""
+import tracemalloc
+
+import numpy as np
+
+from xicam.Acquire.correction import FrameCorrectionPipeline, TiledFrameCorrector, DarkSubtraction
+from xicam.Acquire.liveframes import LatestFrame
+
+from .common import FakeImagePlugin
+
+SHAPES = {'2k x 2k': (2048, 2048), '4k x 4k': (4096, 4096)}
+
+
+def _before(plugin, dark):
+    dark = dark.astype(np.float64)  # As get_dark averaged it
+
+    def live_frame():
+        image = plugin.shaped_image.get()
+        flats = np.ones_like(image)
+        return image - dark
+
+    return live_frame
+
+
+def _after(plugin, dark):
+    latest_frame = LatestFrame(plugin)
+    correction = TiledFrameCorrector(FrameCorrectionPipeline([DarkSubtraction(lambda: dark)]))
+
+    def live_frame():
+        plugin.array_counter.put(plugin.array_counter.get() + 1)  # A new frame, for LatestFrame to read
+        return correction(latest_frame.read())
+
+    return live_frame
+
+
+class LivePath:
+    params = [list(SHAPES), ['before', 'after']]
+    param_names = ['shape', 'path']
+    timeout = 300
+
+    def setup(self, shape, path):
+        shape = SHAPES[shape]
+        self.plugin = FakeImagePlugin(shape)
+        self.plugin.publish(np.random.default_rng(0).integers(0, 0x1FFF, shape, dtype=np.uint16))
+        dark = np.full(shape, 100, dtype=np.float32)
+        self.live_frame = (_before if path == 'before' else _after)(self.plugin, dark)
+        self.live_frame()  # Buffers are allocated for the first frame of a shape
+
+    def time_frame(self, shape, path):
+        self.live_frame()
+
+    def track_allocated_per_frame(self, shape, path):
+        # The most memory allocated at once for a frame, in raw frames
+        tracemalloc.start()
+        try:
+            peaks = []
+            for _ in range(3):
+                tracemalloc.reset_peak()
+                start = tracemalloc.get_traced_memory()[0]
+                self.live_frame()
+                peaks.append(tracemalloc.get_traced_memory()[1] - start)
+            return max(peaks) / self.plugin.array_data.get().nbytes
+        finally:
+            tracemalloc.stop()
+
+    track_allocated_per_frame.unit = 'frames'
@@ -0,0 +1,25 @@
+"""
+Overhead of recording the timing of every Msg (MessageTracer) on a 10,000-point ophyd.sim scan.
+"""
+from bluesky import RunEngine
+from bluesky.plans import scan
+from ophyd.sim import det, motor
+
+from xicam.Acquire.msgtrace import MessageTracer
+
+
+class MessageTraceOverhead:
+    params = [False, True]
+    param_names = ['traced']
+    number = 1
+    repeat = 3
+    timeout = 1200
+
+    def setup(self, traced):
+        self.run_engine = RunEngine(context_managers=[])
+        if traced:
+            self.tracer = MessageTracer()
+            self.tracer.install(self.run_engine)
+
+    def time_scan_10000_points(self, traced):
+        self.run_engine(scan([det], motor, -1, 1, 10000))
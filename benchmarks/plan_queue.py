@@ -0,0 +1,36 @@
+"""
+Throughput of the persistent plan queue: enqueueing (one at a time and batched) and dequeueing.
+"""
+import os
+import tempfile
+
+from xicam.Acquire.planqueue import PersistentPlanQueue
+
+
+class PlanQueueThroughput:
+    timeout = 300
+
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = PersistentPlanQueue(os.path.join(self.directory.name, 'plan_queue.sqlite'))
+        self.submissions = [(i % 3, ('plan',), {'sample': f'sample {i}', 'index': i}) for i in range(10000)]
+
+    def teardown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    def time_put_1000(self):
+        for submission in self.submissions[:1000]:
+            self.queue.put(*submission)
+
+    def time_put_many_10000(self):
+        self.queue.put_many(self.submissions)
+
+    def time_put_many_get_10000(self):
+        self.queue.put_many(self.submissions)
+        for _ in range(10000):
+            self.queue.task_done(self.queue.get())
+
+    def time_restore_10000(self):
+        self.queue.put_many(self.submissions)
+        PersistentPlanQueue(os.path.join(self.directory.name, 'plan_queue.sqlite')).close()
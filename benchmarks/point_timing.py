@@ -0,0 +1,42 @@
+"""
+Per-point time breakdown and efficiency (exposure over wall time) of step scans against simulated devices.
+"""
+from bluesky import RunEngine
+from bluesky.plans import scan, grid_scan
+from ophyd.sim import SynAxis, SynGauss
+
+from xicam.Acquire.msgtrace import MessageTracer
+
+
+class PointTiming:
+    params = ['scan', 'grid_scan']
+    param_names = ['plan']
+    timeout = 300
+
+    def setup(self, plan):
+        self.run_engine = RunEngine(context_managers=[])
+        self.tracer = MessageTracer()
+        self.tracer.install(self.run_engine)
+
+        # A 10 ms exposure, and motors that take 5 ms to move and 5 ms to settle
+        self.motor1 = SynAxis(name='motor1', delay=.005)
+        self.motor2 = SynAxis(name='motor2', delay=.005)
+        self.motor1.settle_time = self.motor2.settle_time = .005
+        self.detector = SynGauss('detector', self.motor1, 'motor1', center=0, Imax=1)
+        self.detector.val.exposure_time = .01
+
+        if plan == 'scan':
+            self.run_engine(scan([self.detector], self.motor1, -1, 1, 100))
+        else:
+            self.run_engine(grid_scan([self.detector], self.motor1, -1, 1, 10, self.motor2, -1, 1, 10))
+
+    def track_efficiency(self, plan):
+        return self.tracer.efficiency() * 100
+
+    track_efficiency.unit = '%'
+
+    def track_dead_time_per_point(self, plan):
+        points = self.tracer.points
+        return sum(point['wall'] - point['exposure'] for point in points) / len(points) * 1e3
+
+    track_dead_time_per_point.unit = 'ms'
@@ -0,0 +1,50 @@
+"""
+Dead time between back-to-back queued plans, with and without the prefetch stage.
+"""
+import time
+
+from bluesky.plans import count
+from ophyd.sim import SynGauss, motor
+
+from .common import make_run_engine, SignalRecorder
+
+
+class LazilyConnectingDetector(SynGauss):
+    """A simulated detector that, like an EPICS device, pays for its first connection on first use."""
+    connect_time = .2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._connected = False
+
+    def _connect(self):
+        if not self._connected:
+            time.sleep(self.connect_time)
+            self._connected = True
+
+    def wait_for_connection(self, *args, **kwargs):
+        self._connect()
+
+    def describe(self):
+        self._connect()
+        return super().describe()
+
+
+class Prefetch:
+    params = [False, True]
+    param_names = ['prefetch']
+    timeout = 300
+
+    def setup(self, prefetch):
+        self.run_engine = make_run_engine(prefetch=prefetch)
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+
+    def track_dead_time_between_runs(self, prefetch):
+        """Median time from one run finishing to the next recording data; every plan uses a new detector."""
+        for i in range(10):
+            detector = LazilyConnectingDetector(f'det{i}', motor, 'motor', center=0, Imax=1)
+            self.run_engine._enqueue(1, (count([detector], num=5, delay=.1),), {})
+        self.finished.wait(10)
+        return self.run_engine.dead_time_stats()['median'] * 1e3
+
+    track_dead_time_between_runs.unit = 'ms'
@@ -0,0 +1,76 @@
+"""
+Event throughput and timing jitter of a RunEngine in a thread of the GUI process versus in a child process.
+
+The GUI load is pure-Python work on the main thread, standing in for rendering and image preprocessing that hold the
+GIL while a plan runs.
+"""
+from functools import partial
+
+import numpy as np
+from bluesky.plans import count
+from ophyd.sim import SynSignal
+
+from .common import make_run_engine, SignalRecorder, get_application
+
+
+def detector_count(num, delay=None, shape=()):
+    """A count of a simulated detector producing arrays of ``shape`` (a scalar if empty)."""
+    if shape:
+        detector = SynSignal(func=partial(np.full, shape, 1.), name='image')
+    else:
+        detector = SynSignal(func=lambda: 1., name='scalar')
+    return count([detector], num=num, delay=delay)
+
+
+class _RunEngineModes:
+    timeout = 600
+
+    def _setup(self, mode):
+        self.run_engine = make_run_engine(process=mode == 'process')
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+        self.event_times = []
+        self.run_engine.subscribe(lambda name, doc: self.event_times.append(doc['time']), 'event')
+
+    def teardown(self, *args):
+        self.run_engine._close_RE()
+
+    def _run(self, mode, plan, gui_load=False):
+        # In process mode the plan is built in the child
+        self.run_engine._enqueue(1, (plan if mode == 'process' else plan(),), {})
+        if gui_load:
+            application = get_application()
+            while not self.finished.times:
+                sum(i * i for i in range(20000))
+                application.processEvents()
+        self.finished.wait(1)
+
+
+class EventThroughput(_RunEngineModes):
+    params = (['thread', 'process'], ['scalar', '1024x1024'])
+    param_names = ['run_engine', 'detector']
+
+    def setup(self, mode, detector):
+        self._setup(mode)
+
+    def track_events_per_second(self, mode, detector):
+        shape = (1024, 1024) if detector == '1024x1024' else ()
+        num = 200 if shape else 2000
+        self._run(mode, partial(detector_count, num, shape=shape))
+        return (len(self.event_times) - 1) / (self.event_times[-1] - self.event_times[0])
+
+    track_events_per_second.unit = 'events/s'
+
+
+class EventJitter(_RunEngineModes):
+    params = (['thread', 'process'], [False, True])
+    param_names = ['run_engine', 'gui_load']
+
+    def setup(self, mode, gui_load):
+        self._setup(mode)
+
+    def track_interval_jitter(self, mode, gui_load):
+        """Standard deviation of the interval between events of a count with a 10 ms delay."""
+        self._run(mode, partial(detector_count, 200, delay=.01), gui_load)
+        return float(np.std(np.diff(self.event_times))) * 1e3
+
+    track_interval_jitter.unit = 'ms'
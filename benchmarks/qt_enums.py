@@ -0,0 +1,58 @@
+"""
+Cost of promoting Qt enums to unscoped names, searched for at each launch or loaded from the cache.
+"""
+import os
+import shutil
+import tempfile
+
+from qtpy import QtCore, QtGui, QtWidgets
+
+from xicam.Acquire.startup import import_times
+
+MODULES = {'QtCore': QtCore, 'QtGui': QtGui, 'QtWidgets': QtWidgets}
+
+
+class EnumPromotion:
+    def setup(self):
+        from xicam.Acquire import patches
+        self.patches = patches
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'aliases.json')
+        patches.promote_enums_cached(MODULES, self.path)
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def time_search(self):
+        for module in MODULES.values():
+            self.patches.promote_enums(module)
+
+    def time_cached(self):
+        self.patches.promote_enums_cached(MODULES, self.path)
+
+
+class PatchesImport:
+    """Cold import of xicam.Acquire.patches, without (first launch) and with the alias cache."""
+    params = [False, True]
+    param_names = ['cached']
+    timeout = 300
+    number = 1
+    repeat = 3
+
+    def setup(self, cached):
+        self.directory = tempfile.mkdtemp()
+        # appdirs puts the user cache under XDG_CACHE_HOME
+        self.env = dict(os.environ, XDG_CACHE_HOME=self.directory)
+        if cached:
+            import_times('xicam.Acquire.patches', env=self.env)
+
+    def teardown(self, cached):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def track_import_time(self, cached):
+        if not cached:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        times = import_times('xicam.Acquire.patches', env=self.env)
+        return next(cumulative for name, _, cumulative in times if name == 'xicam.Acquire.patches') * 1e3
+
+    track_import_time.unit = 'ms'
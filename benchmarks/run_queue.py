@@ -0,0 +1,71 @@
+"""
+Plan dispatch latency of QRunEngine: time from enqueuing a plan to the sigStart signal.
+"""
+import time
+
+from bluesky.plans import count
+from ophyd.sim import det
+
+from .common import make_run_engine, SignalRecorder
+
+
+class QueueDispatch:
+    timeout = 300
+
+    def setup(self):
+        self.run_engine = make_run_engine()
+        self.started = SignalRecorder(self.run_engine.sigStart)
+        self.finished = SignalRecorder(self.run_engine.sigFinish)
+
+    def track_put_to_start_single(self):
+        enqueued = []
+        for i in range(20):
+            enqueued.append(time.perf_counter())
+            self.run_engine._enqueue(1, (count([det]),), {})
+            self.finished.wait(i + 1)
+        latencies = [start - put for put, start in zip(enqueued, self.started.times)]
+        return sorted(latencies)[len(latencies) // 2] * 1e3
+
+    track_put_to_start_single.unit = 'ms'
+
+    def track_burst_1000_dispatch_gap(self):
+        """Median idle time between one plan finishing and the next starting while 1,000 plans are queued."""
+        for _ in range(1000):
+            self.run_engine._enqueue(1, (count([det]),), {})
+        self.started.wait(1000)
+        self.finished.wait(1000)
+        gaps = [start - finish for finish, start in zip(self.finished.times, self.started.times[1:])]
+        return sorted(gaps)[len(gaps) // 2] * 1e3
+
+    track_burst_1000_dispatch_gap.unit = 'ms'
+
+    def track_burst_1000_plans_per_second(self):
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            self.run_engine._enqueue(1, (count([det]),), {})
+        self.finished.wait(1000)
+        return 1000 / (time.perf_counter() - t0)
+
+    track_burst_1000_plans_per_second.unit = 'plans/s'
+
+
+class BatchSubmission:
+    timeout = 300
+
+    def setup(self):
+        from xicam.Acquire.plans.planitem import PlanItem
+
+        self.run_engine = make_run_engine()
+        self.planitem = PlanItem('count', '', code='from bluesky.plans import count\n'
+                                                    'from ophyd.sim import det\n'
+                                                    'plan = list(count([det]))')
+
+    def teardown(self):
+        self.run_engine.queue.clear()
+
+    def track_put_batch_1000_submissions_per_second(self):
+        t0 = time.perf_counter()
+        self.run_engine.put_batch([(self.planitem, None, {'sample_name': f'point {i}'}) for i in range(1000)])
+        return 1000 / (time.perf_counter() - t0)
+
+    track_put_batch_1000_submissions_per_second.unit = 'submissions/s'
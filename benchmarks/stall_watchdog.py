@@ -0,0 +1,64 @@
+"""
+How well the GUI stall watchdog measures and attributes blocking of the main thread, and what it costs when idle.
+"""
+import time
+
+from xicam.Acquire.watchdog import StallWatchdog
+
+from .common import get_application, wait_for
+
+
+def _block(duration):
+    time.sleep(duration)
+
+
+class StallWatchdogAccuracy:
+    params = [.15, .5]
+    param_names = ['stall']
+    timeout = 120
+
+    def setup(self, stall):
+        get_application()
+        self.watchdog = StallWatchdog()
+        self.watchdog.start()
+        self.detected = []
+        self.watchdog.sigStall.connect(lambda duration, site: self.detected.append((duration, site)))
+
+    def teardown(self, stall):
+        self.watchdog.stop()
+
+    def _stall(self, stall, repeat=5):
+        for index in range(repeat):
+            settled = time.perf_counter() + .1  # Let the heartbeat settle
+            wait_for(lambda: time.perf_counter() > settled)
+            _block(stall)
+            wait_for(lambda: len(self.detected) > index)
+
+    def track_duration_error(self, stall):
+        self._stall(stall)
+        return max(abs(duration - stall) for duration, _ in self.detected) * 1e3
+
+    track_duration_error.unit = 'ms'
+
+    def track_attributed(self, stall):
+        self._stall(stall)
+        return sum(site.startswith('_block ') for _, site in self.detected) / len(self.detected) * 100
+
+    track_attributed.unit = '%'
+
+
+class StallWatchdogIdle:
+    timeout = 60
+
+    def setup(self):
+        get_application()
+        self.watchdog = StallWatchdog()
+
+    def teardown(self):
+        self.watchdog.stop()
+
+    def time_idle_event_loop(self):
+        # One second of event loop with the heartbeat running; compare to the ~1 s of doing nothing
+        self.watchdog.start()
+        deadline = time.perf_counter() + 1
+        wait_for(lambda: time.perf_counter() > deadline)
@@ -0,0 +1,15 @@
+"""
+Cold import time of the plugin, measured in a fresh interpreter.
+"""
+from xicam.Acquire.startup import import_times
+
+
+class ColdImport:
+    timeout = 300
+    number = 1
+    repeat = 3
+
+    def track_import_time(self):
+        return next(cumulative for name, _, cumulative in import_times('xicam.Acquire') if name == 'xicam.Acquire')
+
+    track_import_time.unit = 's'
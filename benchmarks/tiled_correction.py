@@ -0,0 +1,94 @@
+"""
+Frames per second of the FastCCD correction on 2k x 2k frames with 1, 4 and 16 worker threads, and how responsive the
+GUI stays meanwhile.
+
+Frames are corrected one after another on a thread of their own, as DeviceView's update thread does, and each
+corrected frame is handed to the main thread, as to the image view. The GUI's responsiveness is how late a 10 ms timer
+on the main thread fires, at most.
+"""
+import threading
+import time
+
+import numpy as np
+from qtpy.QtCore import QObject, QTimer, Signal
+
+from xicam.Acquire.correction import TiledFrameCorrector
+
+from .common import get_application, wait_for
+from .frame_correction import SHAPES, _fastccd, _frame
+
+
+class _View(QObject):
+    """Stands in for the image view: counts the frames handed to it, on the main thread."""
+    sigFrame = Signal(object)
+
+    def __init__(self):
+        super(_View, self).__init__()
+        self.displayed = 0
+        self.sigFrame.connect(self.display)
+
+    def display(self, frame):
+        self.displayed += 1
+
+
+class TiledCorrection:
+    params = [1, 4, 16]
+    param_names = ['workers']
+    timeout = 120
+    duration = 3
+
+    def setup(self, workers):
+        get_application()
+        shape = SHAPES['2k x 2k']
+        self.frames = [_frame(shape, seed) for seed in range(4)]
+        self.corrector = TiledFrameCorrector(_fastccd(_frame(shape, 4).astype(np.float32)), workers=workers)
+        self.corrector(self.frames[0])  # Buffers are allocated for the first frame of a shape
+
+    def teardown(self, workers):
+        self.corrector.close()
+
+    def _run(self):
+        view = _View()
+        lateness = []
+        interval = .01
+        last = [time.perf_counter()]
+
+        def beat():
+            now = time.perf_counter()
+            lateness.append(now - last[0] - interval)
+            last[0] = now
+
+        timer = QTimer()
+        timer.setInterval(int(interval * 1e3))
+        timer.timeout.connect(beat)
+        timer.start()
+
+        done = threading.Event()
+        handed = []
+
+        def update():
+            index = 0
+            while not done.is_set():
+                view.sigFrame.emit(self.corrector(self.frames[index % len(self.frames)]))
+                index += 1
+            handed.append(index)
+
+        updater = threading.Thread(target=update, daemon=True)
+        start = time.perf_counter()
+        updater.start()
+        wait_for(lambda: time.perf_counter() - start > self.duration)
+        done.set()
+        updater.join()
+        wait_for(lambda: view.displayed == handed[0])  # The view must outlive the frames handed to it
+        timer.stop()
+        return view.displayed / (time.perf_counter() - start), max(lateness)
+
+    def track_frames_per_second(self, workers):
+        return self._run()[0]
+
+    track_frames_per_second.unit = 'frames/s'
+
+    def track_gui_lag_max(self, workers):
+        return self._run()[1] * 1e3
+
+    track_gui_lag_max.unit = 'ms'
@@ -0,0 +1,75 @@
+"""
+Replaying long plans in virtual time: how much faster than real time, and how closely the projected duration
+matches the time the plan spends waiting.
+"""
+from bluesky import plan_stubs as bps
+from bluesky.plans import scan
+
+from xicam.Acquire.sim import VirtualClock, VirtualPositioner, VirtualDetector, replay
+
+from .common import make_run_engine
+
+
+def labview_plan(detector, monitors, polls):
+    """The LabView-coupled acquisition pattern: read monitors once a second until a long exposure is done."""
+    yield from bps.open_run()
+    yield from bps.stage(detector)
+    status = yield from bps.trigger(detector, group='primary-trigger')
+    for _ in range(polls):
+        if status.done:
+            break
+        yield from bps.trigger_and_read(monitors, name='labview')
+        yield from bps.sleep(1)
+    yield from bps.wait('primary-trigger')
+    yield from bps.create('primary')
+    yield from bps.read(detector)
+    yield from bps.save()
+    yield from bps.unstage(detector)
+    yield from bps.close_run()
+
+
+class VirtualTimeReplay:
+    timeout = 600
+    number = 1
+    repeat = 1
+
+    def setup(self):
+        self.clock = VirtualClock()
+        self.run_engine = make_run_engine(loop_factory=lambda: self.clock, prefetch=False)
+        self.motor = VirtualPositioner(name='motor', clock=self.clock, velocity=.5, settle_time=.5)
+        self.detector = VirtualDetector(name='detector', clock=self.clock, exposure_time=8, readout_time=1)
+        self.monitor = VirtualDetector(name='monitor', clock=self.clock, exposure_time=.1)
+
+    def teardown(self):
+        self.run_engine._close_RE()
+
+    def _scan(self):
+        # Two hours: 720 points of 9 s acquisitions, 0.5 s moves and 0.5 s settling
+        return replay(self.run_engine, self.clock, scan([self.detector], self.motor, 0, 179.75, 720), timeout=600)
+
+    def _labview(self):
+        # A 30 minute exposure, with the monitors read every ~1.1 s
+        self.detector.exposure_time.put(1800)
+        return replay(self.run_engine, self.clock, labview_plan(self.detector, [self.monitor], 3600), timeout=600)
+
+    def track_scan_speedup(self):
+        real, projected = self._scan()
+        return projected / real
+
+    track_scan_speedup.unit = 'x'
+
+    def track_scan_projected_duration(self):
+        return self._scan().projected / 60
+
+    track_scan_projected_duration.unit = 'min'
+
+    def track_labview_speedup(self):
+        real, projected = self._labview()
+        return projected / real
+
+    track_labview_speedup.unit = 'x'
+
+    def track_labview_projected_duration(self):
+        return self._labview().projected / 60
+
+    track_labview_projected_duration.unit = 'min'
@@ -0,0 +1,23 @@
+import os
+
+# The modules under test import Qt; no display is needed
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pytest
+
+
+@pytest.fixture
+def run_engine_factory():
+    """Makes QRunEngines as the benchmarks do (see benchmarks.common.make_run_engine), and closes them afterwards."""
+    from benchmarks.common import make_run_engine
+
+    run_engines = []
+
+    def factory(**kwargs):
+        run_engine = make_run_engine(**kwargs)
+        run_engines.append(run_engine)
+        return run_engine
+
+    yield factory
+    for run_engine in run_engines:
+        run_engine._close_RE()
@@ -0,0 +1,136 @@
+import threading
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky import RunEngine
+from bluesky.plans import count
+from ophyd.sim import det
+
+from benchmarks.common import SignalRecorder, wait_for
+from xicam.Acquire import catraffic
+from xicam.Acquire.catraffic import CATraffic, CATrafficRecorder
+from xicam.Acquire.summarystreams import read_summary
+
+
+class FakePV:
+    """The methods of a control layer's PV class that CATraffic instruments."""
+
+    def __init__(self, pvname):
+        self.pvname = pvname
+
+    def get_with_metadata(self, **kwargs):
+        return {'value': 1}
+
+    def put(self, value, callback=None, wait=False, **kwargs):
+        if callback is not None:
+            callback()
+
+    def run_callbacks(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def traffic(monkeypatch):
+    # Instrument a class of our own rather than the control layer's
+    pv_class = type('PV', (FakePV,), dict())
+    monkeypatch.setattr(catraffic, '_control_layer_pv_class', lambda: pv_class)
+    traffic = CATraffic()
+    traffic.install()
+    assert traffic.installed is pv_class
+    return traffic
+
+
+def _counts(traffic, owner=None, snapshot=None):
+    return {pv.pop('pv'): {key: value for key, value in pv.items() if not key.endswith('_time')}
+            for pv in traffic.since(snapshot, owner)}
+
+
+def test_requests_are_counted_per_owner(traffic):
+    pv = traffic.installed('XF:PV')
+
+    def lane():
+        traffic.own(0)
+        pv.get_with_metadata()
+        pv.put(1, callback=lambda: None)
+        pv.put(2, wait=True)
+
+    thread = threading.Thread(target=lane)
+    thread.start()
+    thread.join()
+    pv.get_with_metadata()  # Not owned, as the GUI's
+    pv.run_callbacks()  # A monitor update
+
+    assert _counts(traffic, owner=0) == {'XF:PV': {'gets': 1, 'puts': 2, 'put_completions': 2, 'monitors': 0}}
+    assert _counts(traffic) == {'XF:PV': {'gets': 2, 'puts': 2, 'put_completions': 2, 'monitors': 1}}
+
+
+def test_traffic_since_a_snapshot(traffic):
+    first, second = traffic.installed('first'), traffic.installed('second')
+    first.get_with_metadata()
+    snapshot = traffic.snapshot()
+    second.get_with_metadata()
+    second.put(1)
+
+    assert _counts(traffic, snapshot=snapshot) == {'second': {'gets': 1, 'puts': 1, 'put_completions': 0,
+                                                              'monitors': 0}}
+    # Installing again does not wrap the methods twice
+    traffic.install()
+    first.get_with_metadata()
+    assert _counts(traffic, snapshot=snapshot)['first']['gets'] == 1
+
+
+def _ca_traffic_summaries(run_engine):
+    summaries = []
+    descriptors = dict()
+
+    def record(name, doc):
+        if name == 'descriptor':
+            descriptors[doc['uid']] = doc
+        elif name == 'event' and descriptors[doc['descriptor']]['name'] == 'ca_traffic':
+            summaries.append(read_summary(descriptors[doc['descriptor']], doc))
+
+    run_engine.subscribe(record)
+    return summaries
+
+
+def _reading_plan(pv, reads):
+    yield from bps.open_run()
+    for _ in range(reads):
+        pv.get_with_metadata()
+        yield from bps.null()
+    yield from bps.close_run()
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_recorder_stream(traffic, enabled):
+    run_engine = RunEngine(context_managers=[])
+    CATrafficRecorder(traffic, enabled=enabled).install(run_engine)
+    summaries = _ca_traffic_summaries(run_engine)
+    pv = traffic.installed('XF:PV')
+    pv.get_with_metadata()  # Before the run
+
+    run_engine(_reading_plan(pv, 3))
+    if enabled:
+        summary, = summaries
+        assert [(pv['pv'], pv['gets']) for pv in summary] == [('XF:PV', 3)]
+    else:
+        assert not summaries
+
+
+def test_counting_is_off_by_default(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    ready = SignalRecorder(run_engine.sigReady)
+    streams = []
+    run_engine.subscribe(lambda name, doc: streams.append(doc['name']), 'descriptor')
+
+    run_engine._enqueue(1, (count([det]),), {})
+    wait_for(lambda: ready.times, timeout=10)
+    assert not run_engine.count_ca_traffic
+    assert not run_engine.plan_ca_traffic
+    assert 'ca_traffic' not in streams
+
+    run_engine.set_ca_traffic_counting(True)
+    run_engine._enqueue(1, (count([det]),), {})
+    wait_for(lambda: len(ready.times) == 2, timeout=10)
+    assert len(run_engine.plan_ca_traffic) == 1
+    assert 'ca_traffic' in streams
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from xicam.Acquire.correction import FrameCorrectionPipeline, TiledFrameCorrector, CorrectionStage, BitMask, GainMap, \
+    PixelMask, DarkSubtraction, FlatField, CommonMode, _Reference
+
+GAINS = (1, 2, 4, 8)
+SHAPE = (40, 32)
+
+
+def _frame(seed):
+    random = np.random.default_rng(seed)
+    frame = random.integers(0, 0x1FFF, SHAPE, dtype=np.uint16)
+    frame[random.random(SHAPE) < .05] |= 0x8000  # Read at another gain
+    frame[random.random(SHAPE) < .05] |= 1 << 13  # Bad pixels
+    return frame
+
+
+def _decode(frame):
+    frame = np.asarray(frame, dtype=np.uint16)
+    return (frame & 0x1FFF) * np.asarray(GAINS, dtype=np.float32)[(frame >> 14) & 0x3]
+
+
+# The corrections as the controllers computed them before the pipeline
+def _areadetector_expression(image, dark):
+    return image - dark
+
+
+def _fastccd_expression(image, dark):
+    flats = np.ones_like(image)
+    images = np.expand_dims(image, 0)
+    corrected = (flats & 0x1FFF) * _decode(images) - dark
+    corrected[(images & (1 << 13)) != 0] = 0
+    image = corrected[0]
+    image -= np.tile(image[:10], (image.shape[0] // 10, 1))
+    return image
+
+
+def _areadetector(dark):
+    return FrameCorrectionPipeline([DarkSubtraction(lambda: dark)])
+
+
+def _fastccd(dark):
+    return FrameCorrectionPipeline([BitMask(0x1FFF), GainMap(GAINS, 14, 0x3), DarkSubtraction(lambda: dark),
+                                    PixelMask(flag_bits=1 << 13), CommonMode(rows=10)])
+
+
+CORRECTIONS = {'areadetector': (_areadetector, _areadetector_expression),
+               'fastccd': (_fastccd, _fastccd_expression)}
+
+
+@pytest.fixture(params=list(CORRECTIONS))
+def correction(request):
+    pipeline, expression = CORRECTIONS[request.param]
+    dark = _decode(_frame(100)) if request.param == 'fastccd' else _frame(100).astype(np.float32)
+    return pipeline(dark), lambda image: expression(image, dark)
+
+
+def test_pipeline_matches_expressions(correction):
+    pipeline, expression = correction
+    for seed in range(3):  # Buffers are reused after the first frame
+        image = _frame(seed)
+        np.testing.assert_allclose(pipeline(image), expression(image), rtol=1e-6)
+
+
+@pytest.mark.parametrize('workers', [None, 1, 4])
+def test_tiled_matches_pipeline(correction, workers):
+    pipeline, expression = correction
+    reference = FrameCorrectionPipeline(pipeline.stages)
+    corrector = TiledFrameCorrector(pipeline, workers=workers)
+    try:
+        for seed in range(3):
+            image = _frame(seed)
+            np.testing.assert_array_equal(corrector(image), reference(image))
+    finally:
+        corrector.close()
+
+
+def test_output_buffers_are_reused():
+    pipeline = FrameCorrectionPipeline([DarkSubtraction(lambda: None)], frames=2)
+    first, second, third = (pipeline(_frame(seed)) for seed in range(3))
+    assert first is third and first is not second
+    assert first.dtype == np.float32
+
+
+def test_reference_of_another_shape_is_skipped():
+    dark = np.ones((4, 4), dtype=np.float32)
+    image = _frame(0)
+    np.testing.assert_array_equal(_areadetector(dark)(image), image)
+
+
+def test_reference_is_prepared_once():
+    flat = np.full(SHAPE, 2, dtype=np.float32)
+    flat[0, 0] = 0
+    prepared = []
+
+    def prepare(reference):
+        prepared.append(reference)
+        return reference
+
+    pipeline = FrameCorrectionPipeline([FlatField(lambda: flat, prepare=prepare)])
+    for seed in range(3):
+        image = _frame(seed)
+        expected = image / np.float32(2)
+        expected[0, 0] = 0
+        np.testing.assert_allclose(pipeline(image), expected, rtol=1e-6)
+    assert len(prepared) == 1
+
+
+def test_stages_must_implement_apply():
+    class Incomplete(CorrectionStage):
+        pass
+
+    class IncompleteReference(_Reference):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        IncompleteReference(lambda: None)
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from ophyd import Component as Cpt, Device, Signal
+
+from xicam.Acquire.callbacks.darkframes import DarkFrameCache
+
+
+class FakeCam(Device):
+    acquire_time = Cpt(Signal, value=.1)
+    gain = Cpt(Signal, value=1)
+
+
+class FakeDetector(Device):
+    cam = Cpt(FakeCam, 'cam')
+
+
+class StoredDarkFrameCache(DarkFrameCache):
+    """Reads the dark frames of a run from a dict, instead of a catalog."""
+
+    def __init__(self, device, runs, **kwargs):
+        super(StoredDarkFrameCache, self).__init__(device, **kwargs)
+        self.runs = runs
+
+    def _read_darks(self, uid):
+        return self.runs[uid]
+
+
+@pytest.fixture
+def detector():
+    return FakeDetector(name='fake')
+
+
+def _documents(detector, uid, acquire_time, exit_status='success'):
+    descriptor = {'name': 'dark', 'run_start': uid, 'data_keys': {'fake_image': {}},
+                  'configuration': {'fake': {'data': {'fake_cam_acquire_time': acquire_time, 'fake_cam_gain': 1}}}}
+    return [('descriptor', descriptor), ('stop', {'run_start': uid, 'exit_status': exit_status})]
+
+
+def _run(cache, documents):
+    for name, doc in documents:
+        cache(name, doc)
+
+
+def test_darks_are_decoded_and_averaged(detector):
+    frames = np.array([[[1, 2], [3, 4]], [[3, 4], [5, 6]]], dtype=np.uint16)
+    decoded = []
+
+    def decode(frame):
+        decoded.append(frame)
+        return frame.astype(np.float32) * 2
+
+    cache = StoredDarkFrameCache(detector, {'run': frames}, decode=decode)
+    _run(cache, _documents(detector, 'run', .1))
+
+    dark = cache.get()
+    assert len(decoded) == 2
+    np.testing.assert_array_equal(dark, [[4, 6], [8, 10]])
+    assert dark.dtype == np.float32
+    assert not dark.flags.writeable
+
+
+def test_get_matches_the_current_settings(detector):
+    frames = np.ones((2, 2, 2), dtype=np.uint16)
+    cache = StoredDarkFrameCache(detector, {'short': frames, 'long': frames * 3})
+    _run(cache, _documents(detector, 'short', .1))
+    _run(cache, _documents(detector, 'long', 1.))
+
+    detector.cam.acquire_time.put(.1)
+    assert cache.get()[0, 0] == 1
+    detector.cam.acquire_time.put(1.)
+    assert cache.get()[0, 0] == 3
+    detector.cam.acquire_time.put(10.)
+    assert cache.get() is None
+
+
+def test_oldest_darks_are_dropped(detector):
+    runs = {str(index): np.full((1, 2, 2), index, dtype=np.uint16) for index in range(3)}
+    cache = StoredDarkFrameCache(detector, runs, max_entries=2)
+    for uid in runs:
+        cache.load(uid, settings=(None, None))
+
+    assert [uid for uid, _ in cache._darks] == ['1', '2']
+    assert cache.get()[0, 0] == 2
+
+
+def test_documents_are_flushed_before_reading(detector):
+    flushes = []
+
+    def flush(timeout):
+        flushes.append(timeout)
+        return True
+
+    cache = StoredDarkFrameCache(detector, {'run': np.ones((1, 2, 2))}, flush=flush, flush_timeout=5)
+    detector.cam.acquire_time.put(.1)
+    _run(cache, _documents(detector, 'run', .1))
+    assert flushes == [5]
+    assert cache.get() is not None
+
+
+def test_failed_runs_are_not_loaded(detector):
+    cache = StoredDarkFrameCache(detector, {'run': np.ones((1, 2, 2))})
+    _run(cache, _documents(detector, 'run', .1, exit_status='abort'))
+    assert cache.get() is None
+
+
+def test_failed_load_returns_none(detector):
+    cache = StoredDarkFrameCache(detector, dict())
+    assert cache.load('missing') is None
+    assert cache.get() is None
@@ -0,0 +1,50 @@
+from bluesky.plans import count, scan
+from ophyd.sim import det, motor, motor1, motor2
+
+from xicam.Acquire.devicelocks import DeviceLockManager, device_names, infer_devices
+
+
+def test_device_names():
+    assert device_names([motor1, motor1.readback, 'det']) == {'motor1', 'det'}
+
+
+def test_lanes_share_only_free_devices():
+    locks = DeviceLockManager()
+    assert locks.try_acquire(0, device_names([motor1, det]))
+    assert not locks.try_acquire(1, device_names([motor1]))
+    assert locks.try_acquire(1, device_names([motor2]))
+    assert locks.owners == {'motor1': 0, 'det': 0, 'motor2': 1}
+
+    locks.release(0)
+    assert locks.try_acquire(2, device_names([motor1]))
+    assert locks.owners == {'motor1': 2, 'motor2': 1}
+
+
+def test_unknown_devices_are_exclusive():
+    locks = DeviceLockManager()
+    assert locks.try_acquire(0, device_names([motor1]))
+    assert not locks.try_acquire(1, None)
+
+    locks.release(0)
+    assert locks.try_acquire(1, None)
+    assert locks.owners == {None: 1}
+    assert not locks.try_acquire(0, device_names([motor2]))
+
+    locks.release(1)
+    assert locks.try_acquire(0, device_names([motor2]))
+
+
+def test_infer_devices():
+    assert infer_devices(scan([det], motor1, -1, 1, 3)) == {'det', 'motor1'}
+    assert infer_devices(count([det], 3)) == {'det'}
+    assert infer_devices(list(count([det]))) == {'det'}
+    assert infer_devices(iter([])) is None
+
+
+def _move_motor():
+    # Refers to a module-level device, not an argument
+    yield from count([motor])
+
+
+def test_infer_module_level_devices():
+    assert infer_devices(_move_motor()) == {'motor'}
@@ -0,0 +1,51 @@
+import logging
+
+import numpy as np
+from bluesky import RunEngine
+from bluesky.plans import count
+from ophyd.sim import det
+
+from xicam.Acquire.callbacks.doclog import DocumentLogger
+
+
+class Unprintable:
+    def __repr__(self):
+        raise AssertionError('The document was formatted')
+
+
+def test_nothing_is_formatted_when_disabled(caplog):
+    logger = logging.getLogger('tests.doclog.disabled')
+    caplog.set_level(logging.INFO, logger.name)
+    document_logger = DocumentLogger(level=logging.DEBUG, logger=logger)
+
+    document_logger('start', {'uid': 'start', 'value': Unprintable()})
+    document_logger('event', {'descriptor': 'primary', 'data': {'value': Unprintable()}})
+    assert not caplog.records
+
+
+def test_events_are_sampled(caplog):
+    logger = logging.getLogger('tests.doclog.enabled')
+    caplog.set_level(logging.DEBUG, logger.name)
+    run_engine = RunEngine()
+    run_engine.subscribe(DocumentLogger(level=logging.DEBUG, logger=logger))
+    uid, = run_engine(count([det], 5))
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert [message.split(' ')[0] for message in messages] == ['start', 'descriptor', 'first', 'stop', 'run']
+    assert messages[2].startswith("first event of stream 'primary'")
+    assert messages[4].startswith(f"run {uid} stream 'primary': 5 events; last event: ")
+    assert "'seq_num': 5" in messages[4]
+
+
+def test_long_values_are_truncated(caplog):
+    logger = logging.getLogger('tests.doclog.truncated')
+    caplog.set_level(logging.DEBUG, logger.name)
+    document_logger = DocumentLogger(level=logging.DEBUG, max_items=3, max_length=10, logger=logger)
+
+    document_logger('start', {'uid': 'start', 'frame': np.zeros((100, 100)), 'motors': list(range(10)),
+                              'note': 'x' * 50, 'shape': np.arange(2)})
+    message = caplog.records[0].getMessage()
+    assert "'frame': <ndarray shape=(100, 100) dtype=float64>" in message
+    assert "'motors': [0, 1, 2, ... (10 items)]" in message
+    assert "'note': 'xxxxxxxxxx... (50 characters)'" in message
+    assert "'shape': [0, 1]" in message
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from xicam.Acquire.runengine import DocumentBus, LOSSLESS, LATEST, KEEP_RUN_STRUCTURE
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'Timed out'
+        time.sleep(.001)
+
+
+class BlockedSubscriber:
+    """Receives documents only once released, after the first."""
+
+    def __init__(self):
+        self.documents = []
+        self.release = threading.Event()
+
+    def __call__(self, name, doc):
+        if self.documents:
+            self.release.wait(10)
+        self.documents.append((name, doc.get('seq_num')))
+
+
+def _publish(bus, events):
+    bus('start', dict())
+    bus('descriptor', dict())
+    for seq_num in range(1, events + 1):
+        bus('event', {'seq_num': seq_num})
+    bus('stop', dict())
+
+
+@pytest.mark.parametrize('policy', [LOSSLESS, LATEST, KEEP_RUN_STRUCTURE])
+def test_policies(policy):
+    bus = DocumentBus()
+    subscriber = BlockedSubscriber()
+    token = bus.subscribe(subscriber, policy=policy, max_backlog=3)
+    bus('start', dict())
+    _wait_for(lambda: subscriber.documents)  # The subscriber is now blocked on the next document
+    bus('descriptor', dict())
+    for seq_num in range(1, 11):
+        bus('event', {'seq_num': seq_num})
+    bus('stop', dict())
+    subscriber.release.set()
+    dropped = {LOSSLESS: 0, LATEST: 9, KEEP_RUN_STRUCTURE: 8}[policy]
+    _wait_for(lambda: bus.metrics()[token]['delivered'] == 13 - dropped)
+    metrics = bus.metrics()[token]
+    assert (metrics['dropped'], metrics['pending'], metrics['errors']) == (dropped, 0, 0)
+    bus.unsubscribe(token)
+    assert bus.metrics() == dict()
+
+    names = [name for name, _ in subscriber.documents]
+    events = [seq_num for name, seq_num in subscriber.documents if name == 'event']
+    # The run's structure is always delivered
+    assert [name for name in names if name != 'event'] == ['start', 'descriptor', 'stop']
+    if policy == LOSSLESS:
+        assert events == list(range(1, 11))
+    elif policy == LATEST:
+        assert events == [10]  # Pending events collapse to the newest
+    else:
+        assert events == [1, 2]  # Until the backlog, the descriptor included, is full
+
+def test_metrics_and_name_filter():
+    bus = DocumentBus()
+    stops = []
+    token = bus.subscribe(lambda name, doc: stops.append(doc), name='stop')
+    _publish(bus, 3)
+    _wait_for(lambda: bus.metrics()[token]['delivered'] == 1)
+    assert bus.metrics()[token]['dropped'] == 0
+    assert bus.metrics()[token]['pending'] == 0
+    bus.unsubscribe(token)
+    assert len(stops) == 1
+
+
+def test_failing_subscriber_keeps_receiving():
+    bus = DocumentBus()
+    received = []
+
+    def subscriber(name, doc):
+        received.append(name)
+        if name == 'descriptor':
+            raise ValueError('Cannot display it')
+
+    token = bus.subscribe(subscriber)
+    _publish(bus, 2)
+    _wait_for(lambda: bus.metrics()[token]['delivered'] == 5)
+    assert bus.metrics()[token]['errors'] == 1
+    assert received == ['start', 'descriptor', 'event', 'event', 'stop']
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        DocumentBus().subscribe(print, policy='newest')
@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+from bluesky import RunEngine
+from bluesky.plans import count
+from ophyd.sim import det
+
+from xicam.Acquire.callbacks.mongo import BatchedDocumentWriter
+
+mongomock = pytest.importorskip('mongomock')
+mongo_normalized = pytest.importorskip('suitcase.mongo_normalized')
+
+
+@pytest.fixture
+def database():
+    client = mongomock.MongoClient()
+    return client['mds'], client['fs']
+
+
+def _run(callback, num=5):
+    run_engine = RunEngine()
+    run_engine.subscribe(callback)
+    uid, = run_engine(count([det], num))
+    return uid
+
+
+def test_documents_are_written(database):
+    metadata, assets = database
+    writer = BatchedDocumentWriter(mongo_normalized.Serializer(metadata, assets), max_batch=2)
+    uid = _run(writer)
+    assert writer.flush(timeout=10)
+
+    assert metadata['run_start'].find_one({'uid': uid}) is not None
+    assert metadata['event'].count_documents({}) == 5
+    assert metadata['run_stop'].find_one({'run_start': uid})['num_events'] == {'primary': 5}
+    assert writer.stats['errors'] == 0
+    writer.close(timeout=10)
+
+
+class SlowSerializer:
+    def __init__(self):
+        self.documents = []
+        self.release = threading.Event()
+
+    def __call__(self, name, doc):
+        self.release.wait(10)
+        if name == 'event_page':
+            self.documents.extend(('event', seq_num) for seq_num in doc['seq_num'])
+        else:
+            self.documents.append((name, None))
+
+
+@pytest.mark.parametrize('backpressure', ['block', 'spill'])
+def test_order_is_kept(backpressure, tmp_path):
+    serializer = SlowSerializer()
+    writer = BatchedDocumentWriter(serializer, max_queue=3, max_batch=4, backpressure=backpressure,
+                                   spill_dir=str(tmp_path))
+    if backpressure == 'block':
+        serializer.release.set()  # Otherwise the RunEngine waits for the writer
+    _run(writer, 10)
+    serializer.release.set()
+    assert writer.flush(timeout=10)
+
+    assert serializer.documents == ([('start', None), ('descriptor', None)] + [('event', n) for n in range(1, 11)]
+                                    + [('stop', None)])
+    if backpressure == 'spill':
+        assert writer.stats['documents_spilled']
+    writer.close(timeout=10)
+    assert writer.flush(timeout=1)  # Returns at once once the writer has stopped
+
+
+class RecordingSerializer:
+    def __init__(self, fail_pages=False):
+        self.documents = []
+        self.fail_pages = fail_pages
+
+    def __call__(self, name, doc):
+        if self.fail_pages and name.endswith('_page'):
+            raise ValueError('The bulk insert failed')
+        self.documents.append((name, doc))
+
+
+def _run_documents(events, malformed=()):
+    start = {'uid': 'start', 'time': 0}
+    descriptor = {'uid': 'descriptor', 'run_start': 'start', 'time': 0, 'data_keys': dict()}
+    yield 'start', start
+    yield 'descriptor', descriptor
+    for seq_num, data in enumerate(events, 1):
+        event = {'uid': f'event{seq_num}', 'descriptor': 'descriptor', 'seq_num': seq_num, 'time': seq_num,
+                 'data': data, 'timestamps': {key: seq_num for key in data}, 'filled': dict()}
+        if seq_num in malformed:
+            del event['timestamps']
+        yield 'event', event
+    yield 'stop', {'uid': 'stop', 'run_start': 'start', 'time': 0}
+
+
+@pytest.mark.parametrize('fail_pages', [False, True])
+def test_unwritable_pages_are_written_one_by_one(fail_pages):
+    serializer = RecordingSerializer(fail_pages)
+    writer = BatchedDocumentWriter(serializer, max_queue=2)
+    events = [{'x': 1}, {'x': 2}]
+    # Unless the page fails to be written, make it fail to be packed, with an event that has no timestamps
+    for name, doc in _run_documents(events, malformed=() if fail_pages else (2,)):
+        writer(name, doc)
+    assert writer.flush(timeout=10)
+
+    assert [name for name, _ in serializer.documents] == ['start', 'descriptor', 'event', 'event', 'stop']
+    assert [doc['data'] for name, doc in serializer.documents if name == 'event'] == events
+    assert writer.stats['documents_written'] == 5
+
+    # The writer carries on
+    for name, doc in _run_documents([{'x': 3}]):
+        writer(name, doc)
+    assert writer.flush(timeout=10)
+    assert len(serializer.documents) == 9
+    writer.close(timeout=10)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from ophyd import EpicsMotor
+
+from xicam.Acquire.sim import iocs
+
+
+def test_record_names():
+    assert iocs._record('SIM:DET:cam1:AcquireTime_RBV', 'SIM:DET:') == 'AcquireTime'
+    assert iocs._record('SIM:M1.VAL', 'SIM:M1') == '.VAL'
+
+
+def test_device_pvs_without_an_ioc():
+    pvs = iocs.device_pvs(EpicsMotor, 'SIM:M1')
+    assert {'SIM:M1.VAL', 'SIM:M1.RBV', 'SIM:M1.DMOV', 'SIM:M1.VELO'} <= set(pvs)
+    assert not any(string for string, _ in pvs.values())
+
+
+@pytest.mark.parametrize('name', list(iocs.SIMULATIONS))
+def test_simulation_serves_every_pv_of_its_device(name):
+    simulation = iocs.SIMULATIONS[name]
+    pvdb = iocs.build([name])
+    device_pvs = iocs.device_pvs(iocs._device_class(simulation), simulation.prefix, **simulation.device_kwargs)
+    assert device_pvs and set(device_pvs) <= set(pvdb)
+
+
+@pytest.mark.parametrize('motor_class', [EpicsMotor, iocs._device_class(iocs.SIMULATIONS['motor'])])
+def test_motor_moves_at_its_velocity(motor_class):
+    group = iocs.SimulatedMotor.for_device(motor_class, 'SIM:M1')
+    group.update_rate = 100
+    assert group.get('.VELO') == 1.
+
+    async def move():
+        await group.set('.VELO', 10.)
+        await group.set('.ACCL', 0.)
+        await group.pvdb['SIM:M1.VAL'].write(1.)
+        await asyncio.sleep(.05)
+        moving = group.get('.DMOV'), group.get('.MOVN')
+        while not group.get('.DMOV'):
+            await asyncio.sleep(.01)
+        return moving
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(asyncio.wait_for(move(), 5)) == (0, 1)
+    finally:
+        loop.close()
+    assert group.get('.RBV') == pytest.approx(1.)
+    assert group.get('.MOVN') == 0
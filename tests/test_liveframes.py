@@ -0,0 +1,99 @@
+import numpy as np
+
+from benchmarks.common import FakeImagePlugin
+from xicam.Acquire.liveframes import LatestFrame
+
+SHAPE = (6, 8)
+
+
+def _plugin(pixels=None):
+    plugin = FakeImagePlugin(SHAPE, pixels)
+    # As the first monitor callbacks of a connected IOC
+    for signal in (plugin.array_size.width, plugin.array_size.height, plugin.array_size.depth, plugin.ndimensions):
+        signal.put(signal.get())
+    return plugin
+
+
+def _frame(value):
+    return np.full(SHAPE, value, dtype=np.uint16)
+
+
+def test_only_new_frames_are_read():
+    plugin = _plugin(pixels=100)
+    latest_frame = LatestFrame(plugin)
+
+    plugin.publish(_frame(1))
+    assert latest_frame.new
+    np.testing.assert_array_equal(latest_frame.read(), _frame(1))
+    assert not latest_frame.new
+    assert latest_frame.read() is None
+    assert (latest_frame.displayed, latest_frame.dropped) == (1, 0)
+
+
+def test_skipped_frames_are_counted():
+    plugin = _plugin()
+    latest_frame = LatestFrame(plugin)
+    plugin.publish(_frame(1))
+    latest_frame.read()
+    for value in range(2, 6):
+        plugin.publish(_frame(value))
+
+    np.testing.assert_array_equal(latest_frame.read(), _frame(5))  # Always the newest
+    assert (latest_frame.displayed, latest_frame.dropped) == (2, 3)
+
+    latest_frame.reset()
+    assert (latest_frame.displayed, latest_frame.dropped) == (0, 0)
+
+
+def test_restarted_counter_is_not_counted_as_dropped():
+    plugin = _plugin()
+    latest_frame = LatestFrame(plugin)
+    plugin.publish(_frame(1))
+    plugin.publish(_frame(2))
+    latest_frame.read()
+
+    plugin.array_counter.put(0)  # Acquisition restarted
+    plugin.publish(_frame(3))
+    np.testing.assert_array_equal(latest_frame.read(), _frame(3))
+    assert (latest_frame.displayed, latest_frame.dropped) == (2, 0)
+
+
+def test_shape_follows_the_plugin():
+    plugin = _plugin(pixels=100)
+    latest_frame = LatestFrame(plugin)
+    assert latest_frame.shape == SHAPE
+    plugin.array_size.width.put(4)
+    plugin.array_size.height.put(5)
+    assert latest_frame.shape == (5, 4)
+
+    plugin.publish(np.arange(20, dtype=np.uint16))
+    np.testing.assert_array_equal(latest_frame.read(), np.arange(20).reshape(5, 4))
+
+
+def test_frame_is_a_view_of_the_array_read():
+    plugin = _plugin(pixels=100)
+    requests = []
+    get = plugin.array_data.get
+
+    def request(count=None, **kwargs):
+        requests.append((count, get(count=count, **kwargs)))
+        return requests[-1][1]
+
+    plugin.array_data.get = request
+    latest_frame = LatestFrame(plugin)
+    plugin.publish(_frame(1))
+    frame = latest_frame.read()
+
+    (count, array), = requests  # A single request, for just the frame's pixels
+    assert count == np.prod(SHAPE)
+    assert frame.base is array and frame.dtype == np.uint16
+    np.testing.assert_array_equal(frame, _frame(1))
+
+
+def test_shaped_image_is_read_until_the_shape_is_known():
+    plugin = FakeImagePlugin(SHAPE, pixels=100)  # No size monitored yet
+    latest_frame = LatestFrame(plugin)
+    assert latest_frame.shape is None
+
+    plugin.publish(_frame(1))
+    np.testing.assert_array_equal(latest_frame.read(), _frame(1))
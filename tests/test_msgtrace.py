@@ -0,0 +1,120 @@
+import json
+
+import pytest
+from bluesky import RunEngine
+from bluesky.plans import scan
+from ophyd import Component as Cpt, Device, Signal
+from ophyd.sim import SynAxis, det, motor
+
+from xicam.Acquire.msgtrace import POINT_CATEGORIES, MessageTracer, export_chrome_trace
+from xicam.Acquire.summarystreams import read_summary
+
+
+@pytest.fixture
+def traced_run_engine():
+    run_engine = RunEngine(context_managers=[])
+    tracer = MessageTracer()
+    tracer.install(run_engine)
+    return run_engine, tracer
+
+
+def _summaries(run_engine):
+    # Summary stream name -> summaries of the runs
+    summaries = dict()
+    descriptors = dict()
+
+    def record(name, doc):
+        if name == 'descriptor':
+            descriptors[doc['uid']] = doc
+        elif name == 'event':
+            descriptor = descriptors[doc['descriptor']]
+            summary = read_summary(descriptor, doc)
+            if summary is not None:
+                summaries.setdefault(descriptor['name'], []).append(summary)
+
+    run_engine.subscribe(record)
+    return summaries
+
+
+def test_messages_are_recorded(traced_run_engine):
+    run_engine, tracer = traced_run_engine
+    uid, = run_engine(scan([det], motor, -1, 1, 3))
+
+    commands = [command for run, command, obj, start, stop, done in tracer.records if run == uid]
+    assert commands.count('trigger') == 6  # The detector and the motor, at each point
+    assert commands.count('save') >= 3
+    assert 'callbacks' in commands
+    assert all(start <= stop for _, _, _, start, stop, _ in tracer.records)
+    # The Statuses of sets and triggers finish
+    assert all(done is not None for _, command, _, _, _, done in tracer.records if command in ('set', 'trigger'))
+
+
+def test_summary_stream(traced_run_engine):
+    run_engine, tracer = traced_run_engine
+    summaries = _summaries(run_engine)
+    uid, = run_engine(scan([det], motor, -1, 1, 3))
+
+    summary, = summaries['msg_timing']
+    assert summary['commands']['trigger']['count'] == 6
+    assert summary['messages'] > 0
+    assert set(summary) >= {'set_wait', 'trigger', 'read', 'save', 'other', 'callbacks', 'elapsed'}
+    assert tracer.summaries[uid]['commands']['trigger']['count'] == 6
+
+
+def test_disabled_tracer_records_nothing(traced_run_engine):
+    run_engine, tracer = traced_run_engine
+    tracer.enabled = False
+    summaries = _summaries(run_engine)
+    run_engine(scan([det], motor, -1, 1, 3))
+
+    assert not tracer.records and not tracer.summaries
+    assert not summaries
+
+
+def test_chrome_trace(traced_run_engine, tmp_path):
+    run_engine, tracer = traced_run_engine
+    first, = run_engine(scan([det], motor, -1, 1, 2))
+    run_engine(scan([det], motor, -1, 1, 2))
+
+    path = tmp_path / 'trace.json'
+    export_chrome_trace(str(path), [tracer], run_start=first)
+    events = json.loads(path.read_text())['traceEvents']
+    spans = [event for event in events if event['ph'] == 'X']
+    assert spans and all(event['args']['run_start'] == first for event in spans)
+    assert any(event['cat'] == 'status' for event in spans)
+
+
+class TimedDetector(Device):
+    """A detector with a configured exposure time."""
+    value = Cpt(Signal, value=1., kind='hinted')
+    acquire_time = Cpt(Signal, value=.005, kind='config')
+
+
+def test_points_are_broken_down(traced_run_engine):
+    run_engine, tracer = traced_run_engine
+    summaries = _summaries(run_engine)
+    moving = SynAxis(name='moving', delay=.02)
+    moving.settle_time = .01
+    run_engine(scan([TimedDetector(name='timed')], moving, -1, 1, 3))
+
+    assert len(tracer.points) == 3
+    for point in tracer.points:
+        assert set(point) == set(POINT_CATEGORIES) | {'wall', 'exposure'}
+        assert sum(point[category] for category in POINT_CATEGORIES) == pytest.approx(point['wall'])
+        assert point['exposure'] == .005
+        assert point['settle'] == pytest.approx(.01, abs=.005)
+    # Until the motor's Status finished
+    assert all(point['move'] + point['settle'] >= .02 for point in tracer.points)
+
+    wall = sum(point['wall'] for point in tracer.points)
+    assert tracer.efficiency() == pytest.approx(3 * .005 / wall)
+    summary, = summaries['msg_timing']
+    assert summary['points'] == 3
+    assert summary['efficiency'] == pytest.approx(tracer.efficiency())
+    assert summary['per_point']['wall'] == pytest.approx(wall / 3)
+
+
+def test_trigger_time_is_the_exposure_without_a_configured_one(traced_run_engine):
+    run_engine, tracer = traced_run_engine
+    run_engine(scan([det], motor, -1, 1, 2))
+    assert all(point['exposure'] == point['trigger'] for point in tracer.points)
@@ -0,0 +1,50 @@
+import enum
+import json
+import types
+
+import pytest
+
+from xicam.Acquire import patches
+
+
+def _fake_qt_module():
+    # A fresh module each time, since promotion sets attributes on its classes
+    class QFake:
+        Alignment = enum.Enum('Alignment', ['AlignLeft', 'AlignRight'])
+        NotAnEnum = 3
+
+    return types.SimpleNamespace(QFake=QFake, NotQt=object)
+
+
+def test_promote_enums():
+    module = _fake_qt_module()
+    patches.promote_enums(module)
+    assert module.QFake.AlignLeft is module.QFake.Alignment.AlignLeft
+    assert module.QFake.AlignRight is module.QFake.Alignment.AlignRight
+
+
+def test_aliases_are_cached(tmp_path, monkeypatch):
+    path = tmp_path / 'aliases.json'
+    patches.promote_enums_cached({'QtFake': _fake_qt_module()}, path)
+    assert json.loads(path.read_text()) == {'QtFake': [['QFake', 'Alignment', 'AlignLeft'],
+                                                       ['QFake', 'Alignment', 'AlignRight']]}
+
+    # The enums are not searched again
+    def search(module):
+        raise AssertionError('The enums were searched although they are cached.')
+
+    monkeypatch.setattr(patches, 'enum_aliases', search)
+    module = _fake_qt_module()
+    patches.promote_enums_cached({'QtFake': module}, path)
+    assert module.QFake.AlignRight is module.QFake.Alignment.AlignRight
+
+
+@pytest.mark.parametrize('cache', ['not json', '{}', '{"QtFake": [["QFake", "Missing", "AlignLeft"]]}'])
+def test_bad_cache_is_rebuilt(tmp_path, cache):
+    path = tmp_path / 'aliases.json'
+    path.write_text(cache)
+    module = _fake_qt_module()
+    patches.promote_enums_cached({'QtFake': module}, path)
+
+    assert module.QFake.AlignLeft is module.QFake.Alignment.AlignLeft
+    assert json.loads(path.read_text())['QtFake'][0] == ['QFake', 'Alignment', 'AlignLeft']
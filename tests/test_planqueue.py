@@ -0,0 +1,223 @@
+import pickle
+import threading
+
+import pytest
+from ophyd.sim import motor1, motor2
+
+from xicam.Acquire.planqueue import PersistentPlanQueue, PlanReference, _DeviceName
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / 'plan_queue.sqlite')
+
+
+def test_priority_then_fifo(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    queue.put(1, ('late',), dict())
+    queue.put(0, ('first',), dict())
+    queue.put(0, ('second',), dict())
+
+    assert [queue.get(timeout=1).args[0][0] for _ in range(3)] == ['first', 'second', 'late']
+    with pytest.raises(TimeoutError):
+        queue.get(timeout=.01)
+
+
+def test_accept(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    queue.put_many([(0, ('scan',), dict(), frozenset(['motor1'])),
+                    (0, ('count',), dict(), frozenset(['det']))])
+
+    item = queue.get(timeout=1, accept=lambda item: 'motor1' not in item.devices)
+    assert item.args[0][0] == 'count'
+    assert [item.args[0][0] for item in queue.peek(2)] == ['scan']
+
+
+def test_refused_plans_hold_their_devices(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    queue.put_many([(0, ('blocked',), dict(), frozenset(['motor1'])),
+                    (0, ('shares motor1',), dict(), frozenset(['motor1', 'det'])),
+                    (0, ('exclusive',), dict(), None),
+                    (0, ('free',), dict(), frozenset(['motor2']))])
+    offered = []
+
+    def accept(item):
+        offered.append(item.args[0][0])
+        return 'motor1' not in item.devices
+
+    assert queue.get(timeout=1, accept=accept).args[0][0] == 'free'
+    assert offered == ['blocked', 'free']
+
+
+def test_refused_exclusive_plan_holds_the_queue(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    queue.put_many([(0, ('exclusive',), dict(), None),
+                    (0, ('later',), dict(), frozenset(['det']))])
+
+    with pytest.raises(TimeoutError):
+        queue.get(timeout=.05, accept=lambda item: item.devices is not None)
+
+
+def test_shutdown_releases_get(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    stopper = threading.Timer(.05, queue.shutdown)
+    stopper.start()
+    assert queue.get(timeout=1) is None
+    stopper.join()
+
+
+def test_crash_recovery(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    for name in ('done', 'interrupted', 'next', 'last'):
+        queue.put(0, (name,), {'md': name})
+    queue.task_done(queue.get(timeout=1))
+    queue.get(timeout=1)  # Started when Xi-cam closed
+    queue.close()
+
+    restored = PersistentPlanQueue(queue_path)
+    # A plan that had started is not repeated; the others are queued again, in order
+    assert len(restored) == restored.unfinished_tasks == 2
+    restored.resume()
+    item = restored.get(timeout=1)
+    assert item.args == (('next',), {'md': 'next'})
+    assert restored.get(timeout=1).args[0][0] == 'last'
+
+    # Sequence numbers continue after those of the restored plans
+    assert restored.put(-1, ('new',), dict()).sequence > item.sequence
+
+
+def test_restored_queue_is_paused(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    assert not queue.paused
+    queue.put(0, ('restored',), dict())
+    queue.close()
+
+    restored = PersistentPlanQueue(queue_path)
+    assert restored.paused
+    restored.put(-1, ('new',), dict())
+    with pytest.raises(TimeoutError):
+        restored.get(timeout=.05)
+
+    # A blocked get hands out the plans once the queue is resumed
+    resumer = threading.Timer(.05, restored.resume)
+    resumer.start()
+    assert restored.get(timeout=1).args[0][0] == 'new'
+    assert restored.get(timeout=1).args[0][0] == 'restored'
+    resumer.join()
+
+
+def test_unpicklable_plan_is_kept_in_memory(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    queue.put(0, ((step for step in range(3)),), dict())
+    assert len(queue) == 1
+    queue.close()
+
+    assert len(PersistentPlanQueue(queue_path)) == 0
+
+
+def test_closed_queue_keeps_working(queue_path):
+    queue = PersistentPlanQueue(queue_path)
+    queue.close()
+    queue.put(0, ('plan',), dict())
+    item = queue.get(timeout=1)
+    queue.task_done(item)
+    queue.clear()
+    assert queue.unfinished_tasks == 0
+
+
+class Parameter:
+    """The parts of a pyqtgraph Parameter a PlanReference uses."""
+
+    def __init__(self, name, value=None, children=(), **opts):
+        self._name = name
+        self._value = value
+        self._children = list(children)
+        self.opts = opts
+        self.set_values = 0
+
+    def name(self):
+        return self._name
+
+    def value(self):
+        return self._value
+
+    def setValue(self, value):
+        self.set_values += 1
+        self._value = value
+
+    def children(self):
+        return self._children
+
+    def hasChildren(self):
+        return bool(self._children)
+
+    def child(self, name):
+        for child in self._children:
+            if child.name() == name:
+                return child
+        raise KeyError(name)
+
+
+class ParameterizedPlan:
+    """As xicam.gui.utils.ParameterizedPlan: a plan function and its arguments, some of them Parameters."""
+
+    def __init__(self, plan, *args, **kwargs):
+        self.plan = plan
+        self.args = args
+        self.kwargs = kwargs
+
+
+def _scan(motor, start, stop, num=1):
+    return motor, start, stop, num
+
+
+class PlanItem:
+    name = 'scan'
+    code = 'def scan(...): ...'
+
+    def __init__(self):
+        self.motor = Parameter('motor', motor1, type='device', limits={'motor1': motor1, 'motor2': motor2})
+        self.start = Parameter('start', 0.)
+        self.stop = Parameter('stop', 1.)
+        self.parameter = Parameter('scan', children=[self.motor, Parameter('range', children=[self.start, self.stop])])
+        self.plan = ParameterizedPlan(_scan, self.motor, self.start, self.stop, num=5)
+
+    def __getstate__(self):
+        return dict()  # As a PlanItem, which is restored from its code
+
+
+def test_plan_reference_snapshot():
+    planitem = PlanItem()
+    reference = PlanReference(planitem, planitem.parameter)
+    assert reference.values == {'motor': 'motor1', 'range': {'start': 0., 'stop': 1.}}
+    assert isinstance(reference.values['motor'], _DeviceName)
+
+    # Editing the parameters after the plan is queued does not change it
+    planitem.stop.setValue(2.)
+    assert reference.resolve() == (motor1, 0., 1., 5)
+    assert not any(parameter.set_values for parameter in (planitem.motor, planitem.start))
+
+
+def test_plan_reference_values():
+    planitem = PlanItem()
+    reference = PlanReference(planitem, planitem.parameter, {'range': {'stop': 3.}})
+    assert reference.resolve() == (motor1, 0., 3., 5)
+
+    # Devices may be given by name
+    batch = reference.with_values({'motor': 'motor2', 'range': {'start': 1.}})
+    assert isinstance(batch.values['motor'], _DeviceName)
+    assert batch.resolve() == (motor2, 1., 3., 5)
+    assert reference.resolve() == (motor1, 0., 3., 5)
+
+    assert batch.with_values({'motor': motor1}).values['motor'] == 'motor1'
+
+
+def test_plan_reference_pickles_device_names():
+    planitem = PlanItem()
+    reference = pickle.loads(pickle.dumps(PlanReference(planitem, planitem.parameter)))
+    assert reference.values['motor'] == 'motor1'
+    assert reference._devices == dict()
+
+    planitem.code = None
+    with pytest.raises(TypeError):
+        pickle.dumps(PlanReference(planitem, planitem.parameter))
@@ -0,0 +1,72 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from benchmarks.common import SignalRecorder, wait_for
+from benchmarks.process_runengine import detector_count
+from xicam.Acquire.processrunengine import ProcessRunEngine
+
+
+@pytest.fixture
+def process_run_engine():
+    run_engine = ProcessRunEngine()
+    yield run_engine
+    run_engine.close()
+
+
+def test_large_arrays_arrive_in_shared_memory(process_run_engine):
+    shape = (256, 256)  # 512 kB of float64, above the threshold
+    events = []
+    states = []
+    process_run_engine.state_hook = lambda state, old_state: states.append(state)
+    process_run_engine.subscribe(lambda name, doc: events.append(doc['data']['image']), 'event')
+
+    process_run_engine(partial(detector_count, 3, shape=shape))
+    assert len(events) == 3
+    for image in events:
+        assert image.shape == shape
+        assert not image.flags.writeable
+        assert np.all(image == 1.)
+    assert states[0] == 'running' and states[-1] == 'idle'
+    assert process_run_engine.state == 'idle'
+
+
+def test_shared_memory_blocks_are_reused(process_run_engine):
+    blocks = set()
+    process_run_engine.subscribe(lambda name, doc: blocks.update(process_run_engine._in_use), 'event')
+
+    # The arrays are dropped as soon as they are delivered, so their blocks go back to the child
+    process_run_engine(partial(detector_count, 20, delay=.02, shape=(256, 256)))
+    assert 0 < len(blocks) < 20
+
+
+def test_small_values_are_pickled(process_run_engine):
+    events = []
+    process_run_engine.subscribe(lambda name, doc: events.append(doc['data']['scalar']), 'event')
+    process_run_engine(partial(detector_count, 2))
+    assert events == [1., 1.]
+    assert not process_run_engine._mappings
+
+
+def test_unpicklable_plan_fails_in_the_parent(process_run_engine):
+    with pytest.raises((TypeError, AttributeError)):
+        process_run_engine(detector_count(1))
+
+
+def test_close_stops_the_child():
+    run_engine = ProcessRunEngine()
+    run_engine(partial(detector_count, 1))
+    run_engine.close(timeout=5)
+    assert run_engine.process.exitcode == 0
+
+
+def test_queued_plans_run_in_the_child(run_engine_factory):
+    run_engine = run_engine_factory(process=True, prefetch=False)
+    ready = SignalRecorder(run_engine.sigReady)
+    events = []
+    run_engine.subscribe(lambda name, doc: events.append(doc['data'].get('scalar')), 'event')
+
+    run_engine._enqueue(1, (partial(detector_count, 3),), {})
+    wait_for(lambda: ready.times and events.count(1.) == 3, timeout=60)
+    assert run_engine.queue.unfinished_tasks == 0
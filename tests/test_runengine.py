@@ -0,0 +1,242 @@
+import time
+
+import bluesky.plan_stubs as bps
+from bluesky import Msg
+from bluesky.run_engine import TransitionError
+from bluesky.plans import count
+import pytest
+from ophyd.sim import SynGauss, det, det1, det2, motor
+
+from benchmarks.common import SignalRecorder, wait_for
+from xicam.Acquire.planqueue import PersistentPlanQueue
+
+
+def _sleep(seconds):
+    yield from bps.open_run()
+    yield from bps.sleep(seconds)
+    yield from bps.close_run()
+
+
+def _run_labels(run_engine):
+    labels = []
+    run_engine.subscribe(lambda name, doc: labels.append(doc.get('label')), 'start')
+    return labels
+
+
+def test_plans_run_in_priority_order(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    started = SignalRecorder(run_engine.sigStart)
+    ready = SignalRecorder(run_engine.sigReady)
+    labels = _run_labels(run_engine)
+
+    run_engine._enqueue(1, (_sleep(.2),), {'label': 'running'})
+    started.wait(1)
+    run_engine._enqueue(1, (count([det]),), {'label': 'second'})
+    run_engine._enqueue(1, (count([det]),), {'label': 'third'})
+    run_engine._enqueue(0, (count([det]),), {'label': 'urgent'})
+
+    wait_for(lambda: ready.times and len(labels) == 4, timeout=10)
+    assert labels == ['running', 'urgent', 'second', 'third']
+    assert run_engine.queue.unfinished_tasks == 0
+
+
+def test_idle_lane_sleeps(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    started = SignalRecorder(run_engine.sigStart)
+    takes = []
+    take = run_engine.queue._take
+
+    def counted(accept):
+        takes.append(time.perf_counter())
+        return take(accept)
+
+    time.sleep(.1)  # Until the lane waits for a plan; it only looks at the queue again when woken
+    run_engine.queue._take = counted
+    time.sleep(.3)
+    assert not takes
+
+    queued = time.perf_counter()
+    run_engine._enqueue(1, (count([det]),), {})
+    started.wait(1, timeout=10)
+    assert len(takes) == 1
+    assert started.times[0] - queued < .1
+
+
+def test_restored_plans_wait_for_resume(run_engine_factory, tmp_path):
+    queue_path = str(tmp_path / 'plan_queue.sqlite')
+    queue = PersistentPlanQueue(queue_path)
+    queue.put(1, ([Msg('open_run'), Msg('close_run')],), {'label': 'restored'})
+    queue.close()
+
+    run_engine = run_engine_factory(queue_path=queue_path, prefetch=False)
+    resumed = SignalRecorder(run_engine.sigQueueResumed)
+    started = SignalRecorder(run_engine.sigStart)
+    labels = _run_labels(run_engine)
+    assert run_engine.queue.paused
+    time.sleep(.3)
+    assert not started.times
+
+    run_engine.resume_queue()
+    wait_for(lambda: labels, timeout=10)
+    assert labels == ['restored']
+    assert len(resumed.times) == 1
+
+
+def test_put_batch(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    ready = SignalRecorder(run_engine.sigReady)
+    starts = []
+    run_engine.subscribe(lambda name, doc: starts.append(doc), 'start')
+    resolved = []
+    run_engine.subscribe_kwargs_callable(lambda: resolved.append(1) or {'operator': 'beamline'})
+
+    run_engine.put_batch([(count, {'detectors': [det], 'num': 2}, {'label': 'keywords'}),
+                          (count, [[det]], None),
+                          (count([det]), None, {'sample': 'B'})],
+                         sample='A')
+
+    wait_for(lambda: ready.times and len(starts) == 3, timeout=10)
+    # Once for the whole batch
+    assert len(resolved) == 1
+    assert [start.get('label') for start in starts] == ['keywords', None, None]
+    assert [start['sample'] for start in starts] == ['A', 'A', 'B']
+    assert all(start['operator'] == 'beamline' for start in starts)
+    assert starts[0]['num_points'] == 2
+
+
+def test_put_batch_rejects_reserved_metadata(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    run_engine.queue.pause()
+
+    with pytest.raises(ValueError, match='Submission 1'):
+        run_engine.put_batch([(count([det]), None, None), (count([det]), None, {'uid': 'mine'})])
+    # None of the batch is queued
+    assert len(run_engine.queue) == 0
+
+
+def _run_spans(run_engine):
+    # label -> [start time, stop time] of each run
+    spans = dict()
+    starts = dict()
+
+    def record(name, doc):
+        if name == 'start':
+            starts[doc['uid']] = doc['label']
+            spans[doc['label']] = [doc['time'], None]
+        elif name == 'stop':
+            spans[starts[doc['run_start']]][1] = doc['time']
+
+    run_engine.subscribe(record)
+    return spans
+
+
+def test_lanes_run_disjoint_plans_concurrently(run_engine_factory):
+    run_engine = run_engine_factory(lanes=2, prefetch=False)
+    spans = _run_spans(run_engine)
+
+    run_engine._enqueue(1, (_sleep(.3),), {'label': 'det1'}, devices=[det1])
+    run_engine._enqueue(1, (_sleep(.3),), {'label': 'det2'}, devices=[det2])
+    run_engine._enqueue(1, (_sleep(.3),), {'label': 'det1 again'}, devices=[det1.val])
+
+    wait_for(lambda: len(spans) == 3 and all(stop for _, stop in spans.values()), timeout=10)
+    assert spans['det2'][0] < spans['det1'][1] and spans['det1'][0] < spans['det2'][1]
+    assert spans['det1 again'][0] >= spans['det1'][1]
+
+
+def test_exclusive_plan_is_not_overtaken(run_engine_factory):
+    run_engine = run_engine_factory(lanes=2, prefetch=False)
+    started = SignalRecorder(run_engine.sigStart)
+    spans = _run_spans(run_engine)
+
+    run_engine._enqueue(1, (_sleep(.3),), {'label': 'running'}, devices=[det1])
+    started.wait(1)
+    # Queued without devices, so it waits for the running plan; the plan after it must not start first
+    run_engine._enqueue(1, (_sleep(.1),), {'label': 'exclusive'})
+    run_engine._enqueue(1, (_sleep(.1),), {'label': 'later'}, devices=[det2])
+
+    wait_for(lambda: len(spans) == 3 and all(stop for _, stop in spans.values()), timeout=10)
+    assert spans['running'][1] <= spans['exclusive'][0]
+    assert spans['exclusive'][1] <= spans['later'][0]
+
+
+def test_close_stops_the_lanes(run_engine_factory):
+    run_engine = run_engine_factory(lanes=2)
+    run_engine._close_RE()
+    assert all(thread.wait(0) for thread in run_engine._lane_threads + [run_engine._prefetch_thread])
+
+
+class CountedDetector(SynGauss):
+    """A simulated detector that counts the times it is asked to connect."""
+
+    def __init__(self, name):
+        super().__init__(name, motor, 'motor', center=0, Imax=1)
+        self.connections = 0
+
+    def wait_for_connection(self, *args, **kwargs):
+        self.connections += 1
+
+
+def test_prefetch_prepares_the_next_plan(run_engine_factory):
+    run_engine = run_engine_factory()
+    run_engine.queue.pause()
+    first, later, urgent = (CountedDetector(name) for name in ('first', 'later', 'urgent'))
+
+    run_engine._enqueue(1, (count([first]),), {})
+    wait_for(lambda: first.connections, timeout=5)
+    # Only the plan a lane would take next is prepared, whenever the head of the queue changes
+    run_engine._enqueue(1, (count([later]),), {})
+    run_engine._enqueue(0, (count([urgent]),), {})
+    wait_for(lambda: urgent.connections, timeout=5)
+    assert (first.connections, later.connections, urgent.connections) == (1, 0, 1)
+
+
+def _steps(count, delay):
+    yield from bps.open_run()
+    for _ in range(count):
+        yield from bps.checkpoint()
+        yield from bps.sleep(delay)
+    yield from bps.close_run()
+
+
+def _paused_run(run_engine):
+    # Start a long plan and pause it; returns the exit statuses of its run
+    started = SignalRecorder(run_engine.sigStart)
+    exit_statuses = []
+    run_engine.subscribe(lambda name, doc: exit_statuses.append(doc['exit_status']), 'stop')
+    run_engine._enqueue(1, (_steps(50, .02),), {})
+    started.wait(1, timeout=5)
+    wait_for(lambda: run_engine.run_engines[0].state == 'running', timeout=5)
+
+    futures = run_engine.pause()
+    assert len(futures) == 1
+    futures[0].result(timeout=5)
+    wait_for(lambda: run_engine.run_engines[0].state == 'paused', timeout=5)
+    assert run_engine.run_engines[0].state == 'paused'
+    return exit_statuses
+
+
+def test_resume_is_run_by_the_lane(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    exit_statuses = _paused_run(run_engine)
+    assert 'pause' in run_engine.control_latency()
+
+    resumed = run_engine.resume()
+    late = run_engine._control(0, 'resume')
+    # Completes when the plan ends
+    resumed[0].result(timeout=10)
+    wait_for(lambda: exit_statuses, timeout=5)
+    assert exit_statuses == ['success']
+    # Still queued when the plan ended
+    with pytest.raises(TransitionError):
+        late.result(timeout=5)
+
+
+def test_abort_while_paused(run_engine_factory):
+    run_engine = run_engine_factory(prefetch=False)
+    exit_statuses = _paused_run(run_engine)
+
+    futures = run_engine.abort('Testing')
+    futures[0].result(timeout=5)
+    wait_for(lambda: exit_statuses, timeout=5)
+    assert exit_statuses == ['abort']
+    assert run_engine.run_engines[0].state == 'idle'
@@ -0,0 +1,40 @@
+from qtpy.QtWidgets import QLabel
+
+from benchmarks.common import get_application
+from xicam.Acquire import startup
+from xicam.Acquire.widgets.lazy import LazyWidget
+
+
+def test_lazy_widget_is_built_when_first_shown():
+    get_application()
+    built = []
+
+    def factory():
+        built.append(QLabel('stage'))
+        return built[-1]
+
+    lazy = LazyWidget(factory, 'TestStage')
+    assert not built and lazy.widget is None
+
+    lazy.show()
+    assert built == [lazy.widget]
+    lazy.hide()
+    lazy.show()
+    assert lazy.build() is built[0] and len(built) == 1
+    assert 'TestStage' in startup.construction_times
+    lazy.close()
+
+
+def test_import_times():
+    imports = startup.import_times('json')
+    names = [name for name, _, _ in imports]
+    assert 'json' in names and 'json.decoder' in names
+    assert all(cumulative >= own >= 0 for _, own, cumulative in imports)
+
+
+def test_report():
+    imports = [('json.decoder', .002, .002), ('json', .001, .004)]
+    text = startup.report(imports, constructions={'Stage': .5}, module='json')
+    assert text.startswith('Import of json: 0.00 s, 2 modules in total')
+    assert '       3.0 ms  json' in text  # The own time of its modules
+    assert 'Widget construction: 0.50 s' in text
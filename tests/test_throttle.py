@@ -0,0 +1,75 @@
+import threading
+import time
+
+from benchmarks.common import get_application, wait_for
+from xicam.Acquire.callbacks.throttle import QDocumentThrottle
+
+
+def _event(seq_num, descriptor='primary'):
+    return {'uid': f'{descriptor}{seq_num}', 'descriptor': descriptor, 'seq_num': seq_num, 'time': seq_num,
+            'data': {'x': seq_num}, 'timestamps': {'x': seq_num}, 'filled': dict()}
+
+
+class Consumer:
+    def __init__(self):
+        self.documents = []
+        self.times = []
+        self.threads = set()
+
+    def __call__(self, name, doc):
+        self.documents.append((name, doc))
+        self.times.append(time.monotonic())
+        self.threads.add(threading.current_thread())
+
+
+def test_events_are_coalesced_in_order():
+    get_application()
+    consumer = Consumer()
+    throttle = QDocumentThrottle(consumer, max_rate=10)
+
+    throttle('start', {'uid': 'start'})
+    throttle('descriptor', {'uid': 'primary'})
+    for seq_num in range(1, 101):
+        throttle('event', _event(seq_num))
+    throttle('descriptor', {'uid': 'baseline'})
+    throttle('event', _event(1, 'baseline'))
+    throttle('stop', {'uid': 'stop'})
+    wait_for(lambda: len(consumer.documents) == 6, timeout=5)
+
+    assert [name for name, _ in consumer.documents] == ['start', 'descriptor', 'event_page', 'descriptor',
+                                                         'event_page', 'stop']
+    assert consumer.documents[2][1]['seq_num'] == list(range(1, 101))
+    assert consumer.documents[4][1]['descriptor'] == 'baseline'
+
+
+def test_delivery_is_rate_limited_on_the_gui_thread():
+    get_application()
+    consumer = Consumer()
+    throttle = QDocumentThrottle(consumer, max_rate=20)
+
+    def publish():
+        for seq_num in range(1, 41):
+            throttle('event', _event(seq_num))
+            time.sleep(.005)
+
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+    wait_for(lambda: not publisher.is_alive() and consumer.documents
+             and consumer.documents[-1][1]['seq_num'][-1] == 40, timeout=5)
+
+    assert consumer.threads == {threading.main_thread()}
+    assert [seq_num for _, page in consumer.documents for seq_num in page['seq_num']] == list(range(1, 41))
+    intervals = [later - earlier for earlier, later in zip(consumer.times, consumer.times[1:])]
+    assert len(consumer.documents) < 40
+    assert min(intervals) > 1 / 20 * .8  # Timers may fire a little early
+
+
+def test_clear():
+    get_application()
+    consumer = Consumer()
+    throttle = QDocumentThrottle(consumer)
+    throttle('start', {'uid': 'start'})
+    throttle.clear()
+    deadline = time.monotonic() + .3  # Past the scheduled delivery
+    wait_for(lambda: time.monotonic() > deadline)
+    assert consumer.documents == []
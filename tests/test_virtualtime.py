@@ -0,0 +1,58 @@
+import asyncio
+import time
+import types
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.plans import scan
+
+from xicam.Acquire.sim import VirtualClock, VirtualDetector, VirtualPositioner, replay
+
+
+def test_clock_skips_idle_time():
+    clock = VirtualClock()
+    start, real_start = clock.time(), time.perf_counter()
+    clock.run_until_complete(asyncio.sleep(3600))
+    assert clock.time() - start >= 3600
+    assert time.perf_counter() - real_start < 1
+    assert clock.wall_time() - time.time() == pytest.approx(clock.skipped)
+    clock.close()
+
+
+def test_patch_time():
+    clock = VirtualClock()
+    module = types.ModuleType('device_code')
+    module.ttime = time
+    with clock.patch_time(module):
+        start = module.ttime.monotonic()
+        module.ttime.sleep(60)
+        assert module.ttime.monotonic() - start >= 60
+        assert module.ttime.gmtime is time.gmtime
+    assert module.ttime is time
+    clock.close()
+
+
+def test_replay(run_engine_factory):
+    clock = VirtualClock()
+    run_engine = run_engine_factory(loop_factory=lambda: clock, prefetch=False)
+    motor = VirtualPositioner(name='motor', clock=clock, velocity=1.)
+    detector = VirtualDetector(name='detector', clock=clock, exposure_time=10.)
+
+    # Moves of 1 s between 11 exposures of 10 s
+    result = replay(run_engine, clock, scan([detector], motor, 0, 10, 11), timeout=30)
+    assert result.projected == pytest.approx(120, abs=1)
+    assert result.real < 10
+    assert detector.acquisitions == 11
+    assert motor.position == 10
+
+
+def _failing():
+    yield from bps.sleep(3600)
+    raise ValueError('Failed after an hour')
+
+
+def test_replay_raises_what_the_plan_raised(run_engine_factory):
+    clock = VirtualClock()
+    run_engine = run_engine_factory(loop_factory=lambda: clock, prefetch=False)
+    with pytest.raises(ValueError, match='after an hour'):
+        replay(run_engine, clock, _failing(), timeout=30)
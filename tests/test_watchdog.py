@@ -0,0 +1,60 @@
+import time
+
+import pytest
+from qtpy.QtCore import QTimer
+
+from benchmarks.common import get_application, wait_for
+from xicam.Acquire.watchdog import StallWatchdog
+
+
+def _block(duration):
+    time.sleep(duration)
+
+
+@pytest.fixture
+def watchdog():
+    get_application()
+    watchdog = StallWatchdog(threshold=.1, interval=.02, packages=('tests',))
+    watchdog.start()
+    yield watchdog
+    watchdog.stop()
+
+
+def _stall(duration, delay=0):
+    QTimer.singleShot(delay, lambda: _block(duration))
+
+
+def test_stall_is_attributed_to_its_call_site(watchdog):
+    detected = []
+    watchdog.sigStall.connect(lambda duration, site: detected.append((duration, site)))
+
+    _stall(.3)
+    wait_for(lambda: detected, timeout=5)
+    (duration, site), = detected
+    assert duration == pytest.approx(.3, abs=.05)
+    assert site.startswith('_block (tests.test_watchdog:')
+
+    stall = watchdog.snapshot()[site]
+    assert stall['count'] == 1 and stall['max'] == duration
+    assert '_block' in stall['stack']
+
+
+def test_short_blocks_are_not_stalls(watchdog):
+    for index in range(5):
+        _stall(.03, delay=index * 100)  # The event loop runs in between
+    deadline = time.perf_counter() + .7
+    wait_for(lambda: time.perf_counter() > deadline, timeout=5)
+    assert not watchdog.snapshot()
+
+
+def test_repeated_stalls_add_up(watchdog):
+    for _ in range(2):
+        _stall(.2)
+        count = len(watchdog.stalls)
+        wait_for(lambda: sum(stall['count'] for stall in watchdog.stalls.values()) > count, timeout=5)
+    stall, = watchdog.snapshot().values()
+    assert stall['count'] == 2
+    assert stall['total'] == pytest.approx(.4, abs=.1)
+
+    watchdog.clear()
+    assert not watchdog.stalls
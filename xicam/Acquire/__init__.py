@@ -5,10 +5,11 @@ from qtpy.QtCore import Signal
 from qtpy.QtWidgets import QStackedWidget
 
 from xicam.plugins import GUIPlugin, GUILayout
-from .pythontools.editor import scripteditor
 from .controlwidgets.BCSConnector import BCSConnector
 from .controlwidgets.deviceview import DeviceView
-from .controlwidgets import RunEngineWidget
+from .widgets.lazy import LazyWidget
+from .startup import timed
+from .watchdog import get_stall_watchdog
 from pathlib import Path
 
 from . import runengine
@@ -22,21 +23,55 @@ class AcquirePlugin(GUIPlugin):
 
     def __init__(self):
         runengine.initialize()
-        deviceviewcontainer = DeviceView()
+        # Started first, so stalls while the other stages are built are caught too
+        get_stall_watchdog()
+        with timed('DeviceView'):
+            deviceviewcontainer = DeviceView()
         devicelist = deviceviewcontainer.view
         controlsstack = QStackedWidget()
         devicelist.sigShowControl.connect(controlsstack.addSetWidget)
 
+        # Stages other than the first are built the first time they are shown; see xicam.Acquire.startup
         self.stages = {'Controls': GUILayout(controlsstack,
                                              left=devicelist, ),
-                       'Plans': GUILayout(scripteditor(),
+                       'Plans': GUILayout(LazyWidget(_scripteditor, 'scripteditor'),
                                           left=devicelist),
-                       'Run Engine': GUILayout(RunEngineWidget(),
-                                               left=devicelist)
+                       'Run Engine': GUILayout(LazyWidget(_runenginewidget, 'RunEngineWidget'),
+                                               left=devicelist,
+                                               bottom=LazyWidget(_pointtimingwidget, 'PointTimingWidget'),
+                                               right=LazyWidget(_catrafficwidget, 'CATrafficWidget')),
+                       'Diagnostics': GUILayout(LazyWidget(_stallwidget, 'StallWidget'),
+                                                left=devicelist)
                        }
         super(AcquirePlugin, self).__init__()
 
 
+# Stage widget factories; their modules pull in pyqode's backend, the RunEngine and plotting, so import them late
+def _scripteditor():
+    from .pythontools.editor import scripteditor
+    return scripteditor()
+
+
+def _runenginewidget():
+    from .controlwidgets import RunEngineWidget
+    return RunEngineWidget()
+
+
+def _pointtimingwidget():
+    from .controlwidgets import PointTimingWidget
+    return PointTimingWidget()
+
+
+def _catrafficwidget():
+    from .controlwidgets import CATrafficWidget
+    return CATrafficWidget()
+
+
+def _stallwidget():
+    from .controlwidgets import StallWidget
+    return StallWidget()
+
+
 class QStackedWidget(QStackedWidget):
     def addSetWidget(self, w):
         self.addWidget(w)
@@ -0,0 +1,144 @@
+"""
+An in-memory cache of averaged dark frames, for live background correction.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from xicam.core import msg
+
+# Settings a dark frame is only valid for, as components of the detector; those it does not have are left out
+DEFAULT_SETTINGS = ('cam.acquire_time', 'cam.gain', 'cam.fcric_gain', 'cam.min_x', 'cam.min_y', 'cam.size.size_x',
+                    'cam.size.size_y', 'cam.bin_x', 'cam.bin_y')
+
+
+class DarkFrameCache:
+    """
+    A document callback that keeps the averaged dark frames of ``device``, ready to subtract from live frames.
+
+    When a run with a 'dark' stream holding the detector's image completes, its dark frames are loaded from the catalog
+    and averaged, once, into a read-only float32 array; ``decode`` is applied to each of them first, if given. It is
+    kept under the run's uid and the values of the ``settings`` signals that the dark stream's descriptor recorded, so
+    ``get`` only returns darks taken with the settings the detector has now (settings a descriptor did not record match
+    any value). The detector's current settings are followed through subscriptions, so a lookup never reads from the
+    IOC.
+
+    Parameters
+    ----------
+    device : ophyd.Device
+        The detector.
+    settings : tuple of str
+        Dotted names of the components of ``device`` a dark frame depends on.
+    catalog : str
+        Name of the databroker catalog the runs are read from.
+    max_entries : int
+        Number of dark frames kept; the oldest is dropped first.
+    flush : callable, optional
+        Called as ``flush(timeout)`` before the dark frames of a run that just stopped are read, to wait until its
+        documents are in the catalog, e.g. QRunEngine.flush_documents; returns False if they are not yet.
+    flush_timeout : float
+        Time (s) to wait for them.
+    decode : callable, optional
+        Called with each raw dark frame, e.g. to decode the gain bits of its pixels; returns it as float32 intensities.
+    """
+
+    def __init__(self, device, settings=DEFAULT_SETTINGS, catalog='local', max_entries=8, flush=None,
+                 flush_timeout=30, decode=None):
+        self.device = device
+        self.field = f'{device.name}_image'
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self.flush = flush
+        self.flush_timeout = flush_timeout
+        self.decode = decode
+
+        self._signals = []
+        for setting in settings:
+            try:
+                self._signals.append(getattr(device, setting))
+            except AttributeError:
+                pass
+        self._current = {signal.name: None for signal in self._signals}
+        for signal in self._signals:
+            signal.subscribe(self._setting_changed, run=False)
+
+        self._darks = OrderedDict()  # (run uid, settings) -> averaged dark frame
+        self._lock = threading.Lock()
+        self._dark_runs = dict()  # run start uid -> settings of its dark stream, until the run stops
+
+    def __call__(self, name, doc):
+        if name == 'descriptor':
+            if doc.get('name') == 'dark' and self.field in doc['data_keys']:
+                self._dark_runs[doc['run_start']] = self._recorded_settings(doc)
+        elif name == 'stop':
+            settings = self._dark_runs.pop(doc['run_start'], None)
+            if settings is not None and doc.get('exit_status') == 'success':
+                # The documents are written from another thread; they may not all be in the catalog yet
+                if self.flush is not None and not self.flush(self.flush_timeout):
+                    msg.logMessage(f'The documents of run {doc["run_start"]} were not written within '
+                                   f'{self.flush_timeout} s; reading its dark frames anyway.', level=msg.WARNING)
+                self.load(doc['run_start'], settings)
+
+    def get(self):
+        """The most recent dark frame taken with the detector's current settings, or None."""
+        current = tuple(self._current[signal.name] for signal in self._signals)
+        with self._lock:
+            for (_, settings), dark in reversed(self._darks.items()):
+                if all(value is None or now is None or value == now for value, now in zip(settings, current)):
+                    return dark
+        return None
+
+    def load(self, uid, settings=None):
+        """Load and average the dark frames of run ``uid`` (by default, taken with the current settings)."""
+        if settings is None:
+            settings = tuple(self._current[signal.name] for signal in self._signals)
+        try:
+            frames = np.asarray(self._read_darks(uid))
+            frames = frames.reshape((-1,) + frames.shape[-2:])
+            if self.decode is None:
+                dark = frames.mean(axis=0, dtype=np.float32)
+            else:
+                # Decoded one at a time, since raw values can't be averaged (the gain bits, for one)
+                dark = np.zeros(frames.shape[1:], dtype=np.float32)
+                for frame in frames:
+                    dark += self.decode(frame)
+                dark /= len(frames)
+        except Exception as ex:
+            msg.logMessage(f'Could not load the dark frames of run {uid}: {ex}', level=msg.WARNING)
+            return None
+        dark.flags.writeable = False
+        with self._lock:
+            self._darks[uid, settings] = dark
+            while len(self._darks) > self.max_entries:
+                self._darks.popitem(last=False)
+        msg.logMessage(f'Cached the dark frame of run {uid} for {self.device.name}', level=msg.DEBUG)
+        return dark
+
+    def prime(self):
+        """Load the dark frames of the catalog's latest run, if it has any; slow, so call it off the GUI thread."""
+        from databroker import Broker
+
+        try:
+            run = Broker.named(self.catalog).v2[-1]
+        except (IndexError, KeyError):
+            return  # An empty catalog
+        if 'dark' in run:
+            descriptor = run.dark.metadata['descriptors'][0]
+            if self.field in descriptor['data_keys']:
+                self.load(run.metadata['start']['uid'], self._recorded_settings(descriptor))
+
+    def clear(self):
+        with self._lock:
+            self._darks.clear()
+
+    def _recorded_settings(self, descriptor):
+        configuration = descriptor.get('configuration', dict()).get(self.device.name, dict()).get('data', dict())
+        return tuple(configuration.get(signal.name) for signal in self._signals)
+
+    def _read_darks(self, uid):
+        from databroker import Broker
+
+        return Broker.named(self.catalog).v2[uid].dark.to_dask()[self.field]
+
+    def _setting_changed(self, value, obj, **kwargs):
+        self._current[obj.name] = value
@@ -0,0 +1,119 @@
+"""
+Structured, low-overhead logging of RunEngine documents.
+"""
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger('xicam.Acquire.documents')
+
+
+class DocumentLogger:
+    """
+    A document callback that logs a summary of each run rather than every document.
+
+    Nothing is formatted unless the logger is enabled for ``level``; when it is not, each document costs a single
+    ``isEnabledFor`` check. Start, descriptor, resource and stop documents are logged in full, with array-like and
+    long fields truncated. Events are sampled: the first event of each descriptor is logged, later ones are only
+    counted, and the stop document is followed by one summary line per stream holding the event count and the last
+    event.
+
+    Parameters
+    ----------
+    level : int
+        Logging level to log at.
+    max_items : int
+        Number of items of a list or array shown before it is truncated.
+    max_length : int
+        Number of characters of a string shown before it is truncated.
+    """
+
+    def __init__(self, level=logging.DEBUG, max_items=8, max_length=200, logger=logger):
+        self.level = level
+        self.max_items = max_items
+        self.max_length = max_length
+        self.logger = logger
+
+        # Keyed by descriptor (events) or resource (datums) uid, so that runs on concurrent lanes don't mix
+        self._streams = dict()  # descriptor uid -> (run start uid, stream name)
+        self._event_counts = defaultdict(int)
+        self._last_events = dict()
+        self._resources = dict()  # resource uid -> run start uid
+        self._datum_counts = defaultdict(int)
+
+    def __call__(self, name, doc):
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        if name == 'event':
+            self._log_event(doc['descriptor'], 1, doc)
+        elif name == 'event_page':
+            self._log_event(doc['descriptor'], len(doc['seq_num']), doc)
+        elif name == 'datum':
+            self._datum_counts[doc['resource']] += 1
+        elif name == 'datum_page':
+            self._datum_counts[doc['resource']] += len(doc['datum_id'])
+        else:
+            if name == 'descriptor':
+                self._streams[doc['uid']] = (doc['run_start'], doc.get('name'))
+            elif name == 'resource':
+                self._resources[doc['uid']] = doc.get('run_start')
+            self.logger.log(self.level, '%s %s', name, _Truncated(doc, self.max_items, self.max_length))
+            if name == 'stop':
+                self._log_summary(doc)
+
+    def _log_event(self, descriptor, count, doc):
+        if descriptor not in self._event_counts:
+            self.logger.log(self.level, 'first event of stream %r: %s', self._streams.get(descriptor, (None, None))[1],
+                            _Truncated(doc, self.max_items, self.max_length))
+        self._event_counts[descriptor] += count
+        self._last_events[descriptor] = doc
+
+    def _log_summary(self, stop):
+        run_start = stop['run_start']
+        for descriptor in [uid for uid, (run, _) in self._streams.items() if run == run_start]:
+            _, stream = self._streams.pop(descriptor)
+            count = self._event_counts.pop(descriptor, 0)
+            if count:
+                self.logger.log(self.level, 'run %s stream %r: %d events; last event: %s', run_start, stream, count,
+                                _Truncated(self._last_events.pop(descriptor), self.max_items, self.max_length))
+
+        resources = [uid for uid, run in self._resources.items() if run == run_start]
+        datums = sum(self._datum_counts.pop(uid, 0) for uid in resources)
+        for uid in resources:
+            del self._resources[uid]
+        if datums:
+            self.logger.log(self.level, 'run %s: %d datums in %d resources', run_start, datums, len(resources))
+
+
+class _Truncated:
+    """Formats a document with long arrays, lists and strings shortened; only evaluated if a record is emitted."""
+
+    def __init__(self, doc, max_items, max_length):
+        self.doc = doc
+        self.max_items = max_items
+        self.max_length = max_length
+
+    def __str__(self):
+        return repr(self._truncate(self.doc))
+
+    def _truncate(self, value):
+        if isinstance(value, dict):
+            return {key: self._truncate(item) for key, item in value.items()}
+        if isinstance(value, np.ndarray):
+            if value.size <= self.max_items:
+                return value.tolist()
+            return _Raw(f'<ndarray shape={value.shape} dtype={value.dtype}>')
+        if isinstance(value, (list, tuple)):
+            if len(value) <= self.max_items:
+                return [self._truncate(item) for item in value]
+            return [self._truncate(item) for item in value[:self.max_items]] + [_Raw(f'... ({len(value)} items)')]
+        if isinstance(value, str) and len(value) > self.max_length:
+            return value[:self.max_length] + f'... ({len(value)} characters)'
+        return value
+
+
+class _Raw(str):
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,274 @@
+"""
+Background, batched document writing for the RunEngine.
+"""
+import pickle
+import tempfile
+import threading
+import time
+from queue import Queue, Full, Empty
+
+import event_model
+from xicam.core import msg
+
+# Queued after the documents a flush waits for; not a document name
+_FLUSH = 'xicam_acquire_flush'
+
+
+class BatchedDocumentWriter:
+    """
+    A RunEngine callback that hands documents to a serializer from a background thread.
+
+    Documents are passed through a bounded queue so that database round-trips never happen inside the RunEngine's
+    callback path. Event and datum documents are grouped into event_page/datum_page documents, which
+    suitcase.mongo_normalized.Serializer writes with a single bulk insert. Pending pages are flushed when they hold
+    ``max_batch`` documents, when the oldest of them is ``flush_interval`` seconds old, and before any other document
+    (start, descriptor, resource, stop) is written, so documents always reach the database in a consistent order.
+    Documents that cannot be written as a page (their data keys differ, or the bulk insert fails) are written one by
+    one instead.
+
+    Parameters
+    ----------
+    serializer : callable
+        Called as ``serializer(name, doc)`` on the writer thread. Usually a suitcase.mongo_normalized.Serializer,
+        which accepts either URIs or pymongo/mongomock Database objects.
+    max_queue : int
+        Number of documents that may wait in the queue before backpressure applies.
+    max_batch : int
+        Number of events or datums written per page.
+    flush_interval : float
+        Maximum time (s) an event or datum waits before it is written.
+    backpressure : str
+        'block' makes the RunEngine wait for room in the queue; 'spill' appends the overflow to a temporary file
+        that is replayed, in order, once the writer has caught up.
+    spill_dir : str, optional
+        Directory for the spill file (defaults to the system temporary directory).
+    """
+
+    def __init__(self, serializer, max_queue=10000, max_batch=500, flush_interval=.5, backpressure='block',
+                 spill_dir=None):
+        if backpressure not in ('block', 'spill'):
+            raise ValueError(f'Unknown backpressure policy "{backpressure}"; expected "block" or "spill".')
+
+        self.serializer = serializer
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.spill_dir = spill_dir
+
+        self._queue = Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._spill_file = None
+        self._spilled = 0
+
+        self._pending_events = dict()  # descriptor uid -> [event, ...]
+        self._pending_datums = dict()  # resource uid -> [datum, ...]
+        self._pending_count = 0
+        self._pending_since = None
+
+        self._max_queue_depth = 0
+        self._documents_written = 0
+        self._documents_spilled = 0
+        self._flushes = 0
+        self._flush_time = 0
+        self._last_flush_latency = 0
+        self._max_flush_latency = 0
+        self._errors = 0
+
+        self._flush_lock = threading.Lock()
+        self._flush_condition = threading.Condition()
+        self._flush_requests = 0
+        self._flushed = 0  # Last flush request the writer thread got to
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name='BatchedDocumentWriter', daemon=True)
+        self._thread.start()
+
+    def __call__(self, name, doc):
+        self._put((name, doc))
+
+    def flush(self, timeout=None):
+        """
+        Wait until every document handed to the writer so far is written, pending events and datums included.
+
+        Returns False if that took longer than ``timeout`` (s).
+        """
+        with self._flush_lock:  # Requests are queued in the order they are numbered
+            self._flush_requests += 1
+            request = self._flush_requests
+            self._put((_FLUSH, request))
+        with self._flush_condition:
+            return self._flush_condition.wait_for(lambda: self._flushed >= request or self._stopped, timeout)
+
+    def close(self, timeout=None):
+        """Write everything that is still queued and stop the writer thread."""
+        self._put(None)
+        self._thread.join(timeout)
+
+    @property
+    def stats(self):
+        """Counters describing the writer's queue depth and flush latency."""
+        return {'queue_depth': self._queue.qsize() + self._spilled,
+                'max_queue_depth': self._max_queue_depth,
+                'documents_written': self._documents_written,
+                'documents_spilled': self._documents_spilled,
+                'flushes': self._flushes,
+                'last_flush_latency': self._last_flush_latency,
+                'mean_flush_latency': self._flush_time / self._flushes if self._flushes else 0,
+                'max_flush_latency': self._max_flush_latency,
+                'errors': self._errors}
+
+    def _put(self, item):
+        if self.backpressure == 'block':
+            self._queue.put(item)
+        else:
+            with self._spill_lock:
+                # Once anything has spilled, keep spilling until the writer replays the file; this preserves order
+                if not self._spilled:
+                    try:
+                        self._queue.put_nowait(item)
+                    except Full:
+                        self._spill(item)
+                else:
+                    self._spill(item)
+
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize() + self._spilled)
+
+    def _spill(self, item):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix='xicam-acquire-spill-', dir=self.spill_dir)
+        pickle.dump(item, self._spill_file, pickle.HIGHEST_PROTOCOL)
+        self._spilled += 1
+        self._documents_spilled += 1
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    self._write_queued()
+                    return
+                except Exception as ex:
+                    # Carry on with the next document: a dead writer would never drain the queue, and with 'block'
+                    # backpressure the RunEngine would wait for it forever
+                    self._errors += 1
+                    msg.logMessage('The document writer failed on a document; it carries on with the next one.',
+                                   level=msg.ERROR)
+                    msg.logError(ex)
+        finally:
+            with self._flush_condition:
+                self._stopped = True
+                self._flush_condition.notify_all()
+
+    def _write_queued(self):
+        while True:
+            try:
+                if self._spilled:
+                    item = self._queue.get(block=False)
+                else:
+                    item = self._queue.get(timeout=self._time_to_flush())
+            except Empty:
+                self._flush()
+                if self._spilled and not self._replay_spill():
+                    return
+                continue
+
+            if not self._handle(item):
+                self._flush()
+                return
+
+    def _time_to_flush(self):
+        if not self._pending_count:
+            return None  # Nothing pending; sleep until the next document arrives
+        return max(0, self._pending_since + self.flush_interval - time.monotonic())
+
+    def _replay_spill(self):
+        with self._spill_lock:
+            spill_file, self._spill_file = self._spill_file, None
+            count, self._spilled = self._spilled, 0
+
+        spill_file.seek(0)
+        try:
+            for _ in range(count):
+                if not self._handle(pickle.load(spill_file)):
+                    self._flush()
+                    return False
+        finally:
+            spill_file.close()
+        return True
+
+    def _handle(self, item):
+        if item is None:
+            return False
+
+        name, doc = item
+        if name == _FLUSH:
+            self._flush()
+            with self._flush_condition:
+                self._flushed = doc
+                self._flush_condition.notify_all()
+        elif name == 'event':
+            self._add_pending(self._pending_events, doc['descriptor'], doc)
+        elif name == 'datum':
+            self._add_pending(self._pending_datums, doc['resource'], doc)
+        else:
+            self._flush()
+            self._write(name, doc)
+
+        if self._pending_count >= self.max_batch or \
+                (self._pending_count and time.monotonic() - self._pending_since >= self.flush_interval):
+            self._flush()
+        return True
+
+    def _add_pending(self, pending, key, doc):
+        pending.setdefault(key, []).append(doc)
+        if not self._pending_count:
+            self._pending_since = time.monotonic()
+        self._pending_count += 1
+
+    def _flush(self):
+        if not self._pending_count:
+            return
+
+        start = time.perf_counter()
+        # Datums first, so that events never reference a datum that hasn't been written yet
+        for datums in self._pending_datums.values():
+            self._write_page('datum', event_model.pack_datum_page, datums)
+        for events in self._pending_events.values():
+            self._write_page('event', event_model.pack_event_page, events)
+        self._pending_datums.clear()
+        self._pending_events.clear()
+        self._pending_count = 0
+        self._pending_since = None
+
+        latency = time.perf_counter() - start
+        self._flushes += 1
+        self._flush_time += latency
+        self._last_flush_latency = latency
+        self._max_flush_latency = max(self._max_flush_latency, latency)
+
+    def _write_page(self, name, pack, docs):
+        # Writes docs as a single page; if they can't be packed (their data keys differ, say) or the page can't be
+        # written, they are written one by one, so only the documents that fail are lost
+        try:
+            page = pack(*docs)
+        except Exception as ex:
+            msg.logMessage(f'Could not pack {len(docs)} {name} documents into a page; writing them one by one.',
+                           level=msg.WARNING)
+            msg.logError(ex)
+        else:
+            if self._write(f'{name}_page', page, len(docs)):
+                return
+            msg.logMessage(f'Could not write a page of {len(docs)} {name} documents; writing them one by one.',
+                           level=msg.WARNING)
+        for doc in docs:
+            self._write(name, doc)
+
+    def _write(self, name, doc, count=1):
+        try:
+            self.serializer(name, doc)
+        except Exception as ex:
+            self._errors += 1
+            msg.logMessage(f'Could not write {name} document to the database.', level=msg.ERROR)
+            msg.logError(ex)
+            return False
+        self._documents_written += count
+        return True
@@ -0,0 +1,87 @@
+"""
+Rate-limited delivery of documents to Qt widgets.
+"""
+import threading
+import time
+
+import event_model
+from qtpy.QtCore import QObject, QTimer, Signal
+from xicam.core import msg
+
+
+class QDocumentThrottle(QObject):
+    """
+    A document callback that delivers to a GUI consumer at most ``max_rate`` times per second.
+
+    Documents may arrive from any thread; they are buffered and handed to ``consumer(name, doc)`` on the thread that
+    owns this object (normally the GUI thread) in batches. Consecutive events of a descriptor (and datums of a
+    resource) are coalesced into a single event_page (datum_page), so a fast scan costs the GUI one update per
+    interval rather than one per point. No document is dropped: start, descriptor, resource and stop documents are
+    always delivered individually and in order.
+
+    Parameters
+    ----------
+    consumer : callable
+        Called as ``consumer(name, doc)``; must accept event_page and datum_page documents.
+    max_rate : float
+        Maximum number of deliveries per second.
+    """
+    _sigSchedule = Signal()
+
+    def __init__(self, consumer, max_rate=10, parent=None):
+        super(QDocumentThrottle, self).__init__(parent)
+        self.consumer = consumer
+        self.max_rate = max_rate
+
+        self._lock = threading.Lock()
+        self._buffer = []  # [name, doc or [docs to pack]]
+        self._scheduled = False
+        self._last_delivery = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._deliver)
+        self._sigSchedule.connect(self._schedule)  # Queued when emitted from another thread
+
+    def __call__(self, name, doc):
+        with self._lock:
+            if name in ('event', 'datum'):
+                key = 'descriptor' if name == 'event' else 'resource'
+                if self._buffer and self._buffer[-1][0] == name and self._buffer[-1][1][-1][key] == doc[key]:
+                    self._buffer[-1][1].append(doc)
+                else:
+                    self._buffer.append([name, [doc]])
+            else:
+                self._buffer.append([name, doc])
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._sigSchedule.emit()
+
+    def clear(self):
+        """Discard anything that has not been delivered yet."""
+        with self._lock:
+            self._buffer = []
+
+    def _schedule(self):
+        interval = 1 / self.max_rate
+        wait = self._last_delivery + interval - time.monotonic()
+        self._timer.start(max(0, int(wait * 1000)))
+
+    def _deliver(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+            self._scheduled = False
+        self._last_delivery = time.monotonic()
+
+        for name, doc in buffer:
+            if name == 'event':
+                name, doc = 'event_page', event_model.pack_event_page(*doc)
+            elif name == 'datum':
+                name, doc = 'datum_page', event_model.pack_datum_page(*doc)
+            try:
+                self.consumer(name, doc)
+            except Exception as ex:
+                msg.logMessage(f'Could not display a {name} document.', level=msg.ERROR)
+                msg.logError(ex)
@@ -0,0 +1,179 @@
+"""
+Channel Access traffic accounting: gets, puts, put completions and monitor updates per PV, with their latencies.
+"""
+import threading
+import time
+from functools import wraps
+
+from xicam.Acquire.summarystreams import summary_stream
+
+# Per-PV counters; the *_time fields are total latencies (s)
+FIELDS = ('gets', 'get_time', 'puts', 'put_time', 'put_completions', 'put_completion_time', 'monitors')
+_GETS, _GET_TIME, _PUTS, _PUT_TIME, _COMPLETIONS, _COMPLETION_TIME, _MONITORS = range(len(FIELDS))
+
+
+class CATraffic:
+    """
+    Counts the Channel Access requests ophyd makes, per PV, for the whole process and for each owner.
+
+    ``install`` wraps the methods of the control layer's PV class (pyepics or caproto), so every PV is counted,
+    including those created before it was called. Counts only grow; take a ``snapshot`` before a plan and use
+    ``since`` after it to get the plan's traffic. A get is counted even when it is served from a monitored value,
+    since that is still a round-trip the plan asked for.
+
+    Requests made from a thread that was given an owner (see ``own``), such as a RunEngine lane, are also counted
+    under it, so the traffic of one lane leaves out that of the other lanes and of the GUI. Put completions count
+    under the owner of the put; monitor updates arrive on Channel Access threads, and are only counted for the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict()  # PV name -> list of FIELDS
+        self._owned = dict()  # owner -> {PV name -> list of FIELDS}
+        self._local = threading.local()
+        self.installed = None  # The PV class that was instrumented
+
+    def install(self):
+        """Instrument the current ophyd control layer; does nothing if it was already, or it is the dummy layer."""
+        if self.installed is not None:
+            return
+        pv_class = _control_layer_pv_class()
+        if pv_class is None:
+            return
+        pv_class.get_with_metadata = self._wrap_get(pv_class.get_with_metadata)
+        pv_class.put = self._wrap_put(pv_class.put)
+        pv_class.run_callbacks = self._wrap_monitor(pv_class.run_callbacks)
+        self.installed = pv_class
+
+    def own(self, owner):
+        """Also count the requests the calling thread makes from now on under ``owner`` (None to stop)."""
+        self._local.owner = owner
+
+    def snapshot(self, owner=None):
+        """The counts so far, of the whole process or of ``owner``."""
+        with self._lock:
+            counts = self._counts if owner is None else self._owned.get(owner, dict())
+            return {name: tuple(pv_counts) for name, pv_counts in counts.items()}
+
+    def since(self, snapshot=None, owner=None):
+        """
+        Traffic since ``snapshot`` (or all of it), as a list of dicts of FIELDS plus 'pv', for the PVs that had any;
+        ``snapshot`` and the traffic are of the whole process, or of ``owner``.
+
+        A list rather than a dict keyed by PV name, so it can be stored in a document: PV names contain dots.
+        """
+        snapshot = snapshot or dict()
+        traffic = []
+        for name, counts in self.snapshot(owner).items():
+            before = snapshot.get(name)
+            if before:
+                counts = [count - previous for count, previous in zip(counts, before)]
+            if any(counts[index] for index in (_GETS, _PUTS, _COMPLETIONS, _MONITORS)):
+                traffic.append(dict(zip(FIELDS, counts), pv=name))
+        return traffic
+
+    def _count(self, name, count_index, time_index=None, elapsed=0., owner=None):
+        with self._lock:
+            tables = (self._counts,) if owner is None else (self._counts, self._owned.setdefault(owner, dict()))
+            for table in tables:
+                counts = table.get(name)
+                if counts is None:
+                    counts = table[name] = [0, 0., 0, 0., 0, 0., 0]
+                counts[count_index] += 1
+                if time_index is not None:
+                    counts[time_index] += elapsed
+
+    def _owner(self):
+        return getattr(self._local, 'owner', None)
+
+    def _wrap_get(self, get):
+        @wraps(get)
+        def counted(pv, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return get(pv, *args, **kwargs)
+            finally:
+                self._count(pv.pvname, _GETS, _GET_TIME, time.perf_counter() - start, self._owner())
+
+        return counted
+
+    def _wrap_put(self, put):
+        @wraps(put)
+        def counted(pv, value, *args, callback=None, wait=False, **kwargs):
+            name = pv.pvname
+            owner = self._owner()
+            start = time.perf_counter()
+            if callback is not None:
+                callback = self._wrap_completion(callback, name, start, owner)
+            try:
+                return put(pv, value, *args, callback=callback, wait=wait, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._count(name, _PUTS, _PUT_TIME, elapsed, owner)
+                if wait and callback is None:
+                    self._count(name, _COMPLETIONS, _COMPLETION_TIME, elapsed, owner)
+
+        return counted
+
+    def _wrap_completion(self, callback, name, start, owner):
+        @wraps(callback)
+        def completed(*args, **kwargs):
+            self._count(name, _COMPLETIONS, _COMPLETION_TIME, time.perf_counter() - start, owner)
+            return callback(*args, **kwargs)
+
+        return completed
+
+    def _wrap_monitor(self, run_callbacks):
+        @wraps(run_callbacks)
+        def counted(pv, *args, **kwargs):
+            self._count(pv.pvname, _MONITORS)
+            return run_callbacks(pv, *args, **kwargs)
+
+        return counted
+
+
+def _control_layer_pv_class():
+    import ophyd
+
+    name = ophyd.get_cl().name
+    if name == 'caproto':
+        from ophyd._caproto_shim import PV
+        return PV
+    if name == 'pyepics':
+        from ophyd._pyepics_shim import PyepicsShimPV
+        return PyepicsShimPV
+    return None
+
+
+class CATrafficRecorder:
+    """
+    Records the Channel Access traffic of each run of a RunEngine (see CATraffic.since) in a stream of the run,
+    ``ca_traffic`` (see summary_stream), just before it closes.
+
+    Only the traffic of ``owner`` is recorded (see CATraffic.own), or all of the process's if None; ``install`` makes
+    the RunEngine's event loop thread count under ``owner``.
+    """
+
+    def __init__(self, traffic, owner=None, enabled=True):
+        self.traffic = traffic
+        self.owner = owner
+        self.enabled = enabled
+        self._snapshot = None  # Of the current run
+
+    def install(self, run_engine):
+        if self.owner is not None:
+            run_engine.loop.call_soon_threadsafe(self.traffic.own, self.owner)
+        run_engine.subscribe(self._start, 'start')
+        run_engine.preprocessors.append(summary_stream('ca_traffic', self.summary,
+                                                       lambda: self.enabled and self._snapshot is not None))
+
+    def summary(self):
+        """The traffic of the current run so far."""
+        return self.traffic.since(self._snapshot, self.owner)
+
+    def _start(self, name, doc):
+        self._snapshot = self.traffic.snapshot(self.owner) if self.enabled else None
+
+
+# Shared by every RunEngine lane in the process
+ca_traffic = CATraffic()
@@ -1,7 +1,6 @@
 import time
 
 import numpy as np
-from databroker.core import BlueskyRun
 from ophyd.utils import set_and_wait
 from qtpy.QtCore import Qt, QTimer, Slot
 from pydm.widgets.display_format import DisplayFormat
@@ -1,25 +1,66 @@
+from typing import TYPE_CHECKING
+
 from bluesky.plans import count
 from happi import from_container
 from ophyd import Device
 import numpy as np
-from databroker import Broker
 from pydm.widgets.checkbox import PyDMCheckbox
 from pydm.widgets.enum_combo_box import PyDMEnumComboBox
 from pydm.widgets.line_edit import PyDMLineEdit
-from databroker.core import BlueskyRun
 from qtpy.QtWidgets import QVBoxLayout, QCheckBox, QGroupBox, QFormLayout, QHBoxLayout, QPushButton
-from xicam.core import msg
+from xicam.core import msg, threads
 from xicam.gui.widgets.dynimageview import DynImageView
 from xicam.gui.widgets.imageviewmixins import PixelCoordinates, Crosshair, BetterButtons, LogScaleIntensity, \
-    ImageViewHistogramOverflowFix, AreaDetectorROI
+    ImageViewHistogramOverflowFix, AreaDetectorROI, DeviceView
 from xicam.plugins import ControllerPlugin
 from xicam.plugins import manager as plugin_manager
 
 # from xicam.SAXS.processing.correction import CorrectFastCCDImage
+from xicam.Acquire.callbacks.darkframes import DarkFrameCache
+from xicam.Acquire.correction import FrameCorrectionPipeline, TiledFrameCorrector, DarkSubtraction
+from xicam.Acquire.liveframes import LatestFrame
 from xicam.Acquire.runengine import get_run_engine
 
+if TYPE_CHECKING:
+    from databroker.core import BlueskyRun
+
+
+class LatestFrameView(DeviceView):
+    """
+    A DeviceView that reads the detector's frame only when it has a new one (see LatestFrame), at most ``max_fps``
+    times per second, and shows how many frames were displayed and dropped.
+    """
+    latest_frame = None  # Until the device has been set up
+
+    def __init__(self, *args, device=None, **kwargs):
+        super(LatestFrameView, self).__init__(*args, device=device, **kwargs)
+        if hasattr(device, 'image1'):
+            self.latest_frame = LatestFrame(device.image1)
+
+    def updateFrame(self):
+        if self.latest_frame is None:
+            return super(LatestFrameView, self).updateFrame()
+
+        image = self.latest_frame.read()
+        if image is not None and len(image):
+            if self.preprocess:
+                try:
+                    image = self.preprocess(image)
+                except Exception as ex:
+                    msg.logMessage(f'Could not preprocess a frame of {self.device.name}: {ex}', level=msg.DEBUG)
+            self.getting_frame = True
+            threads.invoke_in_main_thread(self._setFrame, image)
+
+    def _setFrame(self, image):
+        super(LatestFrameView, self)._setFrame(image)
+        latest_frame = self.latest_frame
+        if latest_frame is not None:
+            self.error_text.setText(f'{self.error_text.toPlainText()}\n'
+                                    f'{latest_frame.displayed} frames displayed, {latest_frame.dropped} dropped')
+
 
 class ADImageView(AreaDetectorROI,
+                  LatestFrameView,
                   DynImageView,
                   PixelCoordinates,
                   Crosshair,
@@ -32,6 +73,7 @@ class ADImageView(AreaDetectorROI,
 class AreaDetectorController(ControllerPlugin):
     viewclass = ADImageView
     view_kwargs = dict()
+    decode_dark = None  # Applied to each dark frame before they are averaged, if set; see DarkFrameCache
 
     def __init__(self, device, preprocess_enabled=True, maxfps=4):  # Note: typical query+processing+display <.2s
         super(AreaDetectorController, self).__init__(device)
@@ -45,7 +87,15 @@ class AreaDetectorController(ControllerPlugin):
         self.bg_correction = QCheckBox("Background Correction")
         self.bg_correction.setChecked(True)
 
-        self.imageview = self.viewclass(device=device, preprocess=self.preprocess, **self.view_kwargs)
+        # Averaged dark frames, refreshed when a run with a dark stream completes rather than looked up for each frame
+        self.dark_cache = DarkFrameCache(device, flush=self.RE.flush_documents, decode=self.decode_dark)
+        self.RE.subscribe(self.dark_cache)
+        threads.QThreadFuture(self.dark_cache.prime, showBusy=False).start()
+        self.dark_subtraction = DarkSubtraction(self.dark_cache.get)
+        # Frames are corrected in tiles of rows, on a pool of threads
+        self.correction = TiledFrameCorrector(FrameCorrectionPipeline([self.dark_subtraction]))
+
+        self.imageview = self.viewclass(device=device, preprocess=self.preprocess, max_fps=maxfps, **self.view_kwargs)
         self.layout().addWidget(self.imageview)
         self.layout().addWidget(self.bg_correction)
         self.metadata = {}
@@ -101,13 +151,6 @@ class AreaDetectorController(ControllerPlugin):
         # self.scaleCheck = QCheckBox()
         # self.rgbLevelsCheck = QCheckBox()
 
-        # self.update_timer = QTimer()
-        # self.update_timer.setInterval(1000 // maxfps)
-        # self.update_timer.timeout.connect(self.updateFrame)
-        # self.update_timer.start()
-
-        # self.device.image1.shaped_image.subscribe(self.cacheFrame, 'value')
-
     def acquire(self):
         self.RE(count(self.coupled_devices), **self.metadata)
 
@@ -122,7 +165,7 @@ class AreaDetectorController(ControllerPlugin):
         self.abort_button.setEnabled(False)
         self.abort_button.setStyleSheet('')
 
-    def get_dark(self, run_catalog: BlueskyRun):
+    def get_dark(self, run_catalog: 'BlueskyRun'):
         darks = np.asarray(run_catalog.dark.to_dask()[f"{self.device.name}_image"]).squeeze()
         if darks.ndim == 3:
             darks = np.mean(darks, axis=0)
@@ -130,12 +173,7 @@ class AreaDetectorController(ControllerPlugin):
 
     def preprocess(self, image):
         if self.bg_correction.isChecked():
-            try:
-                flats = np.ones_like(image)
-                darks = self.get_dark(Broker.named('local').v2[-1])
-                image = image - darks
-            except Exception:
-                pass
+            image = self.correction(image)
 
         return image
 
@@ -1,9 +1,6 @@
 from bluesky.plans import scan
 from bluesky_widgets.utils.streaming import stream_documents_into_runs
-from bluesky.callbacks.best_effort import BestEffortCallback
 from bluesky.callbacks.core import CallbackBase
-from databroker import Broker
-from databroker.core import BlueskyRun
 from happi import from_container
 from ophyd import Device
 from pydm.widgets.line_edit import PyDMLineEdit
@@ -12,11 +12,15 @@ from .areadetector import AreaDetectorController
 from xicam.plugins import manager as plugin_manager
 from xicam.SAXS.ontology import NXsas
 from xicam.core.msg import logError, notifyMessage, ERROR
-from xicam.SAXS.operations.correction import correct
+from xicam.Acquire.correction import FrameCorrectionPipeline, BitMask, GainMap, PixelMask, CommonMode
 
 
 # Pulled from NDPluginFastCCD.h:11
 FCCD_MASK = 0x1FFF
+# The other bits of a pixel: bit 13 flags a bad pixel, and bits 14-15 select the gain its intensity was read at
+FCCD_BAD_PIXEL = 1 << 13
+FCCD_GAIN_SHIFT = 14
+FCCD_GAINS = (1, 2, 4, 8)
 dark_exposures = 1
 
 
@@ -29,6 +33,13 @@ class FastCCDController(AreaDetectorController):
         self.noise_correction = QCheckBox('Noise Correction')
         self.layout().addWidget(self.noise_correction)
 
+        # Raw pixels are decoded to gain-corrected intensities, with the dark (decoded by decode_dark) subtracted
+        self.gain_map = GainMap(FCCD_GAINS, FCCD_GAIN_SHIFT, 0x3)
+        self.bad_pixels = PixelMask(flag_bits=FCCD_BAD_PIXEL)
+        self.common_mode = CommonMode(rows=10)
+        self.correction.pipeline = FrameCorrectionPipeline([BitMask(FCCD_MASK), self.gain_map, self.dark_subtraction,
+                                                            self.bad_pixels, self.common_mode])
+
         self.config_layout.addRow('Acquire Time',
                                   PyDMLineEdit(init_channel=f'ca://{device.cam.acquire_time.setpoint_pvname}'))
         self.config_layout.insertRow(1, 'Acquire Period',
@@ -166,20 +177,18 @@ class FastCCDController(AreaDetectorController):
     def _bitmask(self, array):
         return array.astype(int) & FCCD_MASK
 
+    def decode_dark(self, frame):
+        # A raw dark frame's intensities, as the live frames' are decoded
+        frame = np.asarray(frame, dtype=np.uint16)
+        gains = np.asarray(FCCD_GAINS, dtype=np.float32)[(frame >> FCCD_GAIN_SHIFT) & 0x3]
+        return (frame & FCCD_MASK) * gains
+
     def preprocess(self, image):
-        if self.bg_correction.isChecked():
-            try:
-                flats = np.ones_like(image)
-                darks = self.get_dark(Broker.named('local').v2[-1])
-                image = correct(np.expand_dims(image, 0), flats, darks)[0]
-            except Exception:
-                pass
-        else:
-            image = image.astype(np.uint16) & 0x1FFF
+        background = self.bg_correction.isChecked()
+        self.gain_map.enabled = self.dark_subtraction.enabled = self.bad_pixels.enabled = background
+        self.common_mode.enabled = self.noise_correction.isChecked()
 #        image = np.delete(image, slice(966, 1084), 1)
-        if self.noise_correction.isChecked():
-            image -= np.tile(image[:10], (96, 1))
-        return image
+        return self.correction(image)
 
     def _plan(self):
         yield from bps.open_run()
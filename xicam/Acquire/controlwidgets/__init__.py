@@ -1 +1,4 @@
 from .runenginewidget import RunEngineWidget
+from .pointtiming import PointTimingWidget
+from .catraffic import CATrafficWidget
+from .stalls import StallWidget
@@ -0,0 +1,91 @@
+from qtpy.QtCore import Qt
+from qtpy.QtGui import QStandardItemModel, QStandardItem
+from qtpy.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QLabel, QTableView, QHeaderView
+
+from xicam.Acquire.runengine import get_run_engine
+
+# Column title, and the count and total time fields of CATraffic shown in it (a mean latency if there is a time)
+_COLUMNS = [('PV', None, None),
+            ('Gets', 'gets', None),
+            ('Mean get (ms)', 'gets', 'get_time'),
+            ('Puts', 'puts', None),
+            ('Mean put (ms)', 'puts', 'put_time'),
+            ('Put completions', 'put_completions', None),
+            ('Mean completion (ms)', 'put_completions', 'put_completion_time'),
+            ('Monitor updates', 'monitors', None)]
+
+
+class CATrafficWidget(QWidget):
+    """
+    A sortable table of the Channel Access requests made by the last plan that finished, per PV; requests are only
+    counted while counting is on.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CATrafficWidget, self).__init__(*args, **kwargs)
+
+        self.RE = get_run_engine()
+
+        self.countbox = QCheckBox('Count Channel Access traffic')
+        self.countbox.setChecked(self.RE.count_ca_traffic)
+        self.countbox.setEnabled(not self.RE.process)
+        self.label = QLabel()
+        self.model = QStandardItemModel()
+        self.model.setHorizontalHeaderLabels([title for title, _, _ in _COLUMNS])
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        # Layout
+        self.layout = QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.layout)
+        self.toplayout = QHBoxLayout()
+        self.toplayout.addWidget(self.countbox)
+        self.toplayout.addWidget(self.label, stretch=1)
+        self.layout.addLayout(self.toplayout)
+        self.layout.addWidget(self.view)
+
+        # Wireup signals
+        self.countbox.toggled.connect(self.RE.set_ca_traffic_counting)
+        self.countbox.toggled.connect(self.refresh)
+        self.RE.sigFinish.connect(self.refresh)
+
+        self.refresh()
+
+    def refresh(self):
+        if not self.RE.plan_ca_traffic:
+            if self.RE.process:
+                self.label.setText('Channel Access traffic is counted in the RunEngine process.'
+                                   if self.RE.count_ca_traffic else 'Channel Access traffic is not counted.')
+            else:
+                self.label.setText('No plans have run yet.' if self.RE.count_ca_traffic
+                                   else 'Channel Access traffic is not counted.')
+            return
+
+        plan_name, traffic = self.RE.plan_ca_traffic[-1]
+        self.label.setText(f'{plan_name}: {sum(pv["gets"] + pv["puts"] for pv in traffic)} requests '
+                           f'to {len(traffic)} PVs')
+
+        header = self.view.horizontalHeader()
+        sort_column, sort_order = header.sortIndicatorSection(), header.sortIndicatorOrder()
+        self.model.removeRows(0, self.model.rowCount())
+        for pv in traffic:
+            self.model.appendRow([self._item(pv, count, total) for _, count, total in _COLUMNS])
+        self.view.sortByColumn(sort_column, sort_order)
+
+    @staticmethod
+    def _item(pv, count, total):
+        if count is None:
+            item = QStandardItem(pv['pv'])
+        else:
+            item = QStandardItem()
+            # Numbers as data rather than text, so the columns sort numerically
+            if total is None:
+                item.setData(pv[count], Qt.DisplayRole)
+            elif pv[count]:
+                item.setData(round(pv[total] / pv[count] * 1e3, 2), Qt.DisplayRole)
+        item.setEditable(False)
+        return item
@@ -0,0 +1,88 @@
+import numpy as np
+import pyqtgraph as pg
+from qtpy.QtCore import QTimer
+from qtpy.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QLabel
+
+from xicam.Acquire.runengine import get_run_engine
+from xicam.Acquire.msgtrace import POINT_CATEGORIES
+
+
+class PointTimingWidget(QWidget):
+    """
+    Histograms of where the time of each scan point goes (move, settle, trigger, ...), and the scan's efficiency.
+
+    Shows the points of the run in progress, or of the last run, on the lane that started most recently; refreshed
+    every ``interval`` ms while a plan runs. Points are only recorded while message tracing is on.
+    """
+
+    def __init__(self, *args, interval=500, bins=50, **kwargs):
+        super(PointTimingWidget, self).__init__(*args, **kwargs)
+        self.bins = bins
+        self._lane = 0
+
+        self.RE = get_run_engine()
+
+        self.tracebox = QCheckBox('Record per-point timing')
+        self.tracebox.setChecked(self.RE.trace_messages)
+        self.tracebox.setEnabled(not self.RE.process)
+        self.summary = QLabel()
+        self.summary.setWordWrap(True)
+        self.plot = pg.PlotWidget()
+        self.plot.setLabel('bottom', 'Time per point', units='s')
+        self.plot.setLabel('left', 'Points')
+        self.plot.addLegend()
+        self.curves = {category: self.plot.plot([0, 0], [0], stepMode=True, name=category,
+                                                pen=pg.mkPen(pg.intColor(index, len(POINT_CATEGORIES)), width=2))
+                       for index, category in enumerate(POINT_CATEGORIES)}
+
+        # Layout
+        self.layout = QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.layout)
+        self.toplayout = QHBoxLayout()
+        self.toplayout.addWidget(self.tracebox)
+        self.toplayout.addWidget(self.summary, stretch=1)
+        self.layout.addLayout(self.toplayout)
+        self.layout.addWidget(self.plot)
+
+        # Wireup signals
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+        self.tracebox.toggled.connect(self.RE.set_message_tracing)
+        self.RE.sigLaneStart.connect(self._started)
+        self.RE.sigFinish.connect(self._finished)
+
+        self.refresh()
+
+    def _started(self, lane):
+        self._lane = lane
+        self.timer.start()
+
+    def _finished(self):
+        if self.RE.isIdle:
+            self.timer.stop()
+        self.refresh()
+
+    def refresh(self):
+        tracer = self.RE.message_tracers[self._lane]
+        if tracer is None:
+            self.summary.setText('Per-point timing is recorded in the RunEngine process and cannot be shown.')
+            return
+        points = list(tracer.points)
+        if not points:
+            self.summary.setText('No points recorded.' if self.RE.trace_messages else 'Per-point timing is off.')
+            for curve in self.curves.values():
+                curve.setData([0, 0], [0])
+            return
+
+        durations = {category: np.array([point[category] for point in points]) for category in POINT_CATEGORIES}
+        edges = np.histogram_bin_edges(np.concatenate(list(durations.values())), bins=self.bins)
+        for category, values in durations.items():
+            counts, _ = np.histogram(values, edges)
+            self.curves[category].setData(edges, counts)
+
+        wall = np.mean([point['wall'] for point in points])
+        means = ', '.join(f'{category} {values.mean() * 1e3:.1f}' for category, values in durations.items())
+        self.summary.setText(f'{len(points)} points, {wall * 1e3:.1f} ms each ({means} ms); '
+                             f'efficiency {tracer.efficiency(points):.1%}')
@@ -7,15 +7,15 @@ from qtpy.QtGui import QStandardItemModel, QClipboard, QGuiApplication
 from xicam.plugins import manager as pluginmanager
 from pyqtgraph.parametertree import ParameterTree, parameterTypes
 from xicam.gui.widgets.metadataview import MetadataWidget
-from functools import partial
-from xicam.core import threads, msg
+from xicam.core import msg
 from xicam.Acquire.runengine import get_run_engine
+from xicam.Acquire.callbacks.throttle import QDocumentThrottle
 
 empty_parameter = parameterTypes.GroupParameter(name='No parameters')
 
 
 class RunEngineWidget(QWidget):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_document_rate=10, **kwargs):
         super(RunEngineWidget, self).__init__(*args, **kwargs)
 
         self.planview = QListView()
@@ -28,6 +28,8 @@ class RunEngineWidget(QWidget):
         self.parameterview = ParameterTree()
 
         self.metadata = MetadataWidget()
+        # Coalesce documents so fast scans cost the GUI at most max_document_rate updates per second
+        self.document_throttle = QDocumentThrottle(self.metadata.doc_consumer, max_rate=max_document_rate, parent=self)
 
         self.copybutton = QPushButton('\u2398' + ' Copy parameters to clipboard')
         self.runbutton = QPushButton('Run')
@@ -35,6 +37,9 @@ class RunEngineWidget(QWidget):
         self.resumebutton = QPushButton('Resume')
         self.abortbutton = QPushButton('Abort')
         self.abortbutton.setStyleSheet('background-color:red;color:white;font-weight:bold;')
+        # Plans restored from before Xi-cam closed wait for the user to run or discard them
+        self.resumequeuebutton = QPushButton('Run restored plans')
+        self.clearqueuebutton = QPushButton('Discard restored plans')
 
         # Layout
         self.layout = QVBoxLayout()
@@ -53,6 +58,8 @@ class RunEngineWidget(QWidget):
         self.runlayout.addWidget(self.pausebutton)
         self.runlayout.addWidget(self.resumebutton)
         self.runlayout.addWidget(self.abortbutton)
+        self.runlayout.addWidget(self.resumequeuebutton)
+        self.runlayout.addWidget(self.clearqueuebutton)
         self.runwidget.setLayout(self.runlayout)
         self.splitter.addWidget(self.runwidget)
         self.splitter.addWidget(self.metadata)
@@ -69,8 +76,13 @@ class RunEngineWidget(QWidget):
         self.abortbutton.clicked.connect(self.abort)
         self.pausebutton.clicked.connect(self.pause)
         self.resumebutton.clicked.connect(self.resume)
+        self.resumequeuebutton.clicked.connect(self.resume_queue)
+        self.clearqueuebutton.clicked.connect(self.clear_queue)
 
         self.RE = get_run_engine()
+        self.RE.sigQueueResumed.connect(self._queue_resumed)
+        self.resumequeuebutton.setVisible(self.RE.queue.paused)
+        self.clearqueuebutton.setVisible(self.RE.queue.paused)
         self.RE.sigPause.connect(self._paused)
         self.RE.sigResume.connect(self._resumed)
         self.RE.sigFinish.connect(self._finished)
@@ -134,10 +146,11 @@ class RunEngineWidget(QWidget):
         msg.notifyMessage('Plan parameters copied to clipboard!')
 
     def run(self):
+        self.document_throttle.clear()
         self.metadata.reset()
         planitem = self.plansmodel.itemFromIndex(self.selectionmodel.currentIndex()).data(Qt.UserRole)
 
-        planitem.run(callback=partial(threads.invoke_in_main_thread, self.metadata.doc_consumer, force_event=True))
+        planitem.run(callback=self.document_throttle)
 
     def abort(self):
         self.RE.abort('Aborted by Xi-cam user.')
@@ -149,6 +162,17 @@ class RunEngineWidget(QWidget):
         self.RE.resume()
         self.resumebutton.setEnabled(False)
 
+    def resume_queue(self):
+        self.RE.resume_queue()
+
+    def clear_queue(self):
+        self.RE.queue.clear()
+        self.RE.resume_queue()
+
+    def _queue_resumed(self):
+        self.resumequeuebutton.setVisible(False)
+        self.clearqueuebutton.setVisible(False)
+
     def _resumed(self):
         self.resumebutton.setVisible(False)
         self.resumebutton.setEnabled(True)
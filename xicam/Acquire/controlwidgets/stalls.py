@@ -0,0 +1,101 @@
+import time
+
+from qtpy.QtCore import Qt
+from qtpy.QtGui import QStandardItemModel, QStandardItem
+from qtpy.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView, QHeaderView, QPushButton, \
+    QPlainTextEdit, QSplitter
+
+from xicam.Acquire.watchdog import get_stall_watchdog
+
+_COLUMNS = ['Call site', 'Stalls', 'Total (ms)', 'Longest (ms)', 'Last']
+
+
+class StallWidget(QWidget):
+    """
+    A sortable table of the times the GUI was blocked, per call site, and the stack of the selected one when it was
+    last caught blocking.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(StallWidget, self).__init__(*args, **kwargs)
+
+        self.watchdog = get_stall_watchdog()
+
+        self.label = QLabel()
+        self.clearbutton = QPushButton('Clear')
+        self.model = QStandardItemModel()
+        self.model.setHorizontalHeaderLabels(_COLUMNS)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        self.view.setSelectionBehavior(QTableView.SelectRows)
+        self.view.setSelectionMode(QTableView.SingleSelection)
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.view.sortByColumn(2, Qt.DescendingOrder)
+        self.stack = QPlainTextEdit()
+        self.stack.setReadOnly(True)
+        self.stack.setLineWrapMode(QPlainTextEdit.NoWrap)
+
+        # Layout
+        self.layout = QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.layout)
+        self.toplayout = QHBoxLayout()
+        self.toplayout.addWidget(self.label, stretch=1)
+        self.toplayout.addWidget(self.clearbutton)
+        self.layout.addLayout(self.toplayout)
+        self.splitter = QSplitter(Qt.Vertical)
+        self.splitter.addWidget(self.view)
+        self.splitter.addWidget(self.stack)
+        self.layout.addWidget(self.splitter)
+
+        # Wireup signals
+        self.watchdog.sigStall.connect(self.refresh)
+        self.clearbutton.clicked.connect(self.clear)
+        self.view.selectionModel().currentRowChanged.connect(self._show_stack)
+
+        self.refresh()
+
+    def clear(self):
+        self.watchdog.clear()
+        self.refresh()
+
+    def refresh(self):
+        stalls = self.watchdog.snapshot()
+        self.label.setText(f'{sum(stall["count"] for stall in stalls.values())} stalls over '
+                           f'{self.watchdog.threshold * 1e3:.0f} ms at {len(stalls)} call sites' if stalls
+                           else f'The GUI has not been blocked for over {self.watchdog.threshold * 1e3:.0f} ms.')
+
+        current = self.view.currentIndex()
+        selected = self.model.item(current.row(), 0).text() if current.isValid() else None
+        header = self.view.horizontalHeader()
+        sort_column, sort_order = header.sortIndicatorSection(), header.sortIndicatorOrder()
+        self.model.removeRows(0, self.model.rowCount())
+        for site, stall in stalls.items():
+            siteitem = QStandardItem(site)
+            siteitem.setData(stall['stack'] or 'The stall was too short to catch its stack.', Qt.UserRole)
+            self.model.appendRow([siteitem,
+                                  self._item(stall['count']),
+                                  self._item(round(stall['total'] * 1e3, 1)),
+                                  self._item(round(stall['max'] * 1e3, 1)),
+                                  self._item(time.strftime('%H:%M:%S', time.localtime(stall['last'])))])
+        self.view.sortByColumn(sort_column, sort_order)
+
+        matches = self.model.findItems(selected) if selected else []
+        if matches:
+            self.view.setCurrentIndex(matches[0].index())
+        else:
+            self.stack.clear()
+
+    def _show_stack(self, current, previous):
+        item = self.model.item(current.row(), 0) if current.isValid() else None
+        self.stack.setPlainText(item.data(Qt.UserRole) if item else '')
+
+    @staticmethod
+    def _item(value):
+        item = QStandardItem()
+        # Numbers as data rather than text, so the columns sort numerically
+        item.setData(value, Qt.DisplayRole)
+        item.setEditable(False)
+        return item
@@ -0,0 +1,346 @@
+"""
+In-place correction of live detector frames, on buffers that are allocated once per frame shape and then reused.
+"""
+import abc
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class CorrectionStage(abc.ABC):
+    """
+    One step of a FrameCorrectionPipeline. Stages that are not ``enabled`` are skipped.
+
+    A ``tileable`` stage computes each pixel from the same pixel of its inputs, so it can correct a frame in row tiles
+    (see TiledFrameCorrector); it is then given a tile of the frame, of the raw frame and of the buffers.
+    """
+    enabled = True
+    tileable = True
+
+    @abc.abstractmethod
+    def apply(self, frame, raw, buffers):
+        """
+        Correct ``frame`` in place.
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            The float32 frame being corrected.
+        raw : np.ndarray
+            The frame as it was read from the detector.
+        buffers : FrameBuffers
+            Scratch buffers of the frame's shape, for intermediate results; ``buffers.shape`` is the shape of the whole
+            frame, and ``buffers.rows`` the rows of it being corrected.
+        """
+
+
+class BitMask(CorrectionStage):
+    """Replace the frame with the ``bits`` of each raw pixel, e.g. the intensity bits of a FastCCD pixel."""
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def apply(self, frame, raw, buffers):
+        masked = buffers.scratch('masked', np.uint32)
+        np.bitwise_and(raw, self.bits, out=masked, casting='unsafe')
+        np.copyto(frame, masked, casting='unsafe')
+
+
+class GainMap(CorrectionStage):
+    """Multiply each pixel by the gain its raw value selects: ``gains[(raw >> shift) & bits]``."""
+
+    def __init__(self, gains, shift, bits):
+        self.gains = np.asarray(gains, dtype=np.float32)
+        self.shift = shift
+        self.bits = bits
+
+    def apply(self, frame, raw, buffers):
+        codes = buffers.scratch('codes', np.intp)
+        gains = buffers.scratch('gains', np.float32)
+        np.right_shift(raw, self.shift, out=codes, casting='unsafe')
+        np.bitwise_and(codes, self.bits, out=codes)
+        np.take(self.gains, codes, out=gains, mode='clip')
+        np.multiply(frame, gains, out=frame)
+
+
+class _Reference(CorrectionStage):
+    """
+    A stage correcting frames with a reference frame (a dark, a flat), given by ``source``: a callable returning the
+    current reference, or None when there is none. The reference is converted by ``prepare`` once, when ``source``
+    gives a new one, and not for every frame. Frames of a shape other than the reference's are left as they are.
+    """
+
+    def __init__(self, source, prepare=None):
+        self.source = source
+        self.prepare = prepare
+        self._reference = None
+        self._prepared = None
+        self._lock = threading.Lock()
+
+    def prepared(self):
+        reference = self.source()
+        with self._lock:
+            if reference is not self._reference:
+                self._reference = reference
+                self._prepared = None if reference is None else self._prepare(reference)
+            return self._prepared
+
+    def _prepare(self, reference):
+        prepared = self.prepare(reference) if self.prepare else reference
+        return np.array(prepared, dtype=np.float32)  # A copy; prepare may return a buffer of its own
+
+    def apply(self, frame, raw, buffers):
+        reference = self.prepared()
+        if reference is not None and reference.shape == buffers.shape:
+            self._apply(frame, reference[buffers.rows])
+
+    @abc.abstractmethod
+    def _apply(self, frame, reference):
+        """Correct ``frame`` in place with the rows of the prepared ``reference`` it covers."""
+
+
+class DarkSubtraction(_Reference):
+    """Subtract the dark frame given by ``source``."""
+
+    def _apply(self, frame, dark):
+        np.subtract(frame, dark, out=frame)
+
+
+class FlatField(_Reference):
+    """Divide by the flat field given by ``source``; pixels where it is zero are zeroed."""
+
+    def _prepare(self, flat):
+        flat = super(FlatField, self)._prepare(flat)
+        # Multiplying by the reciprocal is cheaper than dividing, for each frame
+        return np.divide(1, flat, out=np.zeros_like(flat), where=flat != 0)
+
+    def _apply(self, frame, reciprocal):
+        np.multiply(frame, reciprocal, out=frame)
+
+
+class PixelMask(CorrectionStage):
+    """
+    Zero the pixels that are masked out: those where ``source`` (a callable returning a boolean array, True for the
+    pixels to zero, or None) is True, and those with any of ``flag_bits`` set in their raw value.
+    """
+
+    def __init__(self, source=None, flag_bits=0):
+        self.source = source
+        self.flag_bits = flag_bits
+
+    def apply(self, frame, raw, buffers):
+        if self.flag_bits:
+            flags = buffers.scratch('flags', np.uint32)
+            flagged = buffers.scratch('flagged', np.bool_)
+            np.bitwise_and(raw, self.flag_bits, out=flags, casting='unsafe')
+            np.not_equal(flags, 0, out=flagged)
+            np.copyto(frame, 0, where=flagged)
+        mask = self.source() if self.source else None
+        if mask is not None and mask.shape == buffers.shape:
+            np.copyto(frame, 0, where=mask[buffers.rows])
+
+
+class CommonMode(CorrectionStage):
+    """
+    Subtract the first ``rows`` rows of the frame from each following block of as many rows (the blocks read out at
+    the same time, e.g. the FastCCD's), which zeroes the first block. Rows after the last whole block are left as
+    they are.
+    """
+    tileable = False
+
+    def __init__(self, rows=10):
+        self.rows = rows
+
+    def apply(self, frame, raw, buffers):
+        blocks = frame.shape[0] // self.rows
+        if blocks:
+            blocks = frame[:blocks * self.rows].reshape((blocks, self.rows) + frame.shape[1:])
+            # The first block last: it is subtracted from the others
+            np.subtract(blocks[1:], blocks[0], out=blocks[1:])
+            blocks[0] = 0
+
+
+class FrameBuffers:
+    """The buffers of a FrameCorrectionPipeline for frames of one shape."""
+    rows = slice(None)
+
+    def __init__(self, shape, frames=2):
+        self.shape = shape
+        self.frames = [np.empty(shape, dtype=np.float32) for _ in range(frames)]
+        self._next = 0
+        self._scratch = dict()
+        self._lock = threading.Lock()
+
+    def next_frame(self):
+        """The output buffer least recently handed out."""
+        frame = self.frames[self._next]
+        self._next = (self._next + 1) % len(self.frames)
+        return frame
+
+    def scratch(self, name, dtype):
+        """A scratch buffer of the frame shape, reused by whichever stage asks for ``name``."""
+        with self._lock:  # Tiles of a frame ask for their buffers at the same time
+            buffer = self._scratch.get(name)
+            if buffer is None or buffer.dtype != dtype:
+                buffer = self._scratch[name] = np.empty(self.shape, dtype=dtype)
+            return buffer
+
+    def tile(self, rows):
+        """The buffers of the ``rows`` (a slice) of the frame."""
+        return _TileBuffers(self, rows)
+
+
+class _TileBuffers:
+    def __init__(self, buffers, rows):
+        self.buffers = buffers
+        self.shape = buffers.shape
+        self.rows = rows
+
+    def scratch(self, name, dtype):
+        return self.buffers.scratch(name, dtype)[self.rows]
+
+
+class FrameCorrectionPipeline:
+    """
+    Corrects frames by running ``stages`` on them, in order, in place.
+
+    A frame is converted to float32 once, into an output buffer of its shape; each stage then works on that buffer
+    with ufuncs writing to their ``out``, and the buffer is returned. The buffers are allocated for the first frame of
+    a shape and reused for the following ones, so the pipeline does not allocate for each frame. The output buffers of
+    a shape are handed out in turn (``frames`` of them): a frame returned by the pipeline is overwritten ``frames``
+    calls later, so the caller must be done with it by then (the image view is done with one once it has displayed
+    the next).
+
+    Parameters
+    ----------
+    stages : iterable of CorrectionStage
+    frames : int
+        Number of output buffers per frame shape.
+    shapes : int
+        Number of frame shapes buffers are kept for; the least recently used are released first.
+    """
+
+    def __init__(self, stages=(), frames=2, shapes=2):
+        self.stages = list(stages)
+        self.frames = frames
+        self.shapes = shapes
+        self._buffers = OrderedDict()  # shape -> FrameBuffers
+
+    def __call__(self, image):
+        raw = np.asarray(image)
+        buffers = self.buffers(raw.shape)
+        frame = buffers.next_frame()
+        np.copyto(frame, raw, casting='unsafe')
+        self.correct(frame, raw, buffers, self.stages)
+        return frame
+
+    @staticmethod
+    def correct(frame, raw, buffers, stages):
+        for stage in stages:
+            if stage.enabled:
+                stage.apply(frame, raw, buffers)
+
+    def buffers(self, shape):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            buffers = self._buffers[shape] = FrameBuffers(shape, self.frames)
+            while len(self._buffers) > self.shapes:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(shape)
+        return buffers
+
+    def clear(self):
+        """Release the buffers."""
+        self._buffers.clear()
+
+
+# The worker threads of the TiledFrameCorrectors that have no worker count of their own, one per CPU; shared by them
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def _get_shared_pool():
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ThreadPoolExecutor(os.cpu_count() or 1, thread_name_prefix='frame-correction')
+        return _shared_pool
+
+
+class TiledFrameCorrector:
+    """
+    Runs a FrameCorrectionPipeline on a pool of worker threads, each correcting a tile of rows of the frame.
+
+    NumPy releases the GIL in its ufuncs, so the tiles are corrected in parallel. Stages that are not tileable run on
+    the whole frame, between the tiled ones. Called with a frame, the corrector returns it corrected, like the
+    pipeline.
+
+    Parameters
+    ----------
+    pipeline : FrameCorrectionPipeline
+    workers : int
+        Number of worker threads, in a pool of the corrector's own that ``close`` shuts down. By default, the
+        correctors share a pool of one thread per CPU.
+    """
+
+    def __init__(self, pipeline, workers=None):
+        self.pipeline = pipeline
+        if workers is None:
+            self.workers = os.cpu_count() or 1
+            self._pool = _get_shared_pool()
+            self._own_pool = False
+        else:
+            self.workers = workers
+            self._pool = ThreadPoolExecutor(workers, thread_name_prefix='frame-correction')
+            self._own_pool = True
+
+    def __call__(self, image):
+        raw = np.asarray(image)
+        buffers = self.pipeline.buffers(raw.shape)
+        frame = buffers.next_frame()
+        if raw.ndim < 2 or self.workers == 1:
+            np.copyto(frame, raw, casting='unsafe')
+            self.pipeline.correct(frame, raw, buffers, self.pipeline.stages)
+            return frame
+
+        edges = np.linspace(0, raw.shape[0], min(self.workers, raw.shape[0]) + 1).astype(int)
+        tiles = [slice(start, stop) for start, stop in zip(edges[:-1], edges[1:])]
+        load = True  # The tiles of the first phase also convert the raw frame to float32
+        for tileable, stages in self._phases():
+            if tileable:
+                list(self._pool.map(lambda rows: self._correct_tile(frame, raw, buffers, rows, stages, load), tiles))
+                load = False
+            else:
+                if load:
+                    np.copyto(frame, raw, casting='unsafe')
+                    load = False
+                self.pipeline.correct(frame, raw, buffers, stages)
+        if load:
+            np.copyto(frame, raw, casting='unsafe')
+        return frame
+
+    def close(self):
+        """Stop the corrector's own worker threads, once the frames being corrected are; the shared pool is kept."""
+        if self._own_pool:
+            self._pool.shutdown()
+
+    def _phases(self):
+        # Runs of consecutive tileable stages, and the other stages one by one: (tileable, stages)
+        phases = []
+        for stage in self.pipeline.stages:
+            if not stage.enabled:
+                continue
+            if stage.tileable and phases and phases[-1][0]:
+                phases[-1][1].append(stage)
+            else:
+                phases.append((stage.tileable, [stage]))
+        return phases
+
+    def _correct_tile(self, frame, raw, buffers, rows, stages, load):
+        if load:
+            np.copyto(frame[rows], raw[rows], casting='unsafe')
+        self.pipeline.correct(frame[rows], raw[rows], buffers.tile(rows), stages)
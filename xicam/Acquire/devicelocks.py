@@ -0,0 +1,128 @@
+"""
+Device ownership for running plans concurrently on several RunEngine lanes.
+"""
+import inspect
+import threading
+
+from ophyd import OphydObject
+
+
+def device_names(devices):
+    """Normalize ophyd objects and names to the set of root device names that identify the hardware."""
+    names = set()
+    for device in devices:
+        if isinstance(device, OphydObject):
+            names.add(device.root.name)
+        else:
+            names.add(str(device))
+    return frozenset(names)
+
+
+def infer_devices(plan):
+    """
+    Best-effort guess of the devices a plan will use, as root device names; only used to schedule plans queued
+    without ``devices`` when the QRunEngine was made with ``infer_plan_devices=True``.
+
+    Generators are inspected before they start: the ophyd objects among their arguments (including inside lists,
+    tuples and dicts, e.g. the detectors and motors of bluesky.plans.scan) are the devices they touch, as are the
+    module-level devices their code refers to by name. Lists of Msgs are read directly, and PlanReferences report the
+    devices chosen in their parameters and those their plan function refers to by name. Returns None when nothing can be
+    inferred; such a plan is run exclusively.
+
+    Devices a plan only reaches some other way, e.g. through the sub-plans it calls or as attributes of other objects,
+    are not found, and another lane may drive them at the same time: pass ``devices`` when queueing such plans, or
+    leave inference off.
+    """
+    return device_names(plan_devices(plan)) or None
+
+
+def plan_devices(plan):
+    """
+    The devices a plan refers to (see ``infer_devices``): ophyd objects, or for a PlanReference the names of the
+    devices in its parameters.
+    """
+    from xicam.Acquire.planqueue import PlanReference, _DeviceName
+
+    if isinstance(plan, PlanReference):
+        return (_flatten(plan.values.values(), lambda value: isinstance(value, _DeviceName))
+                + _global_devices(_plan_function(plan)))
+    elif inspect.isgenerator(plan) and plan.gi_frame is not None:
+        return (_flatten(plan.gi_frame.f_locals.values(), lambda value: isinstance(value, OphydObject))
+                + _global_devices(plan.gi_code, plan.gi_frame.f_globals))
+    elif isinstance(plan, (list, tuple)):
+        return [message.obj for message in plan if isinstance(getattr(message, 'obj', None), OphydObject)]
+    return []
+
+
+def _plan_function(reference):
+    # The function a PlanReference's ParameterizedPlan calls, if it can be loaded
+    from xicam.Acquire.planqueue import _evaluation_lock
+
+    try:
+        with _evaluation_lock:
+            return getattr(reference.planitem.plan, 'plan', None)
+    except Exception:
+        return None
+
+
+def _global_devices(code, namespace=None):
+    # The module-level devices that code (or a function's code) refers to by name
+    if inspect.isfunction(code):
+        code, namespace = code.__code__, code.__globals__
+    if not inspect.iscode(code):
+        return []
+    return [namespace[name] for name in code.co_names if isinstance(namespace.get(name), OphydObject)]
+
+
+def _flatten(values, predicate, depth=3):
+    found = []
+    for value in values:
+        if predicate(value):
+            found.append(value)
+        elif depth and isinstance(value, dict):
+            found.extend(_flatten(value.values(), predicate, depth - 1))
+        elif depth and isinstance(value, (list, tuple, set)):
+            found.extend(_flatten(value, predicate, depth - 1))
+    return found
+
+
+class DeviceLockManager:
+    """
+    Tracks which lane owns which devices, so that two lanes never drive the same hardware.
+
+    A lane acquires all of a plan's devices at once or none of them. A plan with unknown devices (None) is exclusive:
+    it can only start when no other lane is running, and nothing else starts until it is released.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owners = dict()  # device name -> lane
+        self._active = dict()  # lane -> device names, or None if exclusive
+
+    def try_acquire(self, lane, devices):
+        with self._lock:
+            if any(owned is None for owned in self._active.values()):
+                return False
+            if devices is None:
+                if self._active:
+                    return False
+            elif any(name in self._owners for name in devices):
+                return False
+
+            self._active[lane] = devices
+            for name in devices or ():
+                self._owners[name] = lane
+            return True
+
+    def release(self, lane):
+        with self._lock:
+            for name in self._active.pop(lane, None) or ():
+                self._owners.pop(name, None)
+
+    @property
+    def owners(self):
+        """The devices currently held, as {device name: lane}; an exclusive lane is reported as {None: lane}."""
+        with self._lock:
+            owners = dict(self._owners)
+            owners.update({None: lane for lane, devices in self._active.items() if devices is None})
+            return owners
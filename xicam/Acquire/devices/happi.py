@@ -5,7 +5,6 @@ from qtpy.QtWidgets import QVBoxLayout, QWidget, QTreeView, QAbstractItemView, Q
 from happi import Client, HappiItem, from_container
 from happi.backends.mongo_db import MongoBackend
 from happi.backends.json_db import JSONBackend
-from typhos.display import TyphosDeviceDisplay
 import os
 
 from xicam.core import msg
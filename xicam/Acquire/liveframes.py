@@ -0,0 +1,88 @@
+"""
+Live frames of area detectors: reading only frames that have not been displayed yet.
+"""
+import threading
+
+import numpy as np
+
+
+class LatestFrame:
+    """
+    Follows the array counter of an area detector's image plugin, so that its frame is only read when there is a new
+    one, and counts the frames that are displayed and those skipped.
+
+    The counter is monitored, which costs a few bytes per frame; the frame itself is only transferred when ``read``,
+    so a detector acquiring faster than frames are displayed costs nothing more than the frames displayed. As ``read``
+    gets the plugin's current frame, it is always the newest one: those in between are dropped.
+
+    The frame's shape is monitored too, so a read is a single Channel Access request for just the frame's pixels; the
+    array it fills is the only copy of the frame made, and it is reshaped as a view. (ImagePlugin.shaped_image requests
+    the shape along with each frame, and shapes 2-dimensional frames as (depth, height).)
+
+    Parameters
+    ----------
+    plugin : ophyd.areadetector.plugins.ImagePlugin
+    """
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self.displayed = 0  # Frames read
+        self.dropped = 0  # Frames the plugin received but that were not read
+
+        self._lock = threading.Lock()
+        self._counter = None  # Of the plugin's current frame; None until monitored
+        self._read_counter = None  # Of the last frame read
+        self._sizes = dict()  # Monitored ArraySize0-2 and NDimensions, by signal name
+        self._size_signals = (plugin.array_size.width, plugin.array_size.height, plugin.array_size.depth)
+        for signal in self._size_signals + (plugin.ndimensions,):
+            signal.subscribe(self._sized, run=True)
+        plugin.array_counter.subscribe(self._counted, run=True)
+
+    @property
+    def shape(self):
+        """The shape of the plugin's frames, as a NumPy array (the reverse of the NDArray's dimensions), if known."""
+        with self._lock:
+            sizes = [self._sizes.get(signal.name) for signal in self._size_signals]
+            ndims = self._sizes.get(self.plugin.ndimensions.name)
+        if None in sizes or not all(sizes[:2]):
+            return None
+        return tuple(int(size) for size in reversed(sizes[:ndims or (3 if sizes[2] else 2)]))
+
+    @property
+    def new(self):
+        """Whether the plugin has a frame that was not read yet (always, while its counter is not known)."""
+        with self._lock:
+            return self._counter is None or self._counter != self._read_counter
+
+    def read(self):
+        """The plugin's current frame, or None if it was already read."""
+        with self._lock:
+            counter = self._counter
+            if counter is not None and counter == self._read_counter:
+                return None
+        # The counter is taken first: if a frame arrives meanwhile, the next read gets it (again) rather than missing it
+        shape = self.shape
+        if shape is None:
+            frame = self.plugin.shaped_image.get()
+        else:
+            pixels = int(np.prod(shape))
+            frame = np.asarray(self.plugin.array_data.get(count=pixels))[:pixels].reshape(shape)
+
+        with self._lock:
+            if counter is not None and self._read_counter is not None and counter > self._read_counter:
+                self.dropped += counter - self._read_counter - 1  # Restarting acquisition resets the counter
+            self._read_counter = counter
+            self.displayed += 1
+        return frame
+
+    def reset(self):
+        with self._lock:
+            self.displayed = self.dropped = 0
+
+    def _sized(self, value, obj, **kwargs):
+        with self._lock:
+            self._sizes[obj.name] = value
+
+    def _counted(self, value, **kwargs):
+        with self._lock:
+            self._counter = value
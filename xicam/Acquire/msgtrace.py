@@ -0,0 +1,266 @@
+"""
+Per-message timing of a RunEngine: where the time goes inside a plan.
+"""
+import json
+import os
+import time
+from collections import defaultdict, deque
+from functools import partial, wraps
+
+from xicam.Acquire.summarystreams import summary_stream
+
+# Summary categories; every other command is counted as 'other'
+_CATEGORIES = {'set': 'set_wait', 'wait': 'set_wait', 'trigger': 'trigger', 'read': 'read', 'save': 'save'}
+
+# Where the wall time of each point of a step scan goes (see MessageTracer.points)
+POINT_CATEGORIES = ('move', 'settle', 'trigger', 'readout', 'file_write', 'documents', 'other')
+
+# Configuration fields that hold a detector's exposure time, by suffix
+_EXPOSURE_FIELDS = ('acquire_time', 'exposure_time', 'count_time')
+
+
+class MessageTracer:
+    """
+    Records every Msg a RunEngine processes, with its command, object, start and stop time, into a ring buffer.
+
+    Each record is a list ``[run start uid, command, object name, start, stop, done]``, with perf_counter times.
+    ``done`` is the time at which the Status returned by the command (of a set or trigger, for instance) finished, or
+    None; the time the plan spent waiting on it shows up as its 'wait' message. Document dispatch is recorded too,
+    under the command 'callbacks' with the document name as object; it nests inside the message that emitted the
+    document.
+
+    Totals per run are kept as messages are processed, and the summary (see ``summary``) is recorded in a stream of
+    the run, ``msg_timing`` (see summary_stream), just before it closes; it is kept in ``summaries`` too. Recording a
+    message costs a couple of perf_counter calls and a deque append.
+
+    Each point of the run's primary stream (everything up to and including its save) is also broken down into
+    POINT_CATEGORIES, and appended to ``points`` as a dict of durations (s) together with its ``wall`` time and
+    ``exposure``:
+
+    - move: the longest set, until its Status finished, less settle
+    - settle: the settle time of the moved positioners
+    - trigger: the longest trigger, until its Status finished (exposure and detector readout)
+    - readout: reading the devices
+    - file_write: saving the event less document emission; this is where detectors' asset (file) documents are
+      collected
+    - documents: dispatching documents to subscribers
+    - other: the rest of the wall time (checkpoints, plan logic, RunEngine overhead)
+
+    The exposure is the detectors' configured exposure time (a configuration field such as ``cam.acquire_time``),
+    or the trigger time if none is found; ``efficiency`` is total exposure over total wall time.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of records kept; older ones are dropped.
+    lane : int
+        Used as the thread id in Chrome traces.
+    enabled : bool
+        Whether anything is recorded; can be changed between runs.
+    """
+
+    def __init__(self, capacity=1000000, lane=0, enabled=True):
+        self.records = deque(maxlen=capacity)
+        self.lane = lane
+        self.enabled = enabled
+        self.summaries = dict()  # run start uid -> summary, of finished runs
+        self.points = []  # per-point breakdowns of the current (or last) run; replaced, not cleared, on a new run
+        self._run = None
+        self._run_started = None
+        self._totals = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._point = defaultdict(float)
+        self._point_started = None
+        self._stream = None
+        self._exposure = None
+
+    def install(self, run_engine):
+        """Wrap the RunEngine's commands and document dispatch, and record the summary of each of its runs."""
+        for command, func in list(run_engine._command_registry.items()):
+            run_engine.register_command(command, self._wrap_command(command, func))
+        run_engine.dispatcher.process = self._wrap_dispatch(run_engine.dispatcher.process)
+        run_engine.subscribe(self._start, 'start')
+        run_engine.subscribe(self._descriptor, 'descriptor')
+        run_engine.subscribe(self._stop, 'stop')
+        run_engine.preprocessors.append(summary_stream('msg_timing', self.summary,
+                                                       lambda: self.enabled and self._run is not None))
+
+    def _wrap_command(self, command, func):
+        @wraps(func)
+        async def timed(msg):
+            if not self.enabled:
+                return await func(msg)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = await func(msg)
+                return result
+            finally:
+                self._record(command, msg, start, result)
+
+        return timed
+
+    def _record(self, command, msg, start, result):
+        stop = time.perf_counter()
+        obj = msg.obj
+        record = [self._run, command, getattr(obj, 'name', None), start, stop, None]
+        self.records.append(record)
+        if hasattr(result, 'add_callback'):
+            result.add_callback(partial(self._status_done, record, obj))
+        if self._run is None:
+            return
+
+        self._totals[command] += stop - start
+        self._counts[command] += 1
+        self._point[command] += stop - start
+        if command == 'open_run':
+            self._point_started = stop
+        elif command == 'create':
+            self._stream = msg.kwargs.get('name', 'primary')
+        elif command == 'save':
+            if self._stream == 'primary':
+                self._finish_point(stop)
+            else:
+                # Baseline and other streams are not points; start the next one afresh
+                self._point = defaultdict(float)
+                self._point_started = stop
+
+    def _status_done(self, record, obj, status):
+        # Called from the thread that finished the Status
+        done = time.perf_counter()
+        record[5] = done
+        elapsed = done - record[3]
+        command = record[1]
+        point = self._point
+        point[f'{command}_done'] = max(point[f'{command}_done'], elapsed)
+        if command == 'set':
+            point['settle'] = max(point['settle'], min(getattr(obj, 'settle_time', None) or 0, elapsed))
+
+    def _finish_point(self, end):
+        point, self._point = self._point, defaultdict(float)
+        started, self._point_started = self._point_started, end
+
+        settle = point['settle']
+        breakdown = {'move': max(point['set_done'], point['set']) - settle,
+                     'settle': settle,
+                     'trigger': max(point['trigger_done'], point['trigger']),
+                     'readout': point['read'],
+                     'file_write': max(0., point['save'] - point['callbacks']),
+                     'documents': point['callbacks']}
+        wall = end - started if started is not None else sum(breakdown.values())
+        breakdown['other'] = max(0., wall - sum(breakdown.values()))
+        breakdown['wall'] = wall
+        breakdown['exposure'] = self._exposure if self._exposure is not None else breakdown['trigger']
+        self.points.append(breakdown)
+
+    def efficiency(self, points=None):
+        """Total exposure over total wall time of ``points`` (by default, those of the current or last run)."""
+        points = list(self.points if points is None else points)
+        wall = sum(point['wall'] for point in points)
+        return sum(point['exposure'] for point in points) / wall if wall else None
+
+    def _wrap_dispatch(self, process):
+        @wraps(process)
+        def timed(name, doc):
+            if not self.enabled:
+                return process(name, doc)
+            start = time.perf_counter()
+            try:
+                return process(name, doc)
+            finally:
+                stop = time.perf_counter()
+                self.records.append([self._run, 'callbacks', getattr(name, 'name', name), start, stop, None])
+                if self._run is not None:
+                    self._totals['callbacks'] += stop - start
+                    self._counts['callbacks'] += 1
+                    self._point['callbacks'] += stop - start
+
+        return timed
+
+    def _start(self, name, doc):
+        if not self.enabled:
+            return
+        self._run = doc['uid']
+        self._run_started = time.perf_counter()
+        self._totals.clear()
+        self._counts.clear()
+        self.points = []
+        self._point = defaultdict(float)
+        self._point_started = None
+        self._stream = None
+        self._exposure = None
+
+    def _descriptor(self, name, doc):
+        if self._run is None or doc.get('name') != 'primary':
+            return
+        exposures = [value for configuration in doc.get('configuration', dict()).values()
+                     for key, value in configuration.get('data', dict()).items()
+                     if key.endswith(_EXPOSURE_FIELDS) and isinstance(value, (int, float))]
+        self._exposure = max(exposures) if exposures else None
+
+    def _stop(self, name, doc):
+        if doc['run_start'] != self._run:
+            return
+        self.summaries[self._run] = self.summary()
+        self._run = None
+
+    def summary(self):
+        """
+        Time (s) spent by the current run in set/wait, trigger, read, save, other messages and document callbacks.
+
+        Callback time is also included in the message that emitted the documents (mostly save). 'commands' holds the
+        count and total time of each command, 'per_point' the mean breakdown of a point and 'efficiency' the total
+        exposure over wall time of the points.
+        """
+        totals = dict.fromkeys(['set_wait', 'trigger', 'read', 'save', 'other'], 0.)
+        for command, total in self._totals.items():
+            if command != 'callbacks':
+                totals[_CATEGORIES.get(command, 'other')] += total
+        totals['callbacks'] = self._totals['callbacks']
+        totals['elapsed'] = time.perf_counter() - self._run_started if self._run_started else 0.
+        totals['messages'] = sum(count for command, count in self._counts.items() if command != 'callbacks')
+        totals['commands'] = {command: {'count': self._counts[command], 'time': total}
+                              for command, total in self._totals.items()}
+        points = list(self.points)
+        totals['points'] = len(points)
+        totals['efficiency'] = self.efficiency(points)
+        totals['per_point'] = {category: sum(point[category] for point in points) / len(points)
+                               for category in POINT_CATEGORIES + ('wall',)} if points else dict()
+        return totals
+
+    def chrome_trace(self, run_start=None):
+        """
+        The records (of one run, or all of them) as a Chrome trace, viewable in chrome://tracing or Perfetto.
+
+        Messages are on a thread per lane and Status lifetimes on a second one.
+        """
+        pid = os.getpid()
+        status_tid = 1000 + self.lane
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': self.lane,
+                   'args': {'name': f'RunEngine lane {self.lane}'}},
+                  {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': status_tid,
+                   'args': {'name': f'Statuses, lane {self.lane}'}}]
+        for run, command, obj, start, stop, done in list(self.records):
+            if run_start is not None and run != run_start:
+                continue
+            args = {'run_start': run, 'object': obj}
+            events.append({'name': command, 'cat': obj or '', 'ph': 'X', 'pid': pid, 'tid': self.lane,
+                           'ts': start * 1e6, 'dur': (stop - start) * 1e6, 'args': args})
+            if done is not None:
+                events.append({'name': f'{command} {obj}', 'cat': 'status', 'ph': 'X', 'pid': pid, 'tid': status_tid,
+                               'ts': start * 1e6, 'dur': (done - start) * 1e6, 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def clear(self):
+        self.records.clear()
+        self.summaries.clear()
+        self.points = []
+
+
+def export_chrome_trace(path, tracers, run_start=None):
+    """Write the records of one or more MessageTracers to ``path`` as Chrome trace JSON."""
+    events = []
+    for tracer in tracers:
+        events.extend(tracer.chrome_trace(run_start)['traceEvents'])
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
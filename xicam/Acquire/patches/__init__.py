@@ -1,17 +1,21 @@
 import enum
+import json
 
 import sys
 import struct
+from pathlib import Path
 
 
 from happi import from_container
 from pyqtgraph.parametertree import parameterTypes, registerParameterType
 from pyqtgraph.parametertree.Parameter import PARAM_TYPES
 from qtpy.QtWidgets import QApplication
+import qtpy
 from qtpy import QtWidgets, QtCore, QtNetwork, QtGui
 from pyqode import qt
 
 from xicam.core import msg
+from xicam.core.paths import user_cache_dir
 
 from . import pydm
 from . import typhos
@@ -130,15 +134,20 @@ if 'device' not in PARAM_TYPES:
     registerParameterType("device", DeviceParameter)
 
 
-def promote_enums(module):
+def enum_aliases(module):
     """
-    Search enums in the given module and allow unscoped access.
+    Search enums in the given module for the members to allow unscoped access to.
 
     Taken from:
     https://github.com/pyqtgraph/pyqtgraph/blob/pyqtgraph-0.12.1/pyqtgraph/Qt.py#L331-L377
     and adapted to also copy enum values aliased under different names.
 
+    Returns
+    -------
+    list of (str, str, str)
+        Class, enum and member names; each member is to be set on its class.
     """
+    aliases = []
     class_names = [name for name in dir(module) if name.startswith("Q")]
     for class_name in class_names:
         klass = getattr(module, class_name)
@@ -147,9 +156,52 @@ def promote_enums(module):
             attrib = getattr(klass, attrib_name)
             if not isinstance(attrib, enum.EnumMeta):
                 continue
-            for name, value in attrib.__members__.items():
-                setattr(klass, name, value)
+            for name in attrib.__members__:
+                aliases.append((class_name, attrib_name, name))
+    return aliases
+
+
+def apply_enum_aliases(module, aliases):
+    for class_name, enum_name, name in aliases:
+        klass = getattr(module, class_name)
+        setattr(klass, name, getattr(klass, enum_name).__members__[name])
+
+
+def promote_enums(module):
+    """Allow unscoped access to the enums of the given module."""
+    apply_enum_aliases(module, enum_aliases(module))
 
-promote_enums(QtCore)
-promote_enums(QtGui)
-promote_enums(QtWidgets)
\ No newline at end of file
+
+def _enum_aliases_path():
+    # Aliases depend on the binding and its version only
+    binding_version = getattr(qtpy, 'PYQT_VERSION', None) or getattr(qtpy, 'PYSIDE_VERSION', None)
+    return Path(user_cache_dir) / 'Acquire' / f'qt_enum_aliases-{qtpy.API_NAME}-{binding_version}-{qtpy.QT_VERSION}.json'
+
+
+def promote_enums_cached(modules, path=None):
+    """
+    ``promote_enums`` for each of ``modules`` (by name), with the aliases cached in ``path``.
+
+    Searching the enums walks every attribute of every Q-class, which costs tens of ms at each launch; the cache
+    is keyed by the Qt binding and its version, and rebuilt if it is missing, unreadable or out of date.
+    """
+    path = Path(path or _enum_aliases_path())
+    try:
+        cached = json.loads(path.read_text())
+        for name, module in modules.items():
+            apply_enum_aliases(module, cached[name])
+        return
+    except (OSError, ValueError, KeyError, AttributeError, TypeError):
+        pass
+
+    aliases = {name: enum_aliases(module) for name, module in modules.items()}
+    for name, module in modules.items():
+        apply_enum_aliases(module, aliases[name])
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(aliases))
+    except OSError as ex:
+        msg.logMessage(f'Could not cache Qt enum aliases in {path}: {ex}', level=msg.WARNING)
+
+
+promote_enums_cached(Qt_packages)
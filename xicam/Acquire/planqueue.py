@@ -0,0 +1,414 @@
+"""
+A crash-safe plan queue for the QRunEngine, persisted to SQLite.
+"""
+import copy
+import heapq
+import itertools
+import pickle
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ophyd import Device
+from xicam.core import msg
+from xicam.core.paths import user_config_dir
+
+default_queue_path = str(Path(user_config_dir) / "Acquire" / "plan_queue.sqlite")
+
+
+@dataclass(order=True)
+class PrioritizedPlan:
+    priority: int
+    sequence: int  # Tie-breaker: plans of equal priority run in the order they were queued
+    args: Any = field(compare=False)
+    devices: Any = field(default=None, compare=False)  # Root device names the plan uses; None if unknown
+
+
+class PlanReference:
+    """
+    A picklable stand-in for a PlanItem's plan, holding a snapshot of its parameter values.
+
+    Devices are stored by name and looked up again when the reference is resolved, so a queued PlanItem can be
+    restored after Xi-cam restarts. ``values`` override the snapshot; devices may be given in them as objects or, for
+    device parameters, by name.
+
+    The plan is built from the snapshot without writing to the PlanItem's parameter tree, which the GUI displays and
+    the user may be editing.
+    """
+
+    def __init__(self, planitem, parameter=None, values=None):
+        self.planitem = planitem
+        self.values = _parameter_values(parameter) if parameter else dict()
+        if values:
+            _merge_values(self.values, values, parameter if parameter is not None else self._parameter())
+        self._devices = dict()  # device name -> device, filled by prepare/resolve
+
+    def __getstate__(self):
+        if not self.planitem.code:
+            raise TypeError(f'The plan "{self.planitem.name}" has no source code and cannot be persisted.')
+        return dict(self.__dict__, _devices=dict())
+
+    def __repr__(self):
+        return f'PlanReference({self.planitem.name!r})'
+
+    def with_values(self, values):
+        """A copy of this reference, with ``values`` overriding its snapshot."""
+        reference = PlanReference(self.planitem)
+        reference.values = copy.deepcopy(self.values)
+        if values:
+            _merge_values(reference.values, values, self._parameter())
+        return reference
+
+    def _parameter(self):
+        with _evaluation_lock:
+            return self.planitem.parameter
+
+    def prepare(self):
+        """
+        Load the PlanItem's plan and look up the devices named in the parameter values, without applying them.
+
+        This is the slow part of ``resolve`` (evaluating the plan's code and instantiating devices), and is safe to
+        call ahead of time while another plan runs. Returns the devices.
+        """
+        with _evaluation_lock:
+            plan = self.planitem.plan
+            if plan is None:
+                raise RuntimeError(f'The plan "{self.planitem.name}" could not be loaded.')
+            if self.values:
+                _find_devices(self.planitem.parameter, self.values, self._devices)
+        return list(self._devices.values())
+
+    def resolve(self):
+        """Return the PlanItem's plan, built with the snapshot of parameter values."""
+        self.prepare()
+        with _evaluation_lock:
+            plan = self.planitem.plan
+            parameter = self.planitem.parameter
+            resolved = dict()  # id of a leaf Parameter -> its value in the snapshot
+            if self.values and parameter is not None:
+                _resolve_parameter_values(parameter, self.values, self._devices, resolved)
+
+        if not hasattr(plan, 'args'):  # Not a ParameterizedPlan; it has no parameters to apply
+            if resolved:
+                msg.logMessage(f'The plan "{self.planitem.name}" does not take its parameters as arguments; it will '
+                               f'run with the values its parameters have when it starts.', level=msg.WARNING)
+            return plan
+        args = [_resolved_argument(arg, resolved) for arg in plan.args]
+        kwargs = {name: _resolved_argument(arg, resolved) for name, arg in plan.kwargs.items()}
+        return plan.plan(*args, **kwargs)
+
+
+# PlanItems evaluate their code on first use; serialize that between the run engine and the prefetch threads
+_evaluation_lock = threading.RLock()
+
+
+class _DeviceName(str):
+    pass
+
+
+def _parameter_values(parameter):
+    values = dict()
+    for child in parameter.children():
+        if child.hasChildren():
+            values[child.name()] = _parameter_values(child)
+        else:
+            value = child.value()
+            values[child.name()] = _DeviceName(value.name) if isinstance(value, Device) else value
+    return values
+
+
+def _child(parameter, name):
+    if parameter is None:
+        return None
+    try:
+        return parameter.child(name)
+    except KeyError:
+        return None
+
+
+def _device_limits(parameter):
+    # The devices a device parameter chooses from, by name; None for other parameters
+    limits = parameter.opts.get('limits') if parameter is not None else None
+    if isinstance(limits, dict) and (parameter.opts.get('type') == 'device'
+                                     or any(isinstance(device, Device) for device in limits.values())):
+        return limits
+    return None
+
+
+def _merge_values(values, overrides, parameter=None):
+    for name, value in overrides.items():
+        child = _child(parameter, name)
+        if isinstance(value, dict) and isinstance(values.get(name), dict):
+            _merge_values(values[name], value, child)
+        elif isinstance(value, Device):
+            values[name] = _DeviceName(value.name)
+        elif isinstance(value, str) and (isinstance(values.get(name), _DeviceName)
+                                         or _device_limits(child) is not None):
+            values[name] = _DeviceName(value)
+        else:
+            values[name] = value
+
+
+def _find_devices(parameter, values, devices):
+    for name, value in values.items():
+        child = _child(parameter, name)
+        if isinstance(value, dict):
+            _find_devices(child, value, devices)
+        elif isinstance(value, _DeviceName) and value not in devices:
+            device = (_device_limits(child) or dict()).get(value)
+            if device is None:
+                from xicam.Acquire.plan_tools import find_device
+                device = find_device(name=str(value))
+            devices[value] = device
+
+
+def _resolve_parameter_values(parameter, values, devices, resolved):
+    for name, value in values.items():
+        child = _child(parameter, name)
+        if child is None:
+            continue
+        if isinstance(value, dict):
+            _resolve_parameter_values(child, value, devices, resolved)
+        else:
+            resolved[id(child)] = devices[value] if isinstance(value, _DeviceName) else value
+
+
+def _resolved_argument(argument, resolved):
+    # As ParameterizedPlan resolves its arguments, but from the snapshot rather than the parameters' current values
+    if isinstance(argument, list):
+        return [_resolved_argument(item, resolved) for item in argument]
+    if hasattr(argument, 'value') and hasattr(argument, 'children'):  # A Parameter
+        return resolved[id(argument)] if id(argument) in resolved else argument.value()
+    return argument
+
+
+class PersistentPlanQueue:
+    """
+    A blocking priority queue of (args, kwargs) plan submissions that survives a crash or restart.
+
+    Plans of equal priority run first-in, first-out. Each submission is written to an SQLite database (in WAL mode)
+    when it is queued and removed once ``task_done`` is called, so on restart anything that had not started is queued
+    again. Only the plan and the metadata are persisted: callbacks are kept in memory for the current session, and a
+    submission whose plan or metadata cannot be pickled (a plain generator, for example) is kept in memory only.
+
+    The in-memory heap is the source of truth for ordering; the database is only read when the queue is created.
+
+    Restored plans would otherwise start moving hardware as soon as Xi-cam is back, unattended after a crash; a queue
+    that restored any starts ``paused``, and ``get`` hands out no plan until ``resume`` is called.
+    """
+
+    def __init__(self, path=default_queue_path):
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS plans (sequence INTEGER PRIMARY KEY, priority INTEGER, '
+                             'payload BLOB, started INTEGER DEFAULT 0)')
+
+        self._condition = threading.Condition()
+        self._heap = []
+        self._version = 0  # Incremented whenever the head of the queue may have changed
+        self._unfinished_tasks = 0
+        self.paused = False
+        self._shut_down = False
+        self._restore()
+
+    def _restore(self):
+        with self._db_lock:
+            interrupted = self._db.execute('SELECT sequence FROM plans WHERE started').fetchall()
+            if interrupted:
+                # Don't repeat a run that was cut short; it may have moved hardware part way
+                self._db.execute('DELETE FROM plans WHERE started')
+            rows = self._db.execute('SELECT priority, sequence, payload FROM plans').fetchall()
+            last_sequence = self._db.execute('SELECT MAX(sequence) FROM plans').fetchone()[0] or 0
+
+        for sequence, in interrupted:
+            msg.logMessage(f'Queued plan {sequence} was interrupted by Xi-cam closing and will not be repeated.',
+                           level=msg.WARNING)
+
+        for priority, sequence, payload in rows:
+            try:
+                plan, kwargs, devices = pickle.loads(payload)
+            except Exception as ex:
+                msg.logMessage(f'Queued plan {sequence} could not be restored.', level=msg.ERROR)
+                msg.logError(ex)
+                self._delete(sequence)
+                continue
+            self._heap.append(PrioritizedPlan(priority, sequence, ((plan,), kwargs), devices))
+        heapq.heapify(self._heap)
+        self._unfinished_tasks = len(self._heap)
+        self._sequence = itertools.count(last_sequence + 1)
+
+        if self._heap:
+            self.paused = True
+            msg.logMessage(f'Restored {len(self._heap)} queued plans; they will not run until the queue is resumed.',
+                           level=msg.INFO)
+
+    def put(self, priority, args, kwargs, devices=None):
+        return self.put_many([(priority, args, kwargs, devices)])[0]
+
+    def put_many(self, submissions):
+        """Queue several (priority, args, kwargs, devices) submissions, persisting them in a single transaction."""
+        with self._condition:
+            items = [PrioritizedPlan(priority, next(self._sequence), (tuple(args), kwargs), devices)
+                     for priority, args, kwargs, devices in submissions]
+
+        rows = []
+        volatile = []
+        for item in items:
+            args, kwargs = item.args
+            try:
+                payload = pickle.dumps((args[0], kwargs, item.devices), pickle.HIGHEST_PROTOCOL)
+            except Exception as ex:
+                volatile.append(f'{args[0]} ({ex})')
+            else:
+                rows.append((item.sequence, item.priority, payload))
+        if volatile:
+            msg.logMessage(f'{len(volatile)} queued plans cannot be persisted and will be lost if Xi-cam closes: '
+                           f'{volatile[0]}{", ..." if len(volatile) > 1 else ""}', level=msg.INFO)
+
+        if rows:
+            with self._db_lock:
+                if self._db is not None:  # Not closed
+                    self._db.execute('BEGIN')
+                    self._db.executemany('INSERT INTO plans (sequence, priority, payload) VALUES (?, ?, ?)', rows)
+                    self._db.execute('COMMIT')
+
+        with self._condition:
+            for item in items:
+                heapq.heappush(self._heap, item)
+            self._unfinished_tasks += len(items)
+            self._version += 1
+            self._condition.notify_all()
+        return items
+
+    def get(self, timeout=None, accept=None):
+        """
+        Remove and return the next PrioritizedPlan, blocking until one is available.
+
+        With ``accept``, return the first plan, in priority order, for which ``accept(item)`` is true; the predicate
+        is called with the queue locked, so it may claim resources for the plan it accepts. Call ``wake`` when the
+        answer for a waiting plan may have changed. A plan that is refused holds on to its devices, so that plans
+        queued after it cannot keep it waiting forever: no later plan that shares any of them is offered to
+        ``accept``, and if it is exclusive (its devices are None), none at all.
+
+        Returns None once the queue is shut down (see ``shutdown``).
+        """
+        item = None
+
+        def take():
+            nonlocal item
+            if self._shut_down:
+                return True
+            item = self._take(accept)
+            return item is not None
+
+        with self._condition:
+            if not self._condition.wait_for(take, timeout):
+                raise TimeoutError('No plan was queued in time.')
+            if item is None:
+                return None
+            self._version += 1
+            self._condition.notify_all()
+
+        self._execute('UPDATE plans SET started=1 WHERE sequence=?', (item.sequence,))
+        return item
+
+    def _take(self, accept):
+        if self.paused or not self._heap:
+            return None
+        if accept is None:
+            return heapq.heappop(self._heap)
+        reserved = set()  # The devices of the refused plans ahead
+        for item in sorted(self._heap):
+            if item.devices is None and reserved or reserved.intersection(item.devices or ()):
+                continue
+            if accept(item):
+                self._heap.remove(item)
+                heapq.heapify(self._heap)
+                return item
+            if item.devices is None:
+                return None
+            reserved.update(item.devices)
+        return None
+
+    def peek(self, count=1):
+        """The next ``count`` plans in priority order, without removing them."""
+        with self._condition:
+            return heapq.nsmallest(count, self._heap)
+
+    def wait_for_update(self, version=None, timeout=None):
+        """Block until the queue has changed since ``version`` (any change, if None); returns the new version."""
+        with self._condition:
+            self._condition.wait_for(lambda: version is None or self._version != version, timeout)
+            return self._version
+
+    def pause(self):
+        """Hand out no plan from ``get`` until ``resume`` is called; plans can still be queued."""
+        with self._condition:
+            self.paused = True
+            self._version += 1
+            self._condition.notify_all()
+
+    def resume(self):
+        with self._condition:
+            self.paused = False
+            self._version += 1
+            self._condition.notify_all()
+
+    def shutdown(self):
+        """Make blocked and later calls to ``get`` return None, so that the threads serving the queue can exit."""
+        with self._condition:
+            self._shut_down = True
+            self._version += 1
+            self._condition.notify_all()
+
+    def wake(self):
+        """Re-evaluate the ``accept`` predicates of blocked ``get`` calls."""
+        with self._condition:
+            self._condition.notify_all()
+
+    def task_done(self, item):
+        """Mark a PrioritizedPlan returned by ``get`` as finished, removing it from the database."""
+        self._delete(item.sequence)
+        with self._condition:
+            self._unfinished_tasks -= 1
+
+    def _delete(self, sequence):
+        self._execute('DELETE FROM plans WHERE sequence=?', (sequence,))
+
+    def clear(self):
+        """Discard every plan that has not started."""
+        with self._condition:
+            items, self._heap = self._heap, []
+            self._unfinished_tasks -= len(items)
+            self._version += 1
+            self._condition.notify_all()
+        self._execute('DELETE FROM plans WHERE NOT started')
+
+    def close(self):
+        """Close the database; the queue keeps working, but is no longer persisted."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _execute(self, statement, parameters=()):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute(statement, parameters)
+
+    @property
+    def unfinished_tasks(self):
+        return self._unfinished_tasks
+
+    def qsize(self):
+        return len(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
@@ -3,6 +3,7 @@ import importlib.util
 import os
 from xicam.core.msg import logError, logMessage, CRITICAL
 from .. import runengine
+from ..planqueue import PlanReference
 
 
 class PlanItem(object):
@@ -61,4 +62,7 @@ class PlanItem(object):
         return PlanItem, (self.name, self.icon, self.code)
 
     def run(self, callback=None):
-        runengine.RE(self.plan, callback, suppress_parameters_dialog=True, plan_name=self.name)
+        # Queue a reference with a snapshot of the parameters, so the submission can be persisted and edits made
+        # while it waits don't change it
+        runengine.RE(PlanReference(self, self.parameter), callback, suppress_parameters_dialog=True,
+                     plan_name=self.name)
@@ -0,0 +1,393 @@
+"""
+A RunEngine that runs in a child process, so that acquisition does not share the GIL with the GUI.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import pickle
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from queue import Queue, SimpleQueue
+
+import numpy as np
+from xicam.core import msg
+
+# Operations that block the child's main thread until the plan ends or pauses
+_BLOCKING_OPERATIONS = ('run', 'resume')
+_OPERATIONS = ('run', 'resume', 'request_pause', 'abort', 'stop', 'halt')
+# Shared memory blocks the parent keeps mapped for reuse
+_MAX_MAPPINGS = 32
+
+
+class ProcessRunEngine:
+    """
+    A stand-in for a bluesky RunEngine that drives a RunEngine in a child process.
+
+    It exposes the part of the RunEngine interface that QRunEngine uses: calling it runs a plan and blocks until the
+    plan ends (raising RunEngineInterrupted if it pauses), ``resume``, ``request_pause``, ``abort``, ``stop`` and
+    ``halt`` behave as they do on a RunEngine, ``state`` mirrors the child's state and ``state_hook`` is called on
+    every change, and ``subscribe`` delivers the child's documents.
+
+    Plans and commands are pickled over a pipe, so a plan must be picklable: a PlanReference (resolved in the child),
+    a plan function with its arguments bound (e.g. with functools.partial; it is called in the child), or a list of
+    Msgs whose objects can be pickled. Documents come back over the same pipe, except for arrays of at least
+    ``shared_memory_threshold`` bytes in events, which are passed in shared memory and appear in the documents as
+    read-only arrays backed by it. The child reuses a block once the arrays backed by it have been garbage collected,
+    so a stream of frames of the same size cycles through a few blocks that are already mapped on both sides.
+
+    Parameters
+    ----------
+    shared_memory_threshold : int
+        Size (bytes) from which event arrays are passed in shared memory rather than pickled.
+    trace_messages : bool
+        Record Msg timing in the child (see MessageTracer); the per-run summaries arrive in streams of the runs.
+    count_ca_traffic : bool
+        Count the Channel Access requests of the child; the traffic of each run arrives in a stream of the run (see
+        CATrafficRecorder).
+    kwargs
+        Passed to the child's RunEngine.
+    """
+
+    def __init__(self, shared_memory_threshold=64 * 1024, trace_messages=False, count_ca_traffic=False, **kwargs):
+        self.state_hook = None
+        self._state = 'idle'
+        self._subscribers = dict()  # token -> (name, func); replaced, never mutated
+        self._tokens = itertools.count()
+        self._requests = dict()  # request id -> Future
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._mappings = OrderedDict()  # shared memory block name -> SharedMemory; only used by the reader thread
+        self._in_use = set()  # names of the blocks backing live arrays
+        self._released = SimpleQueue()  # names of blocks to hand back to the child; safe to put to from a finalizer
+
+        # Spawn rather than fork: the parent is a multithreaded Qt application
+        context = multiprocessing.get_context('spawn')
+        self._connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_serve, name='RunEngine', daemon=True,
+                                       args=(child_connection, kwargs, shared_memory_threshold, trace_messages,
+                                             count_ca_traffic))
+        self.process.start()
+        child_connection.close()
+
+        self._reader = threading.Thread(target=self._read, name='ProcessRunEngine-reader', daemon=True)
+        self._reader.start()
+        threading.Thread(target=self._release, name='ProcessRunEngine-release', daemon=True).start()
+
+    @property
+    def state(self):
+        return self._state
+
+    def __call__(self, plan, *args, **kwargs):
+        return self._request('run', plan, *args, **kwargs).result()
+
+    def resume(self):
+        return self._request('resume').result()
+
+    def request_pause(self, defer=False):
+        return self._request('request_pause', defer).result()
+
+    def abort(self, reason=''):
+        return self._request('abort', reason).result()
+
+    def stop(self):
+        return self._request('stop').result()
+
+    def halt(self):
+        return self._request('halt').result()
+
+    def subscribe(self, func, name='all'):
+        with self._lock:
+            token = next(self._tokens)
+            subscribers = dict(self._subscribers)
+            subscribers[token] = (name, func)
+            self._subscribers = subscribers
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            subscribers = dict(self._subscribers)
+            subscribers.pop(token, None)
+            self._subscribers = subscribers
+
+    def close(self, timeout=5):
+        """Shut the child process down; a running plan is aborted."""
+        if self.process.is_alive():
+            if self._state != 'idle':
+                self.abort('Application is closing.')
+            # Closing our end would not wake the child while the reader thread is blocked reading from it
+            with self._lock:
+                try:
+                    self._connection.send((None, 'close', (), dict()))
+                except OSError:
+                    pass
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._connection.close()
+
+    def _request(self, operation, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._requests[request_id] = future
+            try:
+                self._connection.send((request_id, operation, args, kwargs))
+            except (OSError, pickle.PicklingError, TypeError, AttributeError) as ex:
+                del self._requests[request_id]
+                future.set_exception(ex)
+        return future
+
+    def _release(self):
+        while True:
+            name = self._released.get()
+            self._in_use.discard(name)
+            with self._lock:
+                try:
+                    self._connection.send((None, 'release', (name,), dict()))
+                except OSError:
+                    return
+
+    def _attach_arrays(self, doc):
+        data = doc.get('data')
+        if not data:
+            return doc
+        for key, value in data.items():
+            if isinstance(value, _SharedArray):
+                data[key] = self._attach(value)
+            elif isinstance(value, list) and any(isinstance(item, _SharedArray) for item in value):
+                data[key] = [self._attach(item) if isinstance(item, _SharedArray) else item for item in value]
+        return doc
+
+    def _attach(self, shared):
+        block = self._mappings.pop(shared.name, None) or shared_memory.SharedMemory(name=shared.name)
+        self._mappings[shared.name] = block
+        self._in_use.add(shared.name)
+
+        array = np.ndarray(shared.shape, np.dtype(shared.dtype), buffer=block.buf)
+        array.flags.writeable = False
+        weakref.finalize(array, self._released.put, shared.name)
+
+        # Forget the least recently used mappings of blocks the child may since have discarded
+        for name in list(itertools.islice(self._mappings, max(0, len(self._mappings) - _MAX_MAPPINGS))):
+            if name not in self._in_use:
+                self._mappings.pop(name).close()
+        return array
+
+    def _read(self):
+        while True:
+            try:
+                message = self._connection.recv()
+            except (EOFError, OSError):
+                break
+
+            kind = message[0]
+            if kind == 'document':
+                self._dispatch(message[1], self._attach_arrays(message[2]))
+            elif kind == 'state':
+                _, state, old_state = message
+                self._state = state
+                if self.state_hook:
+                    self.state_hook(state, old_state)
+            elif kind == 'reply':
+                _, request_id, error, result = message
+                with self._lock:
+                    future = self._requests.pop(request_id)
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+        self._state = 'idle'
+        with self._lock:
+            requests, self._requests = self._requests, dict()
+        for future in requests.values():
+            future.set_exception(RuntimeError('The RunEngine process has exited.'))
+        for name in [name for name in self._mappings if name not in self._in_use]:
+            self._mappings.pop(name).close()
+
+    def _dispatch(self, name, doc):
+        for subscription, func in self._subscribers.values():
+            if subscription in ('all', name):
+                try:
+                    func(name, doc)
+                except Exception as ex:
+                    msg.logMessage(f'Document subscriber {func} failed on a {name} document.', level=msg.ERROR)
+                    msg.logError(ex)
+
+
+def _serve(connection, kwargs, shared_memory_threshold, trace_messages, count_ca_traffic):
+    # Entry point of the child process
+    from bluesky import RunEngine
+    from bluesky.utils import DuringTask
+    from xicam.Acquire.msgtrace import MessageTracer
+    from xicam.Acquire.catraffic import ca_traffic, CATrafficRecorder
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    run_engine = RunEngine(context_managers=[], during_task=DuringTask(), loop=loop, **kwargs)
+    if trace_messages:
+        MessageTracer().install(run_engine)
+    if count_ca_traffic:
+        # The child's traffic is all its RunEngine's
+        try:
+            ca_traffic.install()
+        except Exception as ex:
+            msg.logMessage(f'Channel Access traffic will not be counted: {ex}', level=msg.WARNING)
+        else:
+            CATrafficRecorder(ca_traffic).install(run_engine)
+
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            connection.send(message)
+
+    # States are the state machine's proxy strings, which don't unpickle
+    run_engine.state_hook = lambda state, old_state: send('state', str(state), str(old_state))
+    pool = _SharedMemoryPool(shared_memory_threshold)
+    run_engine.subscribe(lambda name, doc: send('document', name, pool.share_arrays(name, doc)))
+
+    # Operations that return quickly are run as soon as they are read, so a pause or abort is never stuck behind the
+    # running plan; running, resuming, and aborting a paused plan happen on this (the main) thread
+    blocking = Queue()
+
+    def read():
+        while True:
+            try:
+                request = connection.recv()
+            except (EOFError, OSError):
+                break
+            if request[1] == 'close':
+                break
+            elif request[1] == 'release':
+                pool.release(*request[2])
+            elif request[1] in _BLOCKING_OPERATIONS or run_engine.state == 'paused':
+                blocking.put(request)
+            else:
+                _execute(run_engine, request, send)
+        blocking.put(None)
+
+    threading.Thread(target=read, name='RunEngine-commands', daemon=True).start()
+
+    for request in iter(blocking.get, None):
+        _execute(run_engine, request, send)
+
+    if run_engine.state != 'idle':
+        run_engine.abort('Application is closing.')
+    pool.close()
+
+
+def _execute(run_engine, request, send):
+    request_id, operation, args, kwargs = request
+    try:
+        if operation not in _OPERATIONS:
+            raise ValueError(f'Unknown RunEngine operation "{operation}".')
+        if operation == 'run':
+            plan, *args = args
+            result = run_engine(_load_plan(plan), *args, **kwargs)
+        else:
+            result = getattr(run_engine, operation)(*args, **kwargs)
+    except Exception as ex:
+        send('reply', request_id, _portable(ex), None)
+    else:
+        send('reply', request_id, None, result)
+
+
+def _load_plan(plan):
+    from xicam.Acquire.planqueue import PlanReference
+
+    if isinstance(plan, PlanReference):
+        return plan.resolve()
+    if callable(plan):
+        return plan()
+    return plan
+
+
+def _portable(ex):
+    # Exceptions go back to the parent; not all of them can be pickled
+    try:
+        pickle.loads(pickle.dumps(ex))
+    except Exception:
+        return RuntimeError(f'{type(ex).__name__}: {ex}')
+    return ex
+
+
+class _SharedArray:
+    """Placeholder for an array passed in a shared memory block."""
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+
+class _SharedMemoryPool:
+    """The child's shared memory blocks: those backing arrays the parent still holds, and free ones kept for reuse."""
+
+    def __init__(self, threshold, max_free=8):
+        self.threshold = threshold
+        self.max_free = max_free
+        self._lock = threading.Lock()
+        self._in_use = dict()  # name -> (SharedMemory, size)
+        self._free = OrderedDict()  # name -> (SharedMemory, size), oldest first
+        self._free_by_size = defaultdict(list)  # size -> names
+
+    def share_arrays(self, name, doc):
+        if name == 'event':
+            return dict(doc, data={key: self.share(value) for key, value in doc['data'].items()})
+        if name == 'event_page':
+            return dict(doc, data={key: [self.share(value) for value in values]
+                                   for key, values in doc['data'].items()})
+        return doc
+
+    def share(self, value):
+        if not isinstance(value, np.ndarray) or value.nbytes < self.threshold or value.dtype.hasobject:
+            return value
+        block = self._acquire(value.nbytes)
+        np.ndarray(value.shape, value.dtype, buffer=block.buf)[...] = value
+        return _SharedArray(block.name, value.shape, value.dtype.str)
+
+    def _acquire(self, size):
+        with self._lock:
+            names = self._free_by_size[size]
+            if names:
+                block, _ = self._free.pop(names.pop())
+            else:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            self._in_use[block.name] = block, size
+        return block
+
+    def release(self, name):
+        with self._lock:
+            if name not in self._in_use:
+                return
+            block, size = self._in_use.pop(name)
+            self._free[name] = block, size
+            self._free_by_size[size].append(name)
+            while len(self._free) > self.max_free:
+                name, (block, size) = self._free.popitem(last=False)
+                self._free_by_size[size].remove(name)
+                _discard(block)
+
+    def close(self):
+        with self._lock:
+            for block, _ in [*self._in_use.values(), *self._free.values()]:
+                _discard(block)
+            self._in_use.clear()
+            self._free.clear()
+            self._free_by_size.clear()
+
+
+def _discard(block):
+    block.close()
+    block.unlink()
@@ -0,0 +1 @@
+from .virtualtime import VirtualClock, VirtualPositioner, VirtualDetector, replay
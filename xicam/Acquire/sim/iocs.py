@@ -0,0 +1,605 @@
+"""
+Simulated IOCs for the devices of this package, served with caproto, so the controllers and plans can run anywhere.
+
+The PVs of each IOC are generated from the ophyd device class itself; behaviour is added where the plans depend on
+it: area detectors acquire frames in (real) exposure and readout time, publish them to their image plugin and write
+them to HDF5 files; motor records move at their velocity; the power supply switches on and off, the temperature
+controller settles towards its setpoint and the diode reads a noisy current.
+
+Start them all with::
+
+    python -m xicam.Acquire.sim.iocs
+
+and point Channel Access at them (EPICS_CA_ADDR_LIST=127.0.0.1, EPICS_CA_AUTO_ADDR_LIST=NO). ``--list`` shows the
+IOCs and their prefixes; ``IOCFarm`` runs them from Python, e.g. for benchmarks.
+"""
+import argparse
+import asyncio
+import copy
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict, namedtuple
+from importlib import import_module
+
+import numpy as np
+from caproto import ChannelType
+from caproto.server import PVGroup, pvproperty
+from ophyd import Component, Device, Signal
+from ophyd.areadetector.base import EpicsSignalWithRBV
+from ophyd.areadetector.cam import CamBase
+from ophyd.areadetector.paths import EpicsPathSignal
+from ophyd.device import DynamicDeviceComponent
+from ophyd.signal import EpicsSignalBase
+
+# Enum strings of the areaDetector, motor and support IOC records, by record name (without _RBV)
+_ENUMS = {
+    'Acquire': ('Done', 'Acquire'),
+    'AdjustedAcquire': ('Done', 'Acquire'),
+    'ImageMode': ('Single', 'Multiple', 'Continuous'),
+    'TriggerMode': ('Internal', 'External'),
+    'DetectorState': ('Idle', 'Acquire', 'Readout', 'Correct', 'Saving', 'Aborting', 'Error', 'Waiting',
+                      'Initializing', 'Disconnected', 'Aborted'),
+    'ArrayCallbacks': ('Disable', 'Enable'),
+    'EnableCallbacks': ('Disable', 'Enable'),
+    'BlockingCallbacks': ('No', 'Yes'),
+    'DataType': ('Int8', 'UInt8', 'Int16', 'UInt16', 'Int32', 'UInt32', 'Int64', 'UInt64', 'Float32', 'Float64'),
+    'ColorMode': ('Mono', 'Bayer', 'RGB1', 'RGB2', 'RGB3', 'YUV444', 'YUV422', 'YUV421'),
+    'FileWriteMode': ('Single', 'Capture', 'Stream'),
+    'Capture': ('Done', 'Capture'),
+    'AutoIncrement': ('No', 'Yes'),
+    'AutoSave': ('No', 'Yes'),
+    'FilePathExists': ('No', 'Yes'),
+    'SWMRMode': ('Off', 'On'),
+    'SWMRSupported': ('Not supported', 'Supported'),
+    'SWMRActive': ('Off', 'Active'),
+    'AndorShutterMode': ('Full Auto', 'Always Open', 'Always Closed', 'Open for FVB', 'Open for any'),
+    'AndorCooler': ('Off', 'On'),
+    'AndorTempStatus': ('Stabilized', 'Not Reached', 'Not Stabilized', 'Drift', 'Off'),
+    'ShutterTimingMode': ('Normal', 'Always Closed', 'Always Open'),
+}
+# Records holding integers; any other numeric record holds a double
+_INTEGERS = re.compile(r'(Num|Counter|Number|Size|Dimensions|UniqueId|Bin|Min[XY]$|Max[XY]$|Dropped|Queue|Port|'
+                       r'\.(DMOV|MOVN|STOP|TDIR|HLS|LLS|DIR|FOFF|SET|HOMF|HOMR)$)')
+_STRING_LENGTH = 256
+
+# Kwargs of the EPICS signals that a plain Signal does not take
+_EPICS_KWARGS = ('put_complete', 'limits', 'auto_monitor', 'timeout', 'write_timeout', 'connection_timeout',
+                 'all_pvs', 'path_semantics')
+
+
+def _record(pvname, prefix):
+    """The record name of ``pvname``: what follows the device ``prefix`` and any plugin prefix, without _RBV."""
+    name = pvname[len(prefix):] if pvname.startswith(prefix) else pvname
+    name = name.rsplit(':', 1)[-1]
+    return name[:-len('_RBV')] if name.endswith('_RBV') else name
+
+
+# Initial values of the signals that tell ophyd how the areaDetector plugins are wired, by attribute name
+_PORT_WIRING = {
+    'plugin_type': lambda plugin: getattr(plugin, '_plugin_type', None),
+    'port_name': lambda plugin: 'CAM' if isinstance(plugin, CamBase) else plugin.attr_name.upper(),
+    'nd_array_port': lambda plugin: 'CAM',
+}
+
+
+def device_pvs(device_class, prefix, **kwargs):
+    """
+    The PVs a ``device_class`` device at ``prefix`` uses, found without connecting to (or needing) any IOC.
+
+    Returns
+    -------
+    OrderedDict
+        PV name -> (True if ophyd reads it as a string, its initial value or None). Plugins start with the plugin
+        type ophyd checks them for, and wired to the camera's port.
+    """
+    device = _recording_class(device_class)(prefix, name='recording', **kwargs)
+    pvs = OrderedDict()
+    for walk in device.walk_signals(include_lazy=True):
+        signal = walk.item
+        value = _PORT_WIRING.get(signal.attr_name, lambda parent: None)(signal.parent)
+        for pvname in getattr(signal, 'pvnames', ()):
+            string, _ = pvs.get(pvname, (False, None))
+            pvs[pvname] = string or signal.as_string, value
+    return pvs
+
+
+_recording_classes = dict()
+
+
+def _recording_class(cls):
+    # Like ophyd.sim.make_fake_device, with signals that record their PV names
+    if cls in _recording_classes:
+        return _recording_classes[cls]
+    if issubclass(cls, EpicsPathSignal):
+        recording = _RecordingPathSignal
+    elif issubclass(cls, EpicsSignalWithRBV):
+        recording = _RecordingSignalWithRBV
+    elif issubclass(cls, EpicsSignalBase):
+        recording = _RecordingSignal
+    elif issubclass(cls, Device):
+        components = dict()
+        for name in cls.component_names:
+            component = getattr(cls, name)
+            if isinstance(component, DynamicDeviceComponent):
+                recorded = Component(component.cls, suffix=component.suffix, lazy=component.lazy,
+                                     kind=component.kind, add_prefix=component.add_prefix, **component.kwargs)
+            else:
+                recorded = copy.copy(component)
+            recorded.cls = _recording_class(component.cls)
+            components[name] = recorded
+        recording = type(f'Recording{cls.__name__}', (cls,), components)
+    else:
+        recording = cls
+    _recording_classes[cls] = recording
+    return recording
+
+
+class _RecordingSignal(Signal):
+    def __init__(self, read_pv, write_pv=None, *, string=False, **kwargs):
+        for key in _EPICS_KWARGS:
+            kwargs.pop(key, None)
+        super(_RecordingSignal, self).__init__(**kwargs)
+        self.as_string = string
+        self.pvnames = [read_pv] if write_pv in (None, read_pv) else [read_pv, write_pv]
+
+
+class _RecordingSignalWithRBV(_RecordingSignal):
+    def __init__(self, prefix, **kwargs):
+        super(_RecordingSignalWithRBV, self).__init__(prefix + '_RBV', write_pv=prefix, **kwargs)
+
+
+class _RecordingPathSignal(_RecordingSignalWithRBV):
+    def __init__(self, write_pv, **kwargs):
+        kwargs['string'] = True
+        super(_RecordingPathSignal, self).__init__(write_pv, **kwargs)
+
+
+async def _put(group, instance, value):
+    return await group.put(instance, value)
+
+
+async def _startup(group, instance, async_lib):
+    await group.startup()
+
+
+class SimulatedDevice(PVGroup):
+    """
+    Serves the PVs of an ophyd device; subclasses simulate its behaviour by overriding ``put`` and ``startup``.
+
+    Build one with ``for_device``; ``defaults`` are the initial values of records (by record name).
+    """
+    defaults = {}
+    enums = _ENUMS
+
+    def __init__(self, *args, device_prefix, **kwargs):
+        super(SimulatedDevice, self).__init__(*args, **kwargs)
+        self.device_prefix = device_prefix
+        self.records = dict()  # record name -> PV names of that record, setpoint first
+        for pvname in self.pvdb:
+            self.records.setdefault(_record(pvname, device_prefix), []).append(pvname)
+        for pvnames in self.records.values():
+            pvnames.sort(key=lambda pvname: pvname.endswith('_RBV'))
+
+    @classmethod
+    def for_device(cls, device_class, prefix, device_kwargs=None, **kwargs):
+        pvs = device_pvs(device_class, prefix, **(device_kwargs or {}))
+        properties = dict()
+        for index, (pvname, (string, value)) in enumerate(pvs.items()):
+            properties[f'pv{index}'] = cls._pvproperty(pvname, _record(pvname, prefix), string, value,
+                                                       startup=_startup if index == 0 else None)
+        group_class = type(f'Simulated{device_class.__name__}', (cls,), properties)
+        return group_class(prefix='', device_prefix=prefix, **kwargs)
+
+    @classmethod
+    def _pvproperty(cls, pvname, record, string, value=None, startup=None):
+        value = cls.defaults.get(record) if value is None else value
+        if record in cls.enums:
+            enum_strings = cls.enums[record]
+            value = enum_strings[value or 0] if not isinstance(value, str) else value
+            return pvproperty(name=pvname, value=value, dtype=ChannelType.ENUM, enum_strings=enum_strings,
+                              put=_put, startup=startup)
+        if isinstance(value, str) and not string:
+            return pvproperty(name=pvname, value=value, dtype=ChannelType.STRING, put=_put, startup=startup)
+        if string:
+            return pvproperty(name=pvname, value=value or '', max_length=_STRING_LENGTH, string_encoding='latin-1',
+                              put=_put, startup=startup)
+        if isinstance(value, np.ndarray):
+            return pvproperty(name=pvname, value=value, dtype=ChannelType.LONG, max_length=value.size, put=_put,
+                              startup=startup)
+        if _INTEGERS.search(record):
+            return pvproperty(name=pvname, value=int(value or 0), dtype=int, put=_put, startup=startup)
+        return pvproperty(name=pvname, value=float(value or 0), dtype=float, precision=3, put=_put,
+                          startup=startup)
+
+    def pv(self, record, readback=False):
+        """The PV of ``record`` (its setpoint, unless ``readback``), or None if the device does not use it."""
+        pvnames = self.records.get(record)
+        if not pvnames:
+            return None
+        return self.pvdb[pvnames[-1] if readback else pvnames[0]]
+
+    def get(self, record, default=None):
+        pv = self.pv(record, readback=True)
+        return default if pv is None else pv.value
+
+    async def set(self, record, value):
+        """Write ``value`` to every PV of ``record`` (setpoints and readbacks), bypassing ``put``."""
+        for pvname in self.records.get(record, ()):
+            pv = self.pvdb[pvname]
+            if getattr(pv, 'enum_strings', None) and isinstance(value, int):
+                await pv.write(pv.enum_strings[value], verify_value=False)
+            else:
+                await pv.write(value, verify_value=False)
+
+    async def put(self, instance, value):
+        """A client put ``value`` to ``instance``; mirrors it to the readback, like the IOC's records do."""
+        name = instance.pvspec.name
+        readback = self.pvdb.get(name + '_RBV')
+        if readback is not None:
+            await readback.write(value, verify_value=False)
+
+    async def startup(self):
+        pass
+
+
+class SimulatedAreaDetector(SimulatedDevice):
+    """
+    An areaDetector camera with image, ROI statistics and HDF5 plugins.
+
+    Acquiring takes the acquire time plus ``readout_time`` per frame, for one frame (Single), NumImages frames
+    (Multiple) or until stopped (Continuous); FastCCD's AdjustedAcquire always takes NumImages. Each frame is
+    published on image1:ArrayData and, while HDF1 captures, appended to /entry/data/data of its file; file paths are
+    created under ``data_root``.
+    """
+    defaults = {'AcquireTime': .1, 'AdjustedAcquireTime': .1, 'AcquirePeriod': .1, 'AdjustedAcquirePeriod': .1,
+                'NumImages': 1, 'NumExposures': 1, 'ImageMode': 'Single', 'ArrayCallbacks': 'Enable',
+                'EnableCallbacks': 'Enable', 'FileTemplate': '%s%s_%6.6d.h5', 'FilePathExists': 'Yes',
+                'AutoIncrement': 'Yes', 'FileWriteMode': 'Stream', 'SWMRSupported': 'Supported', 'NDimensions': 2}
+
+    def __init__(self, *args, shape=(512, 512), readout_time=.04, data_root=None, **kwargs):
+        super(SimulatedAreaDetector, self).__init__(*args, **kwargs)
+        self.shape = shape
+        self.readout_time = readout_time
+        self.data_root = data_root or tempfile.gettempdir()
+        self._acquisition = None
+        self._file = None
+        self._frames = self._make_frames()
+
+    @classmethod
+    def for_device(cls, device_class, prefix, device_kwargs=None, shape=(512, 512), **kwargs):
+        # The image waveform's size is fixed when its class is made
+        defaults = dict(cls.defaults, ArrayData=np.zeros(shape[0] * shape[1], dtype=np.int32),
+                        MaxSizeX=shape[1], MaxSizeY=shape[0], SizeX=shape[1], SizeY=shape[0])
+        detector_class = type(cls.__name__, (cls,), {'defaults': defaults})
+        return super(SimulatedAreaDetector, detector_class).for_device(device_class, prefix, device_kwargs,
+                                                                       shape=shape, **kwargs)
+
+    def _make_frames(self, count=8):
+        # A few frames of a noisy ring, cycled through, so generating frames costs nothing at acquisition rates
+        rng = np.random.default_rng(0)
+        y, x = np.indices(self.shape)
+        radius = np.hypot(y - self.shape[0] / 2, x - self.shape[1] / 2)
+        ring = 1000 * np.exp(-((radius - min(self.shape) / 4) / 8) ** 2) + 100
+        return [rng.poisson(ring).astype(np.uint16) for _ in range(count)]
+
+    async def put(self, instance, value):
+        await super(SimulatedAreaDetector, self).put(instance, value)
+        name = instance.pvspec.name
+        record = _record(name, self.device_prefix)
+        if record in ('Acquire', 'AdjustedAcquire'):
+            acquiring = value in (1, 'Acquire')
+            if acquiring and not self._acquiring:
+                self._acquisition = asyncio.ensure_future(self._acquire(adjusted=record == 'AdjustedAcquire'))
+            elif not acquiring and self._acquiring:
+                self._acquisition.cancel()
+        elif record == 'Capture' and name.startswith(self.device_prefix + 'HDF1:'):
+            if value in (1, 'Capture'):
+                await self._open_file()
+            else:
+                await self._close_file()
+        elif record == 'FilePath':
+            path = self._local_path(value)
+            os.makedirs(path, exist_ok=True)
+            await self.set('FilePathExists', 'Yes')
+
+    @property
+    def _acquiring(self):
+        return self._acquisition is not None and not self._acquisition.done()
+
+    async def _acquire(self, adjusted):
+        await self.set('Acquire', 'Acquire')
+        await self.set('AdjustedAcquire', 'Acquire')
+        await self.set('NumImagesCounter', 0)
+        mode = self.get('ImageMode')
+        frames = 1 if mode == 'Single' and not adjusted else self.get('NumImages', 1)
+        if mode == 'Continuous' and not adjusted:
+            frames = None
+        try:
+            count = 0
+            while frames is None or count < frames:
+                await self.set('DetectorState', 'Acquire')
+                await asyncio.sleep(self.get('AdjustedAcquireTime', None) or self.get('AcquireTime', 0.))
+                await self.set('DetectorState', 'Readout')
+                await asyncio.sleep(self.get('ReadoutTime', None) or self.get('ReadoutTimeCalc', None)
+                                    or self.readout_time)
+                count += 1
+                await self._publish(self._frames[self.get('ArrayCounter', 0) % len(self._frames)], count)
+        finally:
+            await self.set('DetectorState', 'Idle')
+            await self.set('Acquire', 'Done')
+            await self.set('AdjustedAcquire', 'Done')
+
+    async def _publish(self, frame, count):
+        await self.set('NumImagesCounter', count)
+        await self.set('ArrayCounter', self.get('ArrayCounter', 0) + 1)
+        await self.set('ArraySize0', frame.shape[1])
+        await self.set('ArraySize1', frame.shape[0])
+        await self.set('ArraySizeX', frame.shape[1])
+        await self.set('ArraySizeY', frame.shape[0])
+        await self.set('Total', float(frame.sum()))
+        image = self.pv('ArrayData')
+        if image is not None:
+            await image.write(frame.ravel(), verify_value=False)
+        if self._file is not None:
+            await self._write(frame)
+
+    def _local_path(self, path):
+        return os.path.join(self.data_root, path.lstrip('/\\'))
+
+    async def _open_file(self):
+        import h5py
+
+        await self._close_file(done=False)
+        path, name, number = self.get('FilePath', ''), self.get('FileName', ''), self.get('FileNumber', 0)
+        full_name = self.get('FileTemplate') % (path, name, number)
+        os.makedirs(self._local_path(path), exist_ok=True)
+        swmr = self.get('SWMRMode') == 'On'
+        self._file = h5py.File(self._local_path(full_name), 'w', libver='latest' if swmr else 'earliest')
+        self._dataset = self._file.create_dataset('entry/data/data', shape=(0,) + self.shape,
+                                                  maxshape=(None,) + self.shape, dtype=np.uint16,
+                                                  chunks=(1,) + self.shape)
+        if swmr:
+            self._file.swmr_mode = True
+            await self.set('SWMRActive', 'Active')
+        await self.set('FullFileName', full_name)
+        await self.set('NumCaptured', 0)
+        if self.get('AutoIncrement') == 'Yes':
+            await self.set('FileNumber', number + 1)
+
+    async def _write(self, frame):
+        captured = self._dataset.shape[0] + 1
+        self._dataset.resize(captured, axis=0)
+        self._dataset[-1] = frame
+        self._file.flush()
+        await self.set('NumCaptured', captured)
+        await self.set('SWMRCbCounter', captured)
+        target = self.get('NumCapture', 0)
+        if self.get('FileWriteMode') == 'Single' or (target and captured >= target):
+            await self._close_file()
+
+    async def _close_file(self, done=True):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            await self.set('SWMRActive', 'Off')
+        if done:
+            await self.set('Capture', 'Done')
+
+
+class SimulatedMotor(SimulatedDevice):
+    """A motor record: moves to .VAL at .VELO (after .ACCL to get up to speed), unless within .RDBD of it."""
+    defaults = {'.VELO': 1., '.ACCL': .1, '.RDBD': .001, '.DMOV': 1}
+    update_rate = 20  # Readback updates per second while moving
+
+    def __init__(self, *args, **kwargs):
+        super(SimulatedMotor, self).__init__(*args, **kwargs)
+        self._move = None
+
+    async def put(self, instance, value):
+        await super(SimulatedMotor, self).put(instance, value)
+        record = _record(instance.pvspec.name, self.device_prefix)
+        if record == '.VAL':
+            if self._move is not None:
+                self._move.cancel()
+            # A motor class without the deadband (or speed) records moves with the defaults
+            if abs(value - self.get('.RBV')) > self.get('.RDBD', self.defaults['.RDBD']):
+                self._move = asyncio.ensure_future(self._move_to(value))
+        elif record == '.STOP' and value and self._move is not None:
+            self._move.cancel()
+            return 0
+
+    async def _move_to(self, target):
+        start = self.get('.RBV')
+        velocity = abs(self.get('.VELO', self.defaults['.VELO'])) or 1.
+        acceleration = self.get('.ACCL', self.defaults['.ACCL'])
+        duration = abs(target - start) / velocity + acceleration
+        await self.set('.TDIR', int(target > start))
+        await self.set('.DMOV', 0)
+        await self.set('.MOVN', 1)
+        began = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(1 / self.update_rate)
+                progress = min((time.monotonic() - began) / duration, 1.)
+                await self.set('.RBV', start + (target - start) * progress)
+                if progress >= 1:
+                    break
+        except asyncio.CancelledError:
+            await self.set('.VAL', self.get('.RBV'))
+        finally:
+            await self.set('.MOVN', 0)
+            await self.set('.DMOV', 1)
+
+
+class SimulatedPSU(SimulatedDevice):
+    """The FastCCD power supplies: a put to On or Off switches State, and the outputs ramp to nominal or zero."""
+    enums = dict(_ENUMS, State=('Off', 'On'))
+    nominal = {'Voltage': 12., 'Current': .5}
+
+    async def put(self, instance, value):
+        await super(SimulatedPSU, self).put(instance, value)
+        record = _record(instance.pvspec.name, self.device_prefix)
+        if record in ('On', 'Off') and value:
+            on = record == 'On'
+            await self.set('State', int(on))
+            for pvname in self.pvdb:
+                output = _record(pvname, self.device_prefix)
+                if output in self.nominal:
+                    await self.pvdb[pvname].write(self.nominal[output] if on else 0., verify_value=False)
+
+
+class SimulatedTemperatureController(SimulatedDevice):
+    """A LakeShore 336 cooling both sensors towards the setpoint (°C), with a ``time_constant`` (s) first-order lag."""
+    defaults = {'TemperatureCelsiusA': 25., 'TemperatureCelsiusB': 25., 'TemperatureKelvinA': 298.15,
+                'TemperatureKelvinB': 298.15, 'TemperatureSetPoint': 25., 'TemperatureLimitA': 400.,
+                'TemperatureLimitB': 400.}
+    time_constant = 30.
+    interval = 1.
+
+    async def startup(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            setpoint = self.get('TemperatureSetPoint')
+            for sensor in 'AB':
+                temperature = self.get(f'TemperatureCelsius{sensor}')
+                temperature += (setpoint - temperature) * (1 - np.exp(-self.interval / self.time_constant))
+                await self.set(f'TemperatureCelsius{sensor}', temperature)
+                await self.set(f'TemperatureKelvin{sensor}', temperature + 273.15)
+            error = self.get('TemperatureCelsiusA') - setpoint
+            await self.set('HeaterOutput', float(np.clip(-error * 10, 0, 100)))
+
+
+class SimulatedDiode(SimulatedDevice):
+    """A photodiode reading ``current`` with 1% noise, ``rate`` times a second."""
+    current = 1e-6
+    rate = 10
+
+    async def startup(self):
+        rng = np.random.default_rng()
+        while True:
+            await asyncio.sleep(1 / self.rate)
+            await self.set('.VAL', float(self.current * (1 + .01 * rng.standard_normal())))
+
+
+Simulation = namedtuple('Simulation', ['device_class', 'prefix', 'simulation', 'options', 'device_kwargs'])
+
+# Simulated IOCs by name: the device class (as 'module:attribute'), its PV prefix, the simulation and its options, and
+# the keyword arguments the device is built with. FastCCD's delay generator keeps its hard-coded prefix.
+SIMULATIONS = OrderedDict([
+    ('fastccd', Simulation('xicam.Acquire.devices.fastccd:ProductionCamTriggered', 'SIM:FCCD:', SimulatedAreaDetector,
+                           {'shape': (960, 960), 'readout_time': .08}, {})),
+    ('andor', Simulation('xicam.Acquire.devices.andor:Andor', 'SIM:ANDOR:', SimulatedAreaDetector,
+                         {'shape': (1024, 1024), 'readout_time': .1}, {})),
+    ('pimte3', Simulation('xicam.Acquire.devices.pimte3:PIMTE3', 'SIM:PIMTE3:', SimulatedAreaDetector,
+                          {'shape': (1024, 1024), 'readout_time': .05}, {})),
+    ('psu', Simulation('xicam.Acquire.devices.psu:PSU', 'SIM:PSU:', SimulatedPSU, {}, {})),
+    ('lakeshore', Simulation('xicam.Acquire.devices.lakeshore:LakeShore336', 'SIM:LS336:',
+                             SimulatedTemperatureController, {}, {})),
+    ('diode', Simulation('xicam.Acquire.devices.diode:DetectorDiode', 'SIM:DIODE', SimulatedDiode, {}, {})),
+    ('motor', Simulation('xicam.Acquire.devices.motor:DeadbandEpicsMotor', 'SIM:MOTOR1', SimulatedMotor, {}, {})),
+])
+
+
+def _device_class(simulation):
+    module, attribute = simulation.device_class.split(':')
+    return getattr(import_module(module), attribute)
+
+
+def build(names=None, data_root=None):
+    """The pvdb of the simulated IOCs ``names`` (by default, all of SIMULATIONS)."""
+    pvdb = dict()
+    for name in names or SIMULATIONS:
+        simulation = SIMULATIONS[name]
+        options = dict(simulation.options)
+        if issubclass(simulation.simulation, SimulatedAreaDetector):
+            options['data_root'] = data_root
+        group = simulation.simulation.for_device(_device_class(simulation), simulation.prefix,
+                                                 simulation.device_kwargs, **options)
+        pvdb.update(group.pvdb)
+    return pvdb
+
+
+def make_device(name, **kwargs):
+    """An ophyd device connected to the simulated IOC ``name``."""
+    simulation = SIMULATIONS[name]
+    device_kwargs = dict(simulation.device_kwargs, **kwargs)
+    return _device_class(simulation)(simulation.prefix, name=name, **device_kwargs)
+
+
+class IOCFarm:
+    """
+    Runs simulated IOCs in a child process for the duration of a ``with`` block.
+
+    Channel Access is pointed at ``interface`` in this process' environment, unless it was already configured; do
+    this before ophyd first connects anything.
+    """
+
+    def __init__(self, names=None, data_root=None, interface='127.0.0.1', timeout=60):
+        self.names = list(names or SIMULATIONS)
+        self.data_root = data_root
+        self.interface = interface
+        self.timeout = timeout
+        self.process = None
+
+    def __enter__(self):
+        os.environ.setdefault('EPICS_CA_ADDR_LIST', self.interface)
+        os.environ.setdefault('EPICS_CA_AUTO_ADDR_LIST', 'NO')
+        arguments = [sys.executable, '-m', 'xicam.Acquire.sim.iocs', '--only', ','.join(self.names),
+                     '--interfaces', self.interface]
+        if self.data_root:
+            arguments += ['--data-root', self.data_root]
+        self.process = subprocess.Popen(arguments, stdout=subprocess.PIPE, universal_newlines=True)
+        # The farm prints its PV count once every IOC is built and it is about to serve
+        ready = self.process.stdout.readline()
+        if not ready:
+            raise RuntimeError(f'The simulated IOCs failed to start (exit code {self.process.wait()}).')
+        self._wait_for_connection()
+        return self
+
+    def _wait_for_connection(self):
+        from caproto.sync.client import read
+
+        simulation = SIMULATIONS[self.names[0]]
+        pvname = next(iter(device_pvs(_device_class(simulation), simulation.prefix, **simulation.device_kwargs)))
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                read(pvname, timeout=1)
+                return
+            except TimeoutError:
+                if time.monotonic() > deadline:
+                    raise
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xicam.Acquire.sim.iocs',
+                                     description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--only', help='comma-separated names of the IOCs to run (default: all)')
+    parser.add_argument('--list', action='store_true', help='list the IOCs and their prefixes, and exit')
+    parser.add_argument('--interfaces', nargs='+', default=['0.0.0.0'], help='interfaces to serve on')
+    parser.add_argument('--data-root', default=None,
+                        help='directory the detectors\' file paths are created under (default: the temp directory)')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, simulation in SIMULATIONS.items():
+            print(f'{name:10} {simulation.prefix:14} {simulation.device_class}')
+        return
+
+    from caproto.asyncio.server import run
+
+    pvdb = build(args.only.split(',') if args.only else None, data_root=args.data_root)
+    print(f'Serving {len(pvdb)} PVs', flush=True)
+    run(pvdb, interfaces=args.interfaces, log_pv_names=False)
+
+
+if __name__ == '__main__':
+    main()
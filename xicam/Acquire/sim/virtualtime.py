@@ -0,0 +1,204 @@
+"""
+Virtual time for the RunEngine: plans that spend hours sleeping, moving and exposing replay in seconds.
+
+A ``VirtualClock`` is an asyncio event loop whose clock jumps ahead whenever it would otherwise sit idle waiting for
+its next timer; ``bps.sleep``, and the moves and exposures of ``VirtualPositioner`` and ``VirtualDetector``, are
+timers on it. Run a ``QRunEngine`` on it with ``loop_factory``, and time plans with ``replay``::
+
+    clock = VirtualClock()
+    run_engine = QRunEngine(loop_factory=lambda: clock)
+    motor = VirtualPositioner(name='motor', clock=clock, velocity=.5)
+    detector = VirtualDetector(name='detector', clock=clock, exposure_time=10)
+    print(replay(run_engine, clock, scan([detector], motor, 0, 10, 720)))
+
+Only what waits on the clock is skipped: computation, and devices that complete from their own threads, still take
+real time (and are included in the projected duration).
+"""
+import asyncio
+import selectors
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from types import ModuleType
+
+from ophyd import Component as Cpt, Device, Signal, SoftPositioner
+from ophyd.status import DeviceStatus
+from qtpy.QtCore import Qt
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    def __init__(self, clock):
+        super(_VirtualTimeSelector, self).__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        # Anything from the outside world (call_soon_threadsafe, sockets) comes first
+        events = super(_VirtualTimeSelector, self).select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # No timers at all; only another thread can wake the loop, so wait for it for real
+            return super(_VirtualTimeSelector, self).select(None)
+        self._clock.advance(timeout)
+        return []
+
+
+class VirtualClock(asyncio.SelectorEventLoop):
+    """
+    An event loop on virtual time: real time, plus the time it skipped instead of waiting for its next timer.
+
+    ``time`` is the loop's clock, and ``wall_time`` its counterpart of ``time.time``.
+    """
+
+    def __init__(self):
+        self.skipped = 0.  # (s) of virtual time that did not pass for real
+        self._skip_lock = threading.Lock()
+        super(VirtualClock, self).__init__(_VirtualTimeSelector(self))
+
+    def time(self):
+        return time.monotonic() + self.skipped
+
+    def wall_time(self):
+        return time.time() + self.skipped
+
+    def advance(self, duration):
+        """Skip ``duration`` (s) of virtual time."""
+        with self._skip_lock:
+            self.skipped += duration
+
+    def call_later_threadsafe(self, delay, callback, *args):
+        """``call_later`` that can be called from any thread."""
+        self.call_soon_threadsafe(self.call_later, delay, callback, *args)
+
+    def sleep(self, duration):
+        """
+        Block for ``duration`` (s) of virtual time; a drop-in for ``time.sleep`` in device code.
+
+        Sleeping on the loop's own thread blocks the loop, as it would for real, so the clock simply jumps ahead.
+        """
+        try:
+            on_loop = asyncio.get_running_loop() is self
+        except RuntimeError:
+            on_loop = False
+        if on_loop or not self.is_running():
+            self.advance(duration)
+            return
+        woken = threading.Event()
+        self.call_later_threadsafe(duration, woken.set)
+        woken.wait()
+
+    @contextmanager
+    def patch_time(self, *modules):
+        """
+        Within the block, the ``time`` module imported by each of ``modules`` (under any name, e.g. ``ttime``) sleeps
+        and tells time on this clock; other modules are unaffected.
+        """
+        patched = []
+        proxy = _VirtualTimeModule(self)
+        for module in modules:
+            for name, value in list(vars(module).items()):
+                if value is time:
+                    setattr(module, name, proxy)
+                    patched.append((module, name))
+        try:
+            yield proxy
+        finally:
+            for module, name in patched:
+                setattr(module, name, time)
+
+
+class _VirtualTimeModule(ModuleType):
+    def __init__(self, clock):
+        super(_VirtualTimeModule, self).__init__('time')
+        self.sleep = clock.sleep
+        self.time = clock.wall_time
+        self.monotonic = self.perf_counter = clock.time
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class VirtualPositioner(SoftPositioner):
+    """A soft positioner whose moves take ``distance / velocity + settle_time`` (s) of virtual time."""
+
+    def __init__(self, *, clock, velocity=1., settle_time=0., init_pos=0., **kwargs):
+        self.clock = clock
+        self.velocity = velocity
+        self.virtual_settle_time = settle_time
+        super(VirtualPositioner, self).__init__(init_pos=init_pos, **kwargs)
+
+    def move_time(self, position):
+        return abs(position - (self.position or 0.)) / self.velocity + self.virtual_settle_time
+
+    def _setup_move(self, position, status):
+        self._run_subs(sub_type=self.SUB_START, timestamp=self.clock.wall_time())
+        self._started_moving = True
+        self._moving = True
+        self.clock.call_later_threadsafe(self.move_time(position), self._arrive, position)
+
+    def _arrive(self, position):
+        self._moving = False
+        self._set_position(position, timestamp=self.clock.wall_time())
+        self._done_moving()
+
+
+class VirtualDetector(Device):
+    """
+    A detector whose acquisitions take ``exposure_time + readout_time`` (s) of virtual time.
+
+    Each trigger sets ``value`` to ``func()`` (by default, the number of acquisitions so far).
+    """
+    value = Cpt(Signal, value=0., kind='hinted')
+    exposure_time = Cpt(Signal, value=1., kind='config')
+    readout_time = Cpt(Signal, value=0., kind='config')
+
+    def __init__(self, *args, clock, exposure_time=1., readout_time=0., func=None, **kwargs):
+        super(VirtualDetector, self).__init__(*args, **kwargs)
+        self.clock = clock
+        self.exposure_time.put(exposure_time)
+        self.readout_time.put(readout_time)
+        self.acquisitions = 0
+        self.func = func or (lambda: self.acquisitions)
+
+    def trigger(self):
+        status = DeviceStatus(self)
+        self.clock.call_later_threadsafe(self.exposure_time.get() + self.readout_time.get(), self._read_out, status)
+        return status
+
+    def _read_out(self, status):
+        self.acquisitions += 1
+        self.value.put(self.func(), timestamp=self.clock.wall_time())
+        status.set_finished()
+
+
+Replay = namedtuple('Replay', ['real', 'projected'])
+Replay.__doc__ = 'The real time (s) it took to replay a plan, and how long it would have taken for real.'
+
+
+def replay(run_engine, clock, plan, timeout=None):
+    """
+    Run ``plan`` on ``run_engine`` (a QRunEngine on ``clock``), wait until it is finished, and time it.
+
+    Raises whatever the plan raised, or TimeoutError if it takes longer than ``timeout`` (s) of real time.
+    """
+    finished = threading.Event()
+    failures = []
+
+    def _fail(ex):
+        failures.append(ex)
+
+    run_engine.sigFinish.connect(finished.set, Qt.DirectConnection)
+    run_engine.sigException.connect(_fail, Qt.DirectConnection)
+    try:
+        start, virtual_start = time.perf_counter(), clock.time()
+        run_engine.put_batch([(plan, None, {})])
+        if not finished.wait(timeout):
+            raise TimeoutError('The plan did not finish in time.')
+        result = Replay(time.perf_counter() - start, clock.time() - virtual_start)
+    finally:
+        run_engine.sigFinish.disconnect(finished.set)
+        run_engine.sigException.disconnect(_fail)
+    if failures:
+        raise failures[0]
+    return result
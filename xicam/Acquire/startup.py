@@ -0,0 +1,113 @@
+"""
+Startup profiling: the import time of each module and the construction time of each widget of the Acquire plugin.
+
+``python -m xicam.Acquire.startup`` prints the slowest modules of a cold ``import xicam.Acquire``, run in a fresh
+interpreter; ``--widgets`` also builds the plugin, and every one of its stages, in this process.
+"""
+import argparse
+import subprocess
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+# Widget name -> construction time (s), in construction order
+construction_times = OrderedDict()
+
+
+@contextmanager
+def timed(name):
+    """Record the time the block takes in ``construction_times``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        construction_times[name] = time.perf_counter() - start
+
+
+def import_times(module='xicam.Acquire', env=None):
+    """
+    Time a cold import of ``module`` with ``python -X importtime``, optionally with the environment ``env``.
+
+    Returns
+    -------
+    list of (str, float, float)
+        Each imported module, with its own and its cumulative import time (s), in import order.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, env=env)
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue  # The header
+        times.append((name.strip(), int(own) * 1e-6, int(cumulative) * 1e-6))
+    if process.returncode:
+        raise RuntimeError(f'Importing {module} failed:\n{process.stderr[-2000:]}')
+    return times
+
+
+def report(imports=(), constructions=None, top=20, module='xicam.Acquire'):
+    """Format a startup report of ``import_times(module)`` and ``construction_times`` (by default, this process')."""
+    constructions = construction_times if constructions is None else constructions
+    lines = []
+    if imports:
+        total = next((cumulative for name, _, cumulative in imports if name == module), 0.)
+        lines.append(f'Import of {module}: {total:.2f} s, {len(imports)} modules in total')
+
+        packages = defaultdict(float)
+        for name, own, _ in imports:
+            packages[name.split('.')[0]] += own
+        lines.append('\nSlowest packages (own time of all their modules):')
+        for name, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            lines.append(f'{own * 1e3:10.1f} ms  {name}')
+
+        lines.append('\nSlowest modules (including what they import):')
+        for name, _, cumulative in sorted(imports, key=lambda item: item[2], reverse=True)[:top]:
+            lines.append(f'{cumulative * 1e3:10.1f} ms  {name}')
+    if constructions:
+        lines.append(f'\nWidget construction: {sum(constructions.values()):.2f} s')
+        for name, elapsed in constructions.items():
+            lines.append(f'{elapsed * 1e3:10.1f} ms  {name}')
+    return '\n'.join(lines)
+
+
+def _construct_widgets():
+    from qtpy.QtWidgets import QApplication
+    from xicam.plugins import manager as pluginmanager
+
+    application = QApplication.instance() or QApplication([])
+    pluginmanager.qt_is_safe = True
+    pluginmanager.initialize_types()
+    pluginmanager.collect_plugins()
+    for name in ('happi_devices', 'plans'):  # The settings the plugin's widgets are built from
+        pluginmanager.get_plugin_by_name(name, 'SettingsPlugin', timeout=60)
+
+    from xicam.Acquire import AcquirePlugin
+    from xicam.Acquire.widgets.lazy import LazyWidget
+
+    with timed('AcquirePlugin'):
+        plugin = AcquirePlugin()
+    for layout in plugin.stages.values():
+        for widget in vars(layout).values():
+            if isinstance(widget, LazyWidget):
+                widget.build()
+    return application
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xicam.Acquire.startup', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--widgets', action='store_true', help='also construct the plugin and all of its stages')
+    parser.add_argument('--top', type=int, default=20, help='number of packages and modules to list')
+    args = parser.parse_args(argv)
+
+    imports = import_times()
+    if args.widgets:
+        _construct_widgets()
+    print(report(imports, top=args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-run summaries recorded in streams of their own, where the document schemas allow any data.
+"""
+import json
+
+from bluesky import Msg
+from bluesky.preprocessors import plan_mutator
+from ophyd.signal import SignalRO
+
+
+class SummarySignal(SignalRO):
+    """A read-only signal whose value is what ``summarize`` returns, as JSON."""
+
+    def __init__(self, summarize, *, name, **kwargs):
+        super(SummarySignal, self).__init__(name=name, value='', **kwargs)
+        self.summarize = summarize
+
+    def get(self, **kwargs):
+        return json.dumps(self.summarize())
+
+
+def summary_stream(name, summarize, enabled=None):
+    """
+    A RunEngine preprocessor that records ``summarize()`` in each run, just before it closes, as the single event of
+    a stream called ``name``; its one field, also ``name``, holds the summary as JSON.
+
+    Runs closed by the RunEngine rather than by their plan (when aborted, for instance) get no summary stream.
+
+    Parameters
+    ----------
+    name : str
+    summarize : callable
+        Returns the summary of the run being closed, a dict or list that can be serialized to JSON.
+    enabled : callable, optional
+        Called at the end of each run; no stream is recorded when it returns False.
+    """
+    signal = SummarySignal(summarize, name=name)
+
+    def insert(msg):
+        if msg.command != 'close_run' or (enabled is not None and not enabled()):
+            return None, None
+
+        def record():
+            yield Msg('create', None, name=name, run=msg.run)
+            yield Msg('read', signal, run=msg.run)
+            yield Msg('save', None, run=msg.run)
+            return (yield msg)
+
+        return record(), None
+
+    def preprocessor(plan):
+        return plan_mutator(plan, insert)
+
+    return preprocessor
+
+
+def read_summary(descriptor, event):
+    """The summary in ``event`` of a summary stream, given the stream's descriptor; None for other events."""
+    name = descriptor.get('name')
+    if name in descriptor.get('data_keys', dict()) and name in event.get('data', dict()):
+        return json.loads(event['data'][name])
+    return None
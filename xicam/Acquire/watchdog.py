@@ -0,0 +1,133 @@
+"""
+Detection of stalls of the Qt main thread, aggregated by the call site that blocked it.
+"""
+import sys
+import threading
+import time
+import traceback
+
+from qtpy.QtCore import QObject, QTimer, Signal
+from xicam.core import msg
+
+
+class StallWatchdog(QObject):
+    """
+    Reports every time the Qt event loop is blocked for longer than ``threshold``, and where it was blocked.
+
+    A timer on the main thread beats every ``interval``; a background thread checks the beat, and once it is more
+    than ``threshold`` late it captures the main thread's stack. When the event loop comes back, the stall's duration
+    is known and it is filed under its call site: the innermost frame of a module in ``packages``, or the innermost
+    frame if there is none (see ``stalls``). Durations are accurate to within ``interval``.
+
+    Parameters
+    ----------
+    threshold : float
+        Shortest blocking time (s) that counts as a stall.
+    interval : float
+        Heartbeat period (s); should be well below ``threshold``.
+    packages : tuple of str
+        Module name prefixes of the code that stalls are attributed to.
+    """
+    sigStall = Signal(float, str)  # duration (s), call site
+
+    def __init__(self, threshold=.1, interval=.02, packages=('xicam',), parent=None):
+        super(StallWatchdog, self).__init__(parent)
+        self.threshold = threshold
+        self.interval = interval
+        self.packages = tuple(packages)
+        self.stalls = dict()  # call site -> {'count', 'total', 'max', 'last', 'stack'}
+
+        self._main_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._captured = None  # (beat, stack) of the stall in progress, set by the watcher thread
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(interval * 1e3))
+        self._timer.timeout.connect(self._heartbeat)
+        self._watcher = None
+
+    def start(self):
+        """Start watching; call from the main thread."""
+        self._beat = time.perf_counter()
+        self._timer.start()
+        self._stopped.clear()
+        self._watcher = threading.Thread(target=self._watch, name='StallWatchdog', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stopped.set()
+
+    def clear(self):
+        with self._lock:
+            self.stalls.clear()
+
+    def snapshot(self):
+        """A copy of ``stalls``."""
+        with self._lock:
+            return {site: dict(stall) for site, stall in self.stalls.items()}
+
+    def _heartbeat(self):
+        now = time.perf_counter()
+        previous, self._beat = self._beat, now
+        stalled = now - previous - self.interval
+        with self._lock:
+            captured, self._captured = self._captured, None
+        if stalled < self.threshold:
+            return
+
+        if captured and captured[0] == previous:
+            stack = captured[1]
+        else:
+            stack = []  # Too short for the watcher to catch it in the act
+        site = self._call_site(stack)
+        with self._lock:
+            stall = self.stalls.setdefault(site, {'count': 0, 'total': 0., 'max': 0., 'last': None, 'stack': None})
+            stall['count'] += 1
+            stall['total'] += stalled
+            stall['max'] = max(stall['max'], stalled)
+            stall['last'] = time.time()
+            stall['stack'] = ''.join(traceback.format_list([frame for frame, _ in stack]))
+        msg.logMessage(f'The GUI was blocked for {stalled * 1e3:.0f} ms in {site}', level=msg.DEBUG)
+        self.sigStall.emit(stalled, site)
+
+    def _watch(self):
+        poll = min(self.interval, self.threshold / 4)
+        while not self._stopped.wait(poll):
+            beat = self._beat
+            if time.perf_counter() - beat > self.threshold + self.interval:
+                with self._lock:
+                    if self._captured is None or self._captured[0] != beat:
+                        self._captured = beat, self._main_stack()
+
+    def _main_stack(self):
+        frame = sys._current_frames().get(self._main_thread)
+        stack = []
+        while frame is not None:
+            stack.append((traceback.FrameSummary(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name,
+                                                 lookup_line=False),
+                          frame.f_globals.get('__name__', '')))
+            frame = frame.f_back
+        stack.reverse()  # Outermost first, like traceback.extract_stack
+        return stack
+
+    def _call_site(self, stack):
+        if not stack:
+            return '(unknown)'
+        ours = [(frame, module) for frame, module in stack if module.startswith(self.packages)]
+        frame, module = (ours or stack)[-1]
+        return f'{frame.name} ({module or frame.filename}:{frame.lineno})'
+
+
+_watchdog = None
+
+
+def get_stall_watchdog():
+    """The application's watchdog, started on first use; call from the main thread."""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = StallWatchdog()
+        _watchdog.start()
+    return _watchdog
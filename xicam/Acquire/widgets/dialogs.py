@@ -4,6 +4,14 @@ from qtpy.QtWidgets import QDialog, QHBoxLayout, QVBoxLayout, QDialogButtonBox,
 from qtpy.QtCore import Qt, QSettings
 from xicam.core import msg
 
+# Start document keys that are set by the RunEngine and can't be supplied as metadata
+RESERVED_METADATA_KEYS = frozenset(['plan_type', 'plan_args', 'scan_id', 'time', 'uid'])
+
+
+def find_reserved_keys(metadata, reserved=RESERVED_METADATA_KEYS):
+    """Return the keys of ``metadata`` that are reserved."""
+    return set(metadata).intersection(reserved)
+
 
 class ScalableGroup(pt.parameterTypes.GroupParameter):
     def __init__(self, **opts):
@@ -75,7 +83,7 @@ class MetadataDialog(QDialog):
         return {key: value['value'] for key, value in self.parameter.saveState('user').get('children',{}).items()}
 
     def accept(self):
-        intersection = set(self.get_metadata().keys()).intersection(self.reserved)
+        intersection = find_reserved_keys(self.get_metadata(), self.reserved)
 
         if intersection:
             msg.notifyMessage(f'The field name "{list(intersection)[0]}" is reserved and cannot be used.')
@@ -0,0 +1,39 @@
+from qtpy.QtWidgets import QWidget, QVBoxLayout
+
+from xicam.Acquire.startup import timed
+
+
+class LazyWidget(QWidget):
+    """
+    A placeholder that builds its widget the first time it is shown, so stages nobody opens cost nothing at startup.
+
+    Parameters
+    ----------
+    factory : callable
+        Returns the widget; import heavy modules inside it, not at the top of the calling module.
+    name : str
+        Name the construction time is reported under (see ``xicam.Acquire.startup``).
+    """
+
+    def __init__(self, factory, name, *args, **kwargs):
+        super(LazyWidget, self).__init__(*args, **kwargs)
+        self.factory = factory
+        self.name = name
+        self.widget = None
+
+        # Layout
+        self.layout = QVBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.layout)
+
+    def build(self):
+        """Build the widget now, if it has not been yet, and return it."""
+        if self.widget is None:
+            with timed(self.name):
+                self.widget = self.factory()
+            self.layout.addWidget(self.widget)
+        return self.widget
+
+    def showEvent(self, event):
+        self.build()
+        super(LazyWidget, self).showEvent(event)